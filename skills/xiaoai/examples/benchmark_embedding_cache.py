@@ -0,0 +1,81 @@
+#!/usr/bin/env python
+"""
+嵌入缓存基准 - 重复导入与重复查询时嵌入缓存省去的请求与耗时
+
+嵌入服务用模拟函数代替（每次请求 --latency 毫秒往返）。依次测量：
+1. 首次导入 --count 条文本（全部未命中，写入内存层与磁盘层）
+2. 再次导入相同文本（内存层命中；内存层容量 --memory-entries 小于条数时部分来自磁盘层）
+3. 新建缓存实例（模拟进程重启）后再次导入（全部来自 mmap 磁盘层）
+并输出内存层、磁盘层单次查找耗时。缓存文件写入临时目录。
+
+用法:
+    python examples/benchmark_embedding_cache.py --count 5000 --dim 1536 --latency 2
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scripts.embedding_cache import EmbeddingCache
+
+
+def main():
+    parser = argparse.ArgumentParser(description="嵌入缓存基准")
+    parser.add_argument("--count", type=int, default=5000, help="文本条数")
+    parser.add_argument("--dim", type=int, default=1536, help="嵌入维度")
+    parser.add_argument("--latency", type=float, default=2.0, help="嵌入请求往返延迟（毫秒）")
+    parser.add_argument("--batch", type=int, default=256, help="每次嵌入请求的条数")
+    parser.add_argument("--memory-entries", type=int, default=4096, help="内存层容量")
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    texts = [f"知识库分块 {i}：" + "内容" * rng.randrange(5, 50) for i in range(args.count)]
+    calls = [0]
+
+    def embed_many(batch):
+        calls[0] += 1
+        time.sleep(args.latency / 1000)
+        return [[rng.random() for _ in range(args.dim)] for _ in batch]
+
+    def ingest(cache):
+        calls[0] = 0
+        start = time.perf_counter()
+        for i in range(0, len(texts), args.batch):
+            cache.get_or_compute_many("text-embedding-3-small", texts[i:i + args.batch], embed_many)
+        return time.perf_counter() - start
+
+    cache_dir = tempfile.mkdtemp()
+    print(f"{'场景':<24}{'耗时(s)':>10}{'嵌入请求':>10}{'命中率':>10}")
+
+    def row(name, seconds, cache):
+        print(f"{name:<24}{seconds:>10.3f}{calls[0]:>10}{cache.get_stats()['hit_rate']:>10.1%}")
+
+    cache = EmbeddingCache(max_entries=args.memory_entries, cache_dir=cache_dir)
+    row("首次导入", ingest(cache), cache)
+    cache.hits = cache.disk_hits = cache.misses = 0
+    row("再次导入", ingest(cache), cache)
+    cache.close()
+
+    cache = EmbeddingCache(max_entries=args.memory_entries, cache_dir=cache_dir)
+    row("重启后导入（磁盘层）", ingest(cache), cache)
+
+    def lookup_us(cache, sample):
+        start = time.perf_counter()
+        for text in sample:
+            cache.get("text-embedding-3-small", text)
+        return (time.perf_counter() - start) / len(sample) * 1e6
+
+    sample = texts[-min(1000, args.memory_entries):]
+    print(f"\n内存层查找: {lookup_us(cache, sample):.1f} us/次")
+    cache.close()
+    cache = EmbeddingCache(max_entries=args.memory_entries, cache_dir=cache_dir)
+    print(f"磁盘层查找: {lookup_us(cache, sample):.1f} us/次（{args.dim} 维，mmap）")
+    cache.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+#!/usr/bin/env python
+"""
+导入耗时基准 - 每个入口在全新的解释器中导入，统计耗时以及是否加载了重量级依赖
+
+用法:
+    python examples/benchmark_import.py --repeat 5
+"""
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 入口 -> 导入语句
+ENTRIES = {
+    "scripts": "import scripts",
+    "from scripts import Agent": "from scripts import Agent",
+    "agent_manager": "import scripts.agent_manager",
+    "group_manager": "import scripts.group_manager",
+    "swarm_intelligence": "import scripts.swarm_intelligence",
+    "skill_market": "import scripts.skill_market",
+    "gui_automation": "import scripts.gui_automation",
+    "wecom_integration": "import scripts.wecom_integration",
+}
+
+# 只有真正用到时才应该加载的依赖
+HEAVY = ["numpy", "pyautogui", "requests", "httpx", "openai", "anthropic", "tiktoken",
+         "sqlite3", "asyncio", "concurrent.futures",
+         "scripts.clawhub_client", "scripts.modelscope_mcp"]
+
+# 缺少未安装的可选依赖（如 requests、pyautogui）时单独报告，而不是作为失败
+PROBE = """
+import sys, time, json
+start = time.perf_counter()
+try:
+    {statement}
+except ModuleNotFoundError as e:
+    if e.name is None or e.name.split(".")[0] == "scripts":
+        raise
+    print(json.dumps({{"missing": e.name}}))
+    sys.exit(0)
+elapsed = time.perf_counter() - start
+print(json.dumps({{"seconds": elapsed, "loaded": [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+
+def measure(statement: str) -> dict:
+    result = subprocess.run(
+        [sys.executable, "-c", PROBE.format(statement=statement, heavy=HEAVY)],
+        cwd=ROOT, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        return {"error": result.stderr.strip().splitlines()[-1]}
+    return json.loads(result.stdout)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="导入耗时基准")
+    parser.add_argument("--repeat", type=int, default=5, help="每个入口的测量次数（取中位数）")
+    args = parser.parse_args()
+
+    print(f"{'入口':<28}{'耗时(ms)':>10}  加载的重量级依赖")
+    missing = {}
+    for name, statement in ENTRIES.items():
+        runs = [measure(statement) for _ in range(args.repeat)]
+        if "missing" in runs[0]:
+            missing[name] = runs[0]["missing"]
+            continue
+        if "error" in runs[0]:
+            print(f"{name:<28}{'-':>10}  {runs[0]['error']}")
+            continue
+        median = statistics.median(r["seconds"] for r in runs) * 1000
+        print(f"{name:<28}{median:>10.1f}  {', '.join(runs[0]['loaded']) or '-'}")
+
+    if missing:
+        print("\n未测量（缺少可选依赖）:")
+        for name, module in missing.items():
+            print(f"  {name:<26}缺少可选依赖: {module}")
+
+
+if __name__ == "__main__":
+    main()
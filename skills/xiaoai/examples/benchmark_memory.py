@@ -0,0 +1,83 @@
+#!/usr/bin/env python
+"""
+记忆存储基准 - 在不同规模下测量 MemoryStore 各操作的单次耗时
+
+用法:
+    python examples/benchmark_memory.py --sizes 1000 10000 100000 1000000 --ops 2000
+
+recall 列为按重要性取前 10 个（重要性索引），full_sort 列为旧实现的全量排序，作为对照。
+--store sqlite 时测量 SQLite 存储（批量写入、按需加载，数据库位于临时目录）。
+
+    python examples/benchmark_memory.py --store sqlite --sizes 10000 100000 1000000
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scripts.memory_store import MemoryStore, MemoryType
+
+
+def per_op_us(func, keys) -> float:
+    """对每个 key 调用一次 func，返回平均单次耗时（微秒）"""
+    start = time.perf_counter()
+    for key in keys:
+        func(key)
+    return (time.perf_counter() - start) / len(keys) * 1e6
+
+
+def bench_keyed(size: int, ops: int, rng: random.Random, store_type: str = "json") -> dict:
+    if store_type == "sqlite":
+        store = MemoryStore("sqlite", db_path=os.path.join(tempfile.mkdtemp(), "memory.db"))
+    else:
+        store = MemoryStore()
+    for i in range(size):
+        store.remember(f"k{i}", f"记忆 {i}", MemoryType.LONG_TERM, importance=rng.random())
+
+    existing = [f"k{rng.randrange(size)}" for _ in range(ops)]
+    fresh = [f"new{i}" for i in range(ops)]
+    recalls = range(max(ops // 10, 10))
+    return {
+        "recall": per_op_us(lambda _: store.recall(top_k=10), recalls),
+        "full_sort": per_op_us(
+            lambda _: sorted(store.memories[MemoryType.LONG_TERM].values(),
+                             key=lambda m: m.importance, reverse=True)[:10],
+            range(3)
+        ) if store_type == "json" else float("nan"),
+        "update_importance": per_op_us(
+            lambda k: store.update_importance(k, rng.random(), MemoryType.LONG_TERM), existing
+        ),
+        "remember": per_op_us(lambda k: store.remember(k, "v", MemoryType.LONG_TERM), fresh),
+        "upsert": per_op_us(lambda k: store.remember(k, "v2", MemoryType.LONG_TERM), existing),
+        "recall_by_key": per_op_us(lambda k: store.recall_by_key(k), existing),
+        "forget": per_op_us(lambda k: store.forget(k, MemoryType.LONG_TERM), fresh),
+        "total": len(store),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="记忆存储基准")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000, 1000000],
+                        help="预先写入的记忆条数")
+    parser.add_argument("--ops", type=int, default=2000, help="每种操作的测量次数")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--store", choices=["json", "sqlite"], default="json", help="存储类型")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    columns = ["remember", "upsert", "recall_by_key", "forget", "update_importance",
+               "recall", "full_sort"]
+    print(f"{'记忆条数':>10}" + "".join(f"{c + '(us)':>22}" for c in columns))
+    for size in args.sizes:
+        result = bench_keyed(size, args.ops, rng, args.store)
+        # upsert 不应新增条目
+        assert result["total"] == size, result["total"]
+        print(f"{size:>10}" + "".join(f"{result[c]:>22.2f}" for c in columns))
+
+
+if __name__ == "__main__":
+    main()
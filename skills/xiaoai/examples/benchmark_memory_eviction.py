@@ -0,0 +1,79 @@
+#!/usr/bin/env python
+"""
+工作记忆淘汰基准 - 模拟群聊持续写入消息，对比有无淘汰策略时的条数、内存占用与检索延迟
+
+写入方式与 Group.add_message 一致（HybridMemoryStore，importance=0.3，落入工作记忆）。
+每写入 --messages / --checkpoints 条输出一行：当前条数、tracemalloc 统计的内存占用、
+最近一段的平均写入耗时（含摊还的淘汰）、recall(top_k=10) 耗时，以及累计淘汰条数。
+
+用法:
+    python examples/benchmark_memory_eviction.py --messages 200000 --max-entries 10000
+    python examples/benchmark_memory_eviction.py --store sqlite --messages 50000 --ttl 2
+"""
+import os
+import sys
+import time
+import uuid
+import random
+import argparse
+import tempfile
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scripts.memory_store import HybridMemoryStore, MemoryType, EvictionPolicy
+
+
+def run(name: str, store: HybridMemoryStore, messages: int, checkpoints: int):
+    print(f"\n[{name}]")
+    print(f"{'已写入':>10}{'工作记忆':>10}{'内存(MB)':>10}{'写入(us)':>10}"
+          f"{'recall(us)':>12}  淘汰")
+    rng = random.Random(0)
+    step = max(messages // checkpoints, 1)
+    tracemalloc.start()
+    written = 0
+    while written < messages:
+        start = time.perf_counter()
+        for _ in range(step):
+            store.remember(f"msg_{uuid.uuid4().hex[:8]}",
+                           f"用户{rng.randrange(50)}: 消息内容 {written}", importance=0.3)
+            written += 1
+        write_us = (time.perf_counter() - start) / step * 1e6
+
+        start = time.perf_counter()
+        for _ in range(100):
+            store.recall(top_k=10)
+        recall_us = (time.perf_counter() - start) / 100 * 1e6
+
+        mem_mb = tracemalloc.get_traced_memory()[0] / 2 ** 20
+        count = store.working.get_stats()["working"]
+        print(f"{written:>10}{count:>10}{mem_mb:>10.1f}{write_us:>10.1f}"
+              f"{recall_us:>12.1f}  {store.get_eviction_stats()}")
+    tracemalloc.stop()
+    store.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="工作记忆淘汰基准")
+    parser.add_argument("--messages", type=int, default=200000, help="写入的消息条数")
+    parser.add_argument("--checkpoints", type=int, default=10, help="输出的行数")
+    parser.add_argument("--store", choices=["json", "sqlite"], default="json", help="存储后端")
+    parser.add_argument("--max-entries", type=int, default=10000, help="工作记忆条数上限")
+    parser.add_argument("--ttl", type=float, default=None, help="工作记忆保留秒数（默认不设置）")
+    parser.add_argument("--half-life", type=float, default=None, help="重要性衰减半衰期（秒）")
+    args = parser.parse_args()
+
+    def make_store(policies):
+        params = {}
+        if args.store == "sqlite":
+            params["db_path"] = os.path.join(tempfile.mkdtemp(), "memory.db")
+        return HybridMemoryStore(store_type=args.store, policies=policies, **params)
+
+    policy = EvictionPolicy(max_entries=args.max_entries, ttl=args.ttl, half_life=args.half_life)
+    run("无淘汰", make_store(None), args.messages, args.checkpoints)
+    run(f"淘汰策略 {policy}", make_store({MemoryType.WORKING: policy}),
+        args.messages, args.checkpoints)
+
+
+if __name__ == "__main__":
+    main()
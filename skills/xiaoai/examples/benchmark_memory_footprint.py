@@ -0,0 +1,115 @@
+#!/usr/bin/env python
+"""
+记忆内存占用基准 - 用 tracemalloc 统计每条记忆占用的字节数
+
+对照组为旧的 Memory 表示：普通 dataclass（每个实例一个 __dict__）+ List[float] 嵌入
+（每个分量一个 Python float 对象）。嵌入由嵌入函数逐条生成，metadata 逐条从 JSON 解析
+（与从 SQLite 或消息载荷读取时一致，每条记忆都有各自的键字符串对象）。
+
+用法:
+    python examples/benchmark_memory_footprint.py --count 20000 --dims 64 1536
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import tracemalloc
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scripts.memory_store import Memory, MemoryStore, VectorMemoryStore, MemoryType
+
+
+@dataclass
+class LegacyMemory:
+    """旧版 Memory"""
+    key: str
+    value: str
+    memory_type: MemoryType
+    importance: float = 0.5
+    timestamp: float = field(default_factory=time.time)
+    metadata: Dict = field(default_factory=dict)
+    embeddings: Optional[List[float]] = None
+
+
+def embedder(dim: int):
+    rng = random.Random(0)
+    return lambda text: [rng.random() for _ in range(dim)]
+
+
+def bytes_per_item(build, count: int) -> float:
+    """build(i) 逐条构造并保留对象，返回平均每条新增的字节数"""
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    kept = [build(i) for i in range(count)]
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del kept
+    return (after - before) / count
+
+
+def main():
+    parser = argparse.ArgumentParser(description="记忆内存占用基准")
+    parser.add_argument("--count", type=int, default=20000, help="每组构造的记忆条数")
+    parser.add_argument("--dims", type=int, nargs="+", default=[64, 1536], help="嵌入维度")
+    args = parser.parse_args()
+    n = args.count
+
+    def metadata(i):
+        return json.loads(json.dumps({"author": f"user{i % 7}", "group": "产品群"}))
+
+    print(f"{'场景':<36}{'旧(字节/条)':>14}{'新(字节/条)':>14}{'缩减':>8}")
+
+    def row(name, legacy, current):
+        print(f"{name:<36}{legacy:>14.0f}{current:>14.0f}{legacy / current:>7.1f}x")
+
+    # 群聊消息：工作记忆，无嵌入
+    row(
+        "Memory（无嵌入）",
+        bytes_per_item(lambda i: LegacyMemory(f"msg_{i}", f"用户{i}: 消息内容 {i}",
+                                              MemoryType.WORKING, 0.3, metadata=metadata(i)), n),
+        bytes_per_item(lambda i: Memory(f"msg_{i}", f"用户{i}: 消息内容 {i}",
+                                        MemoryType.WORKING, 0.3, metadata=metadata(i)), n),
+    )
+
+    for dim in args.dims:
+        embed = embedder(dim)
+        count = max(n * 64 // dim, 500)
+        row(
+            f"Memory（{dim} 维嵌入）",
+            bytes_per_item(lambda i: LegacyMemory(f"m{i}", f"消息 {i}", MemoryType.VECTOR,
+                                                  embeddings=embed(f"消息 {i}")), count),
+            bytes_per_item(lambda i: Memory(f"m{i}", f"消息 {i}", MemoryType.VECTOR,
+                                            embeddings=embed(f"消息 {i}")), count),
+        )
+
+        # 整个向量记忆库（含键字典、重要性索引与向量索引）
+        legacy_store: Dict[str, LegacyMemory] = {}
+        store = VectorMemoryStore(embedder=embed)
+
+        def legacy_put(i):
+            legacy_store[f"m{i}"] = LegacyMemory(f"m{i}", f"消息 {i}", MemoryType.VECTOR,
+                                                 embeddings=embed(f"消息 {i}"))
+
+        row(
+            f"VectorMemoryStore（{dim} 维，含索引）",
+            bytes_per_item(legacy_put, count),
+            bytes_per_item(lambda i: store.remember(f"m{i}", f"消息 {i}"), count),
+        )
+
+    store = MemoryStore()
+    row(
+        "MemoryStore 工作记忆（含索引）",
+        bytes_per_item(lambda i: LegacyMemory(f"msg_{i}", f"用户{i}: 消息内容 {i}",
+                                              MemoryType.WORKING, 0.3, metadata=metadata(i)), n),
+        bytes_per_item(lambda i: store.remember(f"msg_{i}", f"用户{i}: 消息内容 {i}",
+                                                MemoryType.WORKING, 0.3, metadata(i)), n),
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+#!/usr/bin/env python
+"""
+批量写入基准 - 逐条 remember 与 remember_many 的吞吐量对比
+
+嵌入服务用模拟函数代替：每次请求耗时 --latency 毫秒（网络往返），另加每条 --per-item 毫秒；
+逐条写入时每条记忆一次请求，remember_many 每 --embed-batch 条合并为一次请求。
+MemoryStore 一组不涉及嵌入，对比逐条写入与批量写入（SQLite 一批一个事务）。
+
+用法:
+    python examples/benchmark_memory_ingest.py --count 2000 --latency 5
+    python examples/benchmark_memory_ingest.py --store sqlite --count 20000 --latency 0
+"""
+import os
+import sys
+import time
+import hashlib
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scripts.memory_store import MemoryStore, VectorMemoryStore, MemoryType
+
+
+class SimulatedProvider:
+    """模拟嵌入服务：每次请求固定往返延迟 + 每条计算耗时"""
+
+    def __init__(self, latency_ms: float, per_item_ms: float, dim: int = 64):
+        self.latency = latency_ms / 1000
+        self.per_item = per_item_ms / 1000
+        self.dim = dim
+        self.calls = 0
+
+    def _vector(self, text: str):
+        digest = hashlib.sha256(text.encode()).digest()
+        return [digest[i % len(digest)] / 255.0 for i in range(self.dim)]
+
+    def embed(self, text: str):
+        return self.embed_batch([text])[0]
+
+    def embed_batch(self, texts):
+        self.calls += 1
+        time.sleep(self.latency + self.per_item * len(texts))
+        return [self._vector(text) for text in texts]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="批量写入基准")
+    parser.add_argument("--count", type=int, default=2000, help="写入条数")
+    parser.add_argument("--store", choices=["json", "sqlite"], default="json", help="存储后端")
+    parser.add_argument("--latency", type=float, default=5.0, help="嵌入请求往返延迟（毫秒）")
+    parser.add_argument("--per-item", type=float, default=0.01, help="每条嵌入耗时（毫秒）")
+    parser.add_argument("--embed-batch", type=int, default=256, help="每次嵌入请求的条数上限")
+    args = parser.parse_args()
+
+    def params():
+        if args.store == "sqlite":
+            return {"db_path": os.path.join(tempfile.mkdtemp(), "memory.db")}
+        return {}
+
+    items = [{"key": f"log_{i}", "value": f"历史聊天记录 {i}", "importance": 0.6}
+             for i in range(args.count)]
+
+    print(f"{'场景':<28}{'耗时(s)':>10}{'条/秒':>12}{'嵌入请求':>10}")
+
+    def row(name, seconds, calls="-"):
+        print(f"{name:<28}{seconds:>10.3f}{args.count / seconds:>12.0f}{calls:>10}")
+
+    # 不涉及嵌入：逐条写入 vs 批量写入
+    store = MemoryStore(args.store, **params())
+    start = time.perf_counter()
+    for item in items:
+        store.remember(item["key"], item["value"], MemoryType.LONG_TERM, item["importance"])
+    store.flush()
+    row("MemoryStore 逐条", time.perf_counter() - start)
+    store.close()
+
+    store = MemoryStore(args.store, **params())
+    start = time.perf_counter()
+    store.remember_many(items)
+    store.flush()
+    row("MemoryStore remember_many", time.perf_counter() - start)
+    store.close()
+
+    # 向量记忆：每条一次嵌入请求 vs 合并请求
+    provider = SimulatedProvider(args.latency, args.per_item)
+    store = VectorMemoryStore(embedder=provider.embed, store_type=args.store, **params())
+    start = time.perf_counter()
+    for item in items:
+        store.remember(item["key"], item["value"], importance=item["importance"])
+    store.flush()
+    row("VectorMemoryStore 逐条", time.perf_counter() - start, provider.calls)
+    store.close()
+
+    provider = SimulatedProvider(args.latency, args.per_item)
+    store = VectorMemoryStore(embedder=provider.embed, batch_embedder=provider.embed_batch,
+                              embed_batch_size=args.embed_batch,
+                              store_type=args.store, **params())
+    start = time.perf_counter()
+    store.remember_many(items)
+    store.flush()
+    row("VectorMemoryStore remember_many", time.perf_counter() - start, provider.calls)
+    print(f"\nget_ingest_stats(): {store.get_ingest_stats()}")
+    store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+#!/usr/bin/env python
+"""
+离线基准测试 - 使用本地模拟模型（mock/ 前缀），不需要任何 API key
+
+覆盖 Group、SwarmIntelligence、WorkflowEngine、ActiveGroupChat，
+输出每个场景的墙钟时间以及各智能体的调用统计。
+
+用法:
+    python examples/benchmark_mock.py --ttft 0.2 --jitter 0.5 --tps 50 --error-rate 0.02
+"""
+import os
+import sys
+import time
+import asyncio
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scripts.agent_manager import AgentManager
+from scripts.group_manager import Group, CollaborationStrategy
+from scripts.swarm_intelligence import SwarmIntelligence
+from scripts.workflow_engine import WorkflowEngine, WorkflowNode, NodeType
+from scripts.proactive_agent import ActiveGroupChat, ProactiveAgent
+from scripts.mock_provider import get_mock_registry
+from scripts.llm_metrics import get_metrics, metrics_scope
+
+
+ROLES = {
+    "技术专家": "擅长技术架构，关注系统性能和可维护性",
+    "产品经理": "擅长用户需求分析和产品策略",
+    "设计师": "擅长用户体验和交互设计",
+}
+
+
+def build_agents(manager: AgentManager, model: str):
+    return [manager.create_agent(name, model, role) for name, role in ROLES.items()]
+
+
+def bench_group(agents):
+    group = Group("基准群组")
+    for agent in agents:
+        group.add_agent(agent)
+    group.discuss("下一季度优先做哪个功能？")
+    group.assign_task("写一份竞品分析", strategy=CollaborationStrategy.PARALLEL)
+    group.assign_task("写一份上线计划", strategy=CollaborationStrategy.SEQUENTIAL)
+
+
+def bench_swarm(agents):
+    swarm = SwarmIntelligence("基准蜂群")
+    for agent in agents:
+        swarm.add_agent(agent)
+    for strategy in ("debate", "iterative", "critique"):
+        swarm.collaborative_think("AI 助手应该先做网页版还是 App？", strategy=strategy)
+
+
+def bench_workflow(agents):
+    engine = WorkflowEngine()
+    wf = engine.create_workflow("基准工作流")
+    engine.add_node(wf, WorkflowNode(
+        id="collect", name="收集", node_type=NodeType.AGENT,
+        config={"agent": agents[0], "prompt": "收集 {topic} 的市场数据", "output_key": "data"}
+    ))
+    engine.add_node(wf, WorkflowNode(
+        id="fan_out", name="并行分析", node_type=NodeType.PARALLEL,
+        config={"tasks": [
+            WorkflowNode(id=f"analyze_{i}", name="分析", node_type=NodeType.AGENT,
+                         config={"agent": agent, "prompt": "分析: {data}"})
+            for i, agent in enumerate(agents)
+        ]}
+    ))
+    engine.add_node(wf, WorkflowNode(
+        id="report", name="报告", node_type=NodeType.AGENT,
+        config={"agent": agents[-1], "prompt": "汇总成报告: {data}", "output_key": "report"}
+    ))
+    engine.add_edge(wf, "collect", "fan_out")
+    engine.add_edge(wf, "fan_out", "report")
+    asyncio.run(engine.execute(wf, {"topic": "智能客服"}))
+
+
+def bench_active_chat(agents, messages: int = 20):
+    chat = ActiveGroupChat("基准群聊")
+    for agent in agents:
+        chat.add_agent(ProactiveAgent(agent))
+    for i in range(messages):
+        chat.on_message("用户", f"第 {i} 个问题：这个方案可行吗？")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="离线基准测试（模拟模型）")
+    parser.add_argument("--model", default="mock/bench")
+    parser.add_argument("--latency", default="lognormal",
+                        choices=["fixed", "uniform", "normal", "lognormal"])
+    parser.add_argument("--ttft", type=float, default=0.05, help="首 token 时间（秒）")
+    parser.add_argument("--jitter", type=float, default=0.3)
+    parser.add_argument("--tps", type=float, default=200.0, help="输出速率（token/秒）")
+    parser.add_argument("--response-tokens", type=int, default=120)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    get_mock_registry().configure(
+        args.model,
+        latency=args.latency,
+        ttft=args.ttft,
+        jitter=args.jitter,
+        tokens_per_second=args.tps,
+        response_tokens=args.response_tokens,
+        error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate,
+    )
+
+    manager = AgentManager()
+    agents = build_agents(manager, args.model)
+
+    scenarios = [
+        ("group", bench_group),
+        ("swarm", bench_swarm),
+        ("workflow", bench_workflow),
+        ("active_chat", bench_active_chat),
+    ]
+    print(f"{'场景':<14}{'耗时(s)':>10}")
+    for name, run in scenarios:
+        start = time.perf_counter()
+        with metrics_scope(f"bench:{name}"):
+            run(agents)
+        print(f"{name:<14}{time.perf_counter() - start:>10.3f}")
+
+    print("\n--- 按场景 ---")
+    for scope, summary in sorted(get_metrics().by_scope().items()):
+        p50 = summary["latency_p50"] or 0.0
+        p95 = summary["latency_p95"] or 0.0
+        print(f"{scope:<20} calls={summary['calls']:<5} "
+              f"tokens={summary['prompt_tokens']}+{summary['completion_tokens']:<8} "
+              f"p50={p50:.3f}s p95={p95:.3f}s outcomes={summary['outcomes']}")
+
+    print("\n--- 按智能体 ---")
+    for agent, stats in manager.get_stats().items():
+        for model, summary in stats["models"].items():
+            print(f"{agent:<8}{model:<14} calls={summary['calls']:<5} "
+                  f"p95={summary['latency_p95'] or 0.0:.3f}s counters={stats['counters']}")
+
+    print("\n--- 模拟模型 ---")
+    print(get_mock_registry().get_stats())
+
+
+if __name__ == "__main__":
+    main()
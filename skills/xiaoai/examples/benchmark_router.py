@@ -0,0 +1,83 @@
+#!/usr/bin/env python
+"""
+模型路由收益估算 - 离线运行，不需要 API key
+
+同一段群聊分别由「固定大模型」和「按请求路由」的主动智能体回复，
+对比调用费用、平均延迟，并输出路由器的档位分布（决策日志可用于调参）。
+
+用法:
+    python examples/benchmark_router.py --messages 60 --log routing.jsonl
+"""
+import os
+import sys
+import random
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scripts.agent_manager import AgentManager
+from scripts.model_router import ModelRouter, ModelTier
+from scripts.proactive_agent import ActiveGroupChat, ProactiveAgent
+from scripts.mock_provider import get_mock_registry
+from scripts.llm_metrics import get_metrics, set_model_price
+
+MESSAGES = [
+    "大家好", "同意楼上", "说得对", "+1 同意",
+    "这个方案的数据库怎么分库分表？", "请问上线前要做哪些压测？",
+    "有人能帮忙看下这个报错吗", "为什么新版本的首屏变慢了？",
+]
+
+
+def run(router, args) -> dict:
+    get_metrics().reset()
+    manager = AgentManager(router=router)
+    agent = manager.create_agent("小爱", "mock/large", "群聊助手")
+    proactive = ProactiveAgent(agent)
+    proactive.config["cooldown"] = 0
+    proactive.config["max_daily_responses"] = args.messages
+    chat = ActiveGroupChat("基准群聊")
+    chat.add_agent(proactive)
+
+    rng = random.Random(0)
+    for i in range(args.messages):
+        chat.on_message("用户", f"@小爱 {rng.choice(MESSAGES)}")
+
+    records = [r for r in get_metrics().records if r.outcome == "ok"]
+    return {
+        "calls": len(records),
+        "cost": sum(r.cost for r in records),
+        "latency": sum(r.latency for r in records) / max(len(records), 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="模型路由收益估算（模拟模型）")
+    parser.add_argument("--messages", type=int, default=60)
+    parser.add_argument("--log", default=None, help="路由决策日志（JSONL）")
+    args = parser.parse_args()
+
+    # 小模型：快且便宜；大模型：慢且贵
+    registry = get_mock_registry()
+    registry.configure("mock/small", ttft=0.005, tokens_per_second=4000, response_tokens=60)
+    registry.configure("mock/large", ttft=0.02, tokens_per_second=1000, response_tokens=60)
+    set_model_price("mock/small", 0.15, 0.6)
+    set_model_price("mock/large", 3.0, 15.0)
+
+    router = ModelRouter([
+        ModelTier("small", "mock/small", 0.4),
+        ModelTier("large", "mock/large", 0.9),
+    ], log_path=args.log)
+
+    fixed = run(None, args)
+    routed = run(router, args)
+
+    print(f"{'':<10}{'调用':>8}{'费用($)':>12}{'平均延迟(s)':>14}")
+    for name, result in (("固定大模型", fixed), ("按请求路由", routed)):
+        print(f"{name:<10}{result['calls']:>8}{result['cost']:>12.5f}{result['latency']:>14.4f}")
+    saved = 1 - routed["cost"] / fixed["cost"] if fixed["cost"] else 0.0
+    print(f"\n费用节省 {saved:.1%}")
+    print(f"路由分布: {router.get_stats()}")
+
+
+if __name__ == "__main__":
+    main()
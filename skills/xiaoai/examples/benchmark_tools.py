@@ -0,0 +1,78 @@
+#!/usr/bin/env python
+"""
+工具调用基准测试 - 离线运行，不需要 API key
+
+模拟模型在一轮回复中请求多个相互独立的工具，对比工具顺序执行与并发执行的墙钟时间。
+并发执行时同一轮的工具在有界线程池中同时运行，结果在一次后续请求中回传给模型。
+
+用法:
+    python examples/benchmark_tools.py --tools 6 --tool-latency 0.2 --rounds 3
+"""
+import os
+import sys
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scripts.agent_manager import AgentManager
+from scripts.agent_tools import Tool, get_tool_registry
+from scripts.mock_provider import get_mock_registry
+
+
+def register_tools(count: int, latency: float):
+    registry = get_tool_registry()
+    for i in range(count):
+        def lookup(arguments, i=i):
+            time.sleep(latency)  # 模拟外部服务的网络延迟
+            return {"source": i, "query": arguments.get("query", "")}
+        registry.register(Tool(
+            name=f"lookup_{i}",
+            description=f"第 {i} 个数据源查询",
+            handler=lookup,
+            parameters={"type": "object", "properties": {"query": {"type": "string"}}}
+        ))
+    return [f"lookup_{i}" for i in range(count)]
+
+
+def planner(model, messages, tools):
+    """第一轮请求全部工具，拿到结果后直接回答"""
+    if messages[-1]["role"] == "tool":
+        return []
+    return [{"name": t["function"]["name"], "arguments": {"query": "季度销量"}} for t in tools]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="工具调用基准测试（模拟模型）")
+    parser.add_argument("--tools", type=int, default=6, help="每轮请求的工具数")
+    parser.add_argument("--tool-latency", type=float, default=0.2, help="单个工具耗时（秒）")
+    parser.add_argument("--ttft", type=float, default=0.05)
+    parser.add_argument("--rounds", type=int, default=3, help="对话次数")
+    args = parser.parse_args()
+
+    get_mock_registry().configure("mock/tools", tool_planner=planner, ttft=args.ttft)
+    names = register_tools(args.tools, args.tool_latency)
+    agent = AgentManager().create_agent("分析师", "mock/tools", "你是数据分析师", tools=names)
+
+    # 顺序执行：逐个调用工具后回传，等价于没有并发执行时的行为
+    start = time.perf_counter()
+    for i in range(args.rounds):
+        for name in names:
+            agent.tool_call(name, query="季度销量")
+        agent.chat(f"第 {i} 次汇总（顺序）", context={"tools": False})
+        agent.chat(f"第 {i} 次汇总（顺序）", context={"tools": False})
+    sequential = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for i in range(args.rounds):
+        agent.chat(f"第 {i} 次汇总")
+    parallel = time.perf_counter() - start
+
+    print(f"{'':<10}{'耗时(s)':>10}{'每次(s)':>10}")
+    print(f"{'顺序执行':<10}{sequential:>10.3f}{sequential / args.rounds:>10.3f}")
+    print(f"{'并发执行':<10}{parallel:>10.3f}{parallel / args.rounds:>10.3f}")
+    print(f"\n加速 {sequential / parallel:.1f}x，计数 {agent.stats}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+#!/usr/bin/env python
+"""
+向量检索基准 - VectorMemoryStore.semantic_search 的单次查询耗时
+
+对照组为旧实现：逐条记忆用纯 Python 计算余弦相似度（每次查询都重新计算向量范数）后全量排序。
+
+--ann 时改为比较近似索引（IVFIndex）与精确检索（FlatIndex）：不同 nprobe 下的 recall@k 与单次查询耗时。
+向量为带聚类结构的合成数据（真实的文本嵌入同样是成簇分布的）。
+
+用法:
+    python examples/benchmark_vector.py --sizes 1000 10000 100000 --queries 20
+    python examples/benchmark_vector.py --ann --sizes 100000 1000000 --nprobe 1 4 8 16 32
+"""
+import os
+import sys
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scripts.memory_store import VectorMemoryStore, MemoryType
+from scripts.vector_index import FlatIndex, IVFIndex
+
+
+def legacy_search(store: VectorMemoryStore, memories, query: str, top_k: int):
+    """旧版 semantic_search（memories 为 (记忆, 嵌入列表) 对，对应旧版 List[float] 的 Memory.embeddings）"""
+    query_embedding = store.embedder(query)
+
+    def cosine_similarity(a, b):
+        dot_product = sum(x * y for x, y in zip(a, b))
+        norm_a = sum(x * x for x in a) ** 0.5
+        norm_b = sum(x * x for x in b) ** 0.5
+        return dot_product / (norm_a * norm_b) if (norm_a * norm_b) > 0 else 0
+
+    scored = [
+        (m, cosine_similarity(query_embedding, embeddings))
+        for m, embeddings in memories
+    ]
+    scored.sort(key=lambda x: x[1], reverse=True)
+    return [m for m, _ in scored[:top_k]]
+
+
+def per_query_ms(func, queries) -> float:
+    start = time.perf_counter()
+    for query in queries:
+        func(query)
+    return (time.perf_counter() - start) / len(queries) * 1000
+
+
+def clustered_vectors(n: int, dim: int, clusters: int, rng):
+    """围绕随机中心的高斯簇"""
+    import numpy as np
+    centers = rng.standard_normal((clusters, dim)).astype(np.float32)
+    labels = rng.integers(0, clusters, n)
+    return centers[labels] + 0.5 * rng.standard_normal((n, dim)).astype(np.float32)
+
+
+def bench_ann(args):
+    import numpy as np
+    rng = np.random.default_rng(0)
+    print(f"{'向量数':>10}{'索引':>14}{'recall@' + str(args.top_k):>12}{'查询(ms)':>12}{'构建(s)':>10}")
+    for size in args.sizes:
+        data = clustered_vectors(size + args.queries, args.dim, max(size // 1000, 16), rng)
+        vectors, queries = data[:size], data[size:]
+        keys = list(range(size))
+
+        start = time.perf_counter()
+        flat = FlatIndex()
+        flat.add_many(keys, vectors)
+        flat_build = time.perf_counter() - start
+        start = time.perf_counter()
+        truth = [{k for k, _ in hits} for hits in (flat.search(q, args.top_k) for q in queries)]
+        flat_ms = (time.perf_counter() - start) / len(queries) * 1000
+        print(f"{size:>10}{'flat':>14}{1.0:>12.3f}{flat_ms:>12.3f}{flat_build:>10.2f}")
+
+        start = time.perf_counter()
+        ivf = IVFIndex()
+        ivf.add_many(keys, vectors)
+        ivf_build = time.perf_counter() - start
+        for nprobe in args.nprobe:
+            start = time.perf_counter()
+            results = [ivf.search(q, args.top_k, nprobe=nprobe) for q in queries]
+            ms = (time.perf_counter() - start) / len(queries) * 1000
+            recall = sum(
+                len(expected & {k for k, _ in hits}) for expected, hits in zip(truth, results)
+            ) / (len(queries) * args.top_k)
+            print(f"{'':>10}{'ivf/' + str(nprobe):>14}{recall:>12.3f}{ms:>12.3f}{ivf_build:>10.2f}")
+
+        # 增量写入与删除后仍然一致：删掉的向量不再出现
+        removed = keys[:size // 10]
+        for key in removed:
+            ivf.remove(key)
+        hits = ivf.search(queries[0], args.top_k, nprobe=max(args.nprobe))
+        assert not {k for k, _ in hits} & set(removed)
+        print(f"{'':>10}{'':>14}  删除 {len(removed)} 条后: {ivf.get_stats()}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="向量检索基准")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--queries", type=int, default=20, help="每种实现的查询次数")
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--ann", action="store_true", help="比较近似索引与精确检索")
+    parser.add_argument("--dim", type=int, default=64, help="--ann 时的向量维度")
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[1, 4, 8, 16, 32],
+                        help="--ann 时测试的 nprobe")
+    args = parser.parse_args()
+
+    if args.ann:
+        bench_ann(args)
+        return
+
+    queries = [f"查询 {i}" for i in range(args.queries)]
+    print(f"{'记忆条数':>10}{'旧实现(ms)':>14}{'search(ms)':>14}{'batch(ms/条)':>16}{'加速':>10}")
+    for size in args.sizes:
+        store = VectorMemoryStore()
+        for i in range(size):
+            store.remember(f"m{i}", f"群聊消息 {i}", MemoryType.VECTOR)
+        memories = [(m, list(m.embeddings))
+                    for m in store.memories[MemoryType.VECTOR].values()]
+
+        # 两种实现的结果应一致
+        expected = [m.key for m in legacy_search(store, memories, queries[0], args.top_k)]
+        assert [m.key for m in store.semantic_search(queries[0], args.top_k)] == expected
+
+        legacy = per_query_ms(lambda q: legacy_search(store, memories, q, args.top_k), queries[:5])
+        single = per_query_ms(lambda q: store.semantic_search(q, args.top_k), queries)
+        start = time.perf_counter()
+        store.semantic_search_batch(queries, args.top_k)
+        batch = (time.perf_counter() - start) / len(queries) * 1000
+        print(f"{size:>10}{legacy:>14.2f}{single:>14.3f}{batch:>16.3f}{legacy / single:>9.0f}x")
+
+
+if __name__ == "__main__":
+    main()
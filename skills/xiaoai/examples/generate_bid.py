@@ -26,7 +26,8 @@ def generate_bid_document(project_info: dict):
             ("项目负责人", "meta/llama-3.1-70b-instruct", "资深项目经理，擅长投标文件编制"),
             ("技术专家", "meta/llama-3.1-70b-instruct", "物业管理技术专家"),
             ("商务专家", "meta/llama-3.1-70b-instruct", "投标商务专家，擅长报价策略")
-        ]
+        ],
+        cache=True  # 重复生成同一项目时复用已有响应
     )
     
     project_name = project_info.get("name", "物业服务项目")
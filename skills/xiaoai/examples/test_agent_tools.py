@@ -0,0 +1,204 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+工具调用测试（使用本地模拟模型，不需要 API key）
+
+覆盖：
+- execute_tool_calls 并发执行同一轮的工具，结果与调用顺序一致；异常作为错误结果回传
+- Agent.chat 的工具循环：OpenAI 格式的 tool_calls / tool 消息，达到 max_tool_rounds 后 choice="none"
+- Anthropic 格式的 tool_use / tool_result 块
+- 流式接口提供工具时执行同样的工具循环；带工具的请求不经过响应缓存
+
+用法:
+    python examples/test_agent_tools.py
+"""
+import os
+import sys
+import json
+import time
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scripts.agent_manager import AgentManager, Completion
+from scripts.agent_tools import Tool, ToolCall, ToolSet, execute_tool_calls, get_tool_registry
+from scripts.mock_provider import get_mock_registry
+
+
+def _tool(name, handler):
+    return Tool(name=name, description=f"测试工具 {name}", handler=handler,
+                parameters={"type": "object", "properties": {"query": {"type": "string"}}})
+
+
+def test_execute_order_and_concurrency():
+    """三个工具互相等待（串行执行会超时），结果仍按调用顺序返回"""
+    barrier = threading.Barrier(3, timeout=5)
+
+    def slow(delay):
+        def handler(arguments):
+            barrier.wait()
+            time.sleep(delay)
+            return {"delay": delay, "query": arguments.get("query")}
+        return handler
+
+    tools = [_tool("slow_a", slow(0.3)), _tool("slow_b", slow(0.1)), _tool("slow_c", slow(0.2))]
+    calls = [ToolCall(f"call_{t.name}", t.name, {"query": t.name}) for t in tools]
+    start = time.monotonic()
+    results = execute_tool_calls(calls, tools)
+    elapsed = time.monotonic() - start
+    assert [r.call_id for r in results] == [c.id for c in calls]
+    assert not any(r.is_error for r in results), results
+    assert [json.loads(r.content)["query"] for r in results] == ["slow_a", "slow_b", "slow_c"]
+    assert elapsed < 0.55, elapsed
+
+
+def test_execute_errors():
+    """工具异常与未知工具都作为错误结果回传，不影响同一轮的其他工具"""
+    def broken(arguments):
+        raise ValueError("数据源不可用")
+
+    tools = [_tool("ok", lambda arguments: "正常结果"), _tool("broken", broken)]
+    calls = [ToolCall("1", "broken"), ToolCall("2", "ok"), ToolCall("3", "missing")]
+    results = execute_tool_calls(calls, tools, max_tokens=50)
+    assert [r.is_error for r in results] == [True, False, True]
+    assert results[0].content == "Error: 数据源不可用"
+    assert results[1].content == "正常结果"
+    assert results[2].content.startswith("Error:") and "missing" in results[2].content
+
+
+def _register(prefix, calls):
+    """注册两个记录调用次数的工具"""
+    registry = get_tool_registry()
+    names = [f"{prefix}_weather", f"{prefix}_broken"]
+
+    def weather(arguments):
+        calls.append(names[0])
+        return {"city": arguments.get("city"), "weather": "晴"}
+
+    def broken(arguments):
+        calls.append(names[1])
+        raise RuntimeError("服务超时")
+
+    registry.register(_tool(names[0], weather))
+    registry.register(_tool(names[1], broken))
+    return names
+
+
+def test_chat_tool_loop_openai_shape():
+    """第一轮请求两个工具，第二轮收到 OpenAI 格式的工具结果后回答"""
+    calls, seen = [], []
+    names = _register("loop", calls)
+
+    def planner(model, messages, tools):
+        if messages[-1]["role"] == "tool":
+            seen.append(messages)
+            return []
+        return [{"name": names[0], "arguments": {"city": "北京"}}, {"name": names[1]}]
+
+    get_mock_registry().configure("mock/tool-loop", tool_planner=planner,
+                                  responder=lambda model, messages: "北京今天晴")
+    agent = AgentManager().create_agent("工具", "mock/tool-loop", "助手", tools=names)
+    assert agent.chat("北京天气怎么样") == "北京今天晴"
+    assert sorted(calls) == sorted(names)
+    assert agent.stats["tool_calls"] == 2 and agent.stats["tool_errors"] == 1
+
+    messages = seen[-1]
+    assistant, first, second = messages[-3:]
+    assert assistant["role"] == "assistant" and assistant["content"] is None
+    ids = [c["id"] for c in assistant["tool_calls"]]
+    assert [c["function"]["name"] for c in assistant["tool_calls"]] == names
+    assert json.loads(assistant["tool_calls"][0]["function"]["arguments"]) == {"city": "北京"}
+    assert [first["role"], second["role"]] == ["tool", "tool"]
+    assert [first["tool_call_id"], second["tool_call_id"]] == ids
+    assert json.loads(first["content"])["weather"] == "晴"
+    assert second["content"] == "Error: 服务超时"
+
+
+def test_choice_none_after_max_rounds():
+    """模型一直请求工具时，max_tool_rounds 轮后以 choice="none" 要求直接回答"""
+    calls = []
+    names = _register("rounds", calls)
+    planner = lambda model, messages, tools: [{"name": names[0], "arguments": {"city": "上海"}}]
+    get_mock_registry().configure("mock/tool-rounds", tool_planner=planner,
+                                  responder=lambda model, messages: "最终回答")
+    agent = AgentManager().create_agent("轮数", "mock/tool-rounds", "助手",
+                                        tools=[names[0]], max_tool_rounds=2)
+    assert agent.chat("上海天气") == "最终回答"
+    assert calls == [names[0], names[0]]
+
+    toolset = ToolSet(agent.tools)
+    assert agent._next_toolset(toolset, 1).choice == "auto"
+    assert agent._next_toolset(toolset, 2).choice == "none"
+    openai_params = agent._tool_params(agent.routes[0], agent._next_toolset(toolset, 2))
+    assert openai_params["tool_choice"] == "none" and len(openai_params["tools"]) == 1
+
+
+def test_anthropic_shape():
+    """tool_use 块与合并为一条 user 消息的 tool_result 块（错误结果带 is_error）"""
+    calls = []
+    names = _register("claude", calls)
+    agent = AgentManager().create_agent("Claude", "claude-3-5-haiku-latest", "助手",
+                                        tools=names, prompt_cache=False)
+    completion = Completion("我查一下", agent.routes[0], tool_calls=[
+        ToolCall("toolu_1", names[0], {"city": "北京"}), ToolCall("toolu_2", names[1])
+    ])
+    results = agent.run_tools(completion.tool_calls)
+    turns = [{"role": "user", "content": "北京天气怎么样"}] + agent._tool_turns(completion, results)
+    messages = agent._anthropic_messages(turns)
+
+    assert [m["role"] for m in messages] == ["user", "assistant", "user"]
+    assert messages[1]["content"] == [
+        {"type": "text", "text": "我查一下"},
+        {"type": "tool_use", "id": "toolu_1", "name": names[0], "input": {"city": "北京"}},
+        {"type": "tool_use", "id": "toolu_2", "name": names[1], "input": {}},
+    ]
+    first, second = messages[2]["content"]
+    assert (first["type"], first["tool_use_id"], first.get("is_error")) == ("tool_result", "toolu_1", None)
+    assert (second["tool_use_id"], second["is_error"]) == ("toolu_2", True)
+
+    params = agent._tool_params(agent.routes[0], ToolSet(agent.tools, choice="none"))
+    assert params["tool_choice"] == {"type": "none"}
+    assert params["tools"][0]["input_schema"]["type"] == "object"
+
+
+def test_stream_runs_tool_loop():
+    """配置了工具的智能体流式对话时同样执行工具，产出的回复与 chat 一致"""
+    calls = []
+    names = _register("stream", calls)
+
+    def planner(model, messages, tools):
+        return [] if messages[-1]["role"] == "tool" else [{"name": names[0]}]
+
+    get_mock_registry().configure("mock/tool-stream", tool_planner=planner,
+                                  responder=lambda model, messages: "查好了")
+    agent = AgentManager().create_agent("流式", "mock/tool-stream", "助手", tools=[names[0]])
+    assert "".join(agent.chat_stream("天气")) == "查好了"
+    assert calls == [names[0]]
+
+
+def test_tools_bypass_cache():
+    """带工具的请求每次都执行工具；无工具请求的缓存回复不会返回给带工具的请求"""
+    calls = []
+    names = _register("cache", calls)
+
+    def planner(model, messages, tools):
+        return [] if messages[-1]["role"] == "tool" else [{"name": names[0]}]
+
+    get_mock_registry().configure("mock/tool-cache", tool_planner=planner,
+                                  responder=lambda model, messages: messages[-1]["role"])
+    agent = AgentManager().create_agent("缓存", "mock/tool-cache", "助手",
+                                        tools=[names[0]], cache=True)
+    prompt = f"缓存测试 {time.time()}"
+    assert agent.chat(prompt, context={"tools": False}) == "user"
+    assert agent.chat(prompt) == "tool"
+    assert agent.chat(prompt) == "tool"
+    assert calls == [names[0], names[0]]
+    assert agent.chat(prompt, context={"tools": False}) == "user"
+    assert agent.stats["cache_hits"] == 1
+
+
+if __name__ == "__main__":
+    for name, fn in list(globals().items()):
+        if name.startswith("test_") and callable(fn):
+            fn()
+            print(f"✅ {name}")
@@ -0,0 +1,81 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+多轮会话测试（使用本地模拟模型，不需要 API key）
+
+覆盖：
+- 摘要函数在会话锁外调用，摘要期间其他线程可以读写历史
+- 异步路径的摘要不在事件循环线程中执行
+
+用法:
+    python examples/test_chat_session.py
+"""
+import os
+import sys
+import time
+import asyncio
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scripts.agent_manager import AgentManager
+from scripts.chat_session import ChatSession, truncate_summary
+from scripts.mock_provider import get_mock_registry
+
+
+def test_summarizer_runs_outside_lock():
+    """慢摘要进行时，build / observe 不被阻塞，移出的轮次仍随请求发送"""
+    started = threading.Event()
+    release = threading.Event()
+
+    def slow_summarizer(summary, evicted, max_tokens):
+        started.set()
+        release.wait(5)
+        return truncate_summary(summary, evicted, max_tokens)
+
+    session = ChatSession(None, "s", max_tokens=20, keep_recent=2, summarizer=slow_summarizer)
+    session.record("第一个问题" * 10, "第一个回答" * 10)
+    worker = threading.Thread(target=session.record, args=("第二个问题", "第二个回答"))
+    worker.start()
+    assert started.wait(5)
+
+    begin = time.monotonic()
+    turns = session.build("第三个问题")
+    session.observe("小王", "插一句")
+    assert time.monotonic() - begin < 0.5
+    # 正在摘要的轮次仍在请求中
+    assert "第一个问题" in turns[0]["content"], turns
+
+    release.set()
+    worker.join(5)
+    assert "第一个问题" in session.summary
+    assert session.build("第三个问题")[0]["role"] == "system"
+
+
+def test_async_summarizer_off_loop():
+    """achat 写回会话时，摘要在线程池中执行"""
+    get_mock_registry().configure("mock/session", response_tokens=20)
+    agent = AgentManager().create_agent("会话测试", "mock/session", "测试角色", cache=False)
+    threads = []
+
+    def summarizer(summary, evicted, max_tokens):
+        threads.append(threading.current_thread())
+        return truncate_summary(summary, evicted, max_tokens)
+
+    session = agent.session("async", max_tokens=20, keep_recent=2, summarizer=summarizer)
+
+    async def run():
+        for i in range(3):
+            await session.achat(f"问题 {i}")
+
+    asyncio.run(run())
+    assert threads, "未触发摘要"
+    assert threading.main_thread() not in threads
+    assert session.summary
+
+
+if __name__ == "__main__":
+    for name, fn in list(globals().items()):
+        if name.startswith("test_") and callable(fn):
+            fn()
+            print(f"✅ {name}")
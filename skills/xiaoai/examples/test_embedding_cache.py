@@ -0,0 +1,118 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+嵌入缓存测试（缓存文件写入临时目录，不需要 API key）
+
+覆盖：
+- 磁盘层条数有界（轮转），重启后仍能读到最近的嵌入
+- 未命中时不逐次检查文件系统（无磁盘文件的模型、其他进程的追加）
+- 进程级缓存默认不写磁盘，本地哈希嵌入不经缓存
+
+用法:
+    python examples/test_embedding_cache.py
+"""
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scripts.embedding_cache import EmbeddingCache, get_embedding_cache
+from scripts.memory_store import VectorMemoryStore
+
+
+def _vector(i, dim=8):
+    return [float(i + j) for j in range(dim)]
+
+
+def _disk_files(cache_dir):
+    return sorted(name for name in os.listdir(cache_dir) if ".emb" in name)
+
+
+def test_disk_tier_bounded():
+    """写入远超上限的条数，磁盘层至多保留两代"""
+    cache_dir = tempfile.mkdtemp()
+    cache = EmbeddingCache(max_entries=16, cache_dir=cache_dir, max_disk_entries=100)
+    for i in range(1000):
+        cache.set("m", f"文本 {i}", _vector(i))
+        # 热点文本持续被读取，跨轮转保留
+        cache._memory.clear()
+        assert cache.get("m", "文本 0") is not None
+    assert cache.get_stats()["disk_entries"] <= 200
+    assert len(_disk_files(cache_dir)) == 2
+    record = 32 + 4 * 8
+    for name in _disk_files(cache_dir):
+        assert os.path.getsize(os.path.join(cache_dir, name)) <= 16 + 100 * record
+    cache.close()
+
+    # 重启：最近写入的与热点文本仍在磁盘层，最早的已被淘汰
+    cache = EmbeddingCache(max_entries=16, cache_dir=cache_dir, max_disk_entries=100)
+    assert list(cache.get("m", "文本 999")) == _vector(999)
+    assert list(cache.get("m", "文本 0")) == _vector(0)
+    assert cache.get("m", "文本 1") is None
+    assert cache.get_stats()["disk_entries"] <= 200
+    cache.close()
+
+
+def test_miss_checks_throttled():
+    """连续未命中只在间隔到期时检查文件系统"""
+    cache_dir = tempfile.mkdtemp()
+    cache = EmbeddingCache(cache_dir=cache_dir, refresh_interval=60)
+    calls = {"exists": 0, "fstat": 0, "stat": 0}
+    originals = {name: getattr(os.path if name == "exists" else os, name) for name in calls}
+
+    def counting(name):
+        def wrapper(*args, **kwargs):
+            calls[name] += 1
+            return originals[name](*args, **kwargs)
+        return wrapper
+
+    cache.set("有文件", "已有", _vector(1))
+    os.path.exists, os.fstat, os.stat = counting("exists"), counting("fstat"), counting("stat")
+    try:
+        for i in range(100):
+            assert cache.get("无文件", f"未命中 {i}") is None
+            assert cache.get("有文件", f"未命中 {i}") is None
+    finally:
+        os.path.exists, os.fstat, os.stat = (originals["exists"], originals["fstat"],
+                                             originals["stat"])
+    assert calls["exists"] <= 1, calls
+    # os.path.exists 内部也调用 os.stat
+    assert calls["fstat"] == 0 and calls["stat"] <= calls["exists"], calls
+    cache.close()
+
+
+def test_sees_other_process_appends():
+    """间隔到期后能读到其他实例（进程）追加的记录"""
+    cache_dir = tempfile.mkdtemp()
+    reader = EmbeddingCache(cache_dir=cache_dir, refresh_interval=0)
+    writer = EmbeddingCache(cache_dir=cache_dir, refresh_interval=0)
+    assert reader.get("m", "共享") is None
+    writer.set("m", "共享", _vector(7))
+    assert list(reader.get("m", "共享")) == _vector(7)
+    reader.close()
+    writer.close()
+
+
+def test_process_cache_opt_in():
+    """进程级缓存默认只用内存层；默认嵌入的 VectorMemoryStore 不经缓存"""
+    cache = get_embedding_cache()
+    assert cache.cache_dir is None
+    before = cache.get_stats()
+    store = VectorMemoryStore()
+    store.remember("k", "不经缓存的文本")
+    store.semantic_search("不经缓存的文本", top_k=1)
+    after = cache.get_stats()
+    assert (after["hits"], after["misses"]) == (before["hits"], before["misses"])
+
+    cached = VectorMemoryStore(embedder=lambda text: _vector(len(text)), embedding_model="test-model")
+    cached.remember("k", "经缓存的文本")
+    assert cache.get("test-model", "经缓存的文本") is not None
+    assert cache.get_stats()["disk_entries"] == 0
+
+
+if __name__ == "__main__":
+    for name, fn in list(globals().items()):
+        if name.startswith("test_") and callable(fn):
+            fn()
+            print(f"✅ {name}")
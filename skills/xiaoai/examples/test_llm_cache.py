@@ -0,0 +1,184 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+LLM 缓存与请求合并测试（不需要 API key）
+
+覆盖：
+- 请求合并的执行方被取消时，等待方仍拿到结果
+- 智能体只在 temperature == 0 时合并并发的相同请求，temperature > 0 时每次独立采样
+- 默认 n-gram 嵌入的语义缓存不误命中只差一两个字的提问
+- 配置嵌入模型的智能体：同一问题的不同问法命中，其他问题不命中；每个嵌入一个缓存
+
+用法:
+    python examples/test_llm_cache.py
+"""
+import os
+import sys
+import types
+import asyncio
+import hashlib
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scripts.agent_manager import AgentManager
+from scripts.llm_cache import (
+    SingleFlight, SemanticCache, EMBEDDING_THRESHOLD, NGRAM_THRESHOLD, get_semantic_cache
+)
+from scripts.mock_provider import get_mock_registry
+
+
+def test_single_flight_leader_cancelled():
+    """执行方被取消，等待方接替执行并拿到结果"""
+    flight = SingleFlight()
+    runs = []
+
+    def call(name):
+        async def fn():
+            runs.append(name)
+            await asyncio.sleep(0.05)
+            return f"回复（{name}）"
+        return fn
+
+    async def run():
+        leader = asyncio.ensure_future(flight.ado("key", call("leader")))
+        await asyncio.sleep(0.01)
+        followers = [asyncio.ensure_future(flight.ado("key", call(f"follower{i}")))
+                     for i in range(3)]
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        results = await asyncio.gather(*followers)
+        assert leader.cancelled()
+        return results
+
+    results = asyncio.run(run())
+    # 只有一个等待方接替执行，其余共享它的结果
+    assert runs == ["leader", "follower0"], runs
+    assert results == [("回复（follower0）", False),
+                       ("回复（follower0）", True),
+                       ("回复（follower0）", True)], results
+    assert flight.get_stats()["in_flight"] == 0
+
+
+def test_single_flight_shares_errors():
+    """执行方抛出普通异常时，等待方收到同一异常"""
+    flight = SingleFlight()
+
+    async def fail():
+        await asyncio.sleep(0.02)
+        raise RuntimeError("上游错误")
+
+    async def run():
+        tasks = [asyncio.ensure_future(flight.ado("key", fail)) for _ in range(3)]
+        return await asyncio.gather(*tasks, return_exceptions=True)
+
+    errors = asyncio.run(run())
+    assert all(isinstance(e, RuntimeError) for e in errors), errors
+    assert flight.calls == 1 and flight.coalesced == 2
+
+
+def test_agent_single_flight_only_greedy():
+    """并发的相同请求：temperature > 0 各自采样，temperature == 0 合并为一次"""
+    async def burst(agent, n=4):
+        return await asyncio.gather(*(agent.achat("写一句口号") for _ in range(n)))
+
+    registry = get_mock_registry()
+    for model, temperature, calls in (("sample", 0.7, 4), ("greedy", 0.0, 1)):
+        registry.configure(model, response_tokens=5, ttft=0.2)
+        agent = AgentManager().create_agent("口号", f"mock/{model}", "文案", temperature=temperature)
+        replies = asyncio.run(burst(agent))
+        assert len(set(replies)) == 1
+        assert registry.get_stats()[model]["calls"] == calls, model
+        assert agent.stats["coalesced"] == 4 - calls
+
+
+def test_semantic_cache_no_false_hits():
+    """n-gram 嵌入下，意思不同但字面相近的提问不命中"""
+    cache = SemanticCache()
+    assert cache.threshold == NGRAM_THRESHOLD
+    ns = SemanticCache.namespace("mock/x", "助手", 0.7)
+    cache.set(ns, "今天北京天气怎么样", "今天晴")
+    cache.set(ns, "plan A", "A 方案")
+    assert cache.get(ns, "明天北京天气怎么样") is None
+    assert cache.get(ns, "plan B") is None
+    # 只差大小写、空白和句末标点时仍然命中
+    assert cache.get(ns, "今天北京天气怎么样？") == "今天晴"
+    assert cache.get(ns, "Plan  A") == "A 方案"
+
+
+def test_semantic_cache_embedder_threshold():
+    """传入真实嵌入函数时使用较低的默认阈值"""
+    cache = SemanticCache(embedder=lambda text: [1.0, float(len(text))])
+    assert cache.threshold == EMBEDDING_THRESHOLD
+    assert SemanticCache(threshold=0.9).threshold == 0.9
+
+
+# 模拟的嵌入服务：同一主题的问法向量相近（主题维度为 1，其余维度为按文本散列的小扰动）
+TOPICS = {"报销": 0, "报账": 0, "发票": 0, "请假": 1, "休假": 1, "天气": 2}
+
+
+class TopicEmbeddings:
+    def __init__(self):
+        self.requests = 0
+
+    def create(self, model, input):
+        self.requests += 1
+        digest = hashlib.sha256(input.encode("utf-8")).digest()
+        vector = [0.15 * (b / 255 - 0.5) for b in digest[:8]]
+        for word, topic in TOPICS.items():
+            if word in input:
+                vector[topic] = 1.0
+        return types.SimpleNamespace(data=[types.SimpleNamespace(embedding=vector)])
+
+
+def test_agent_semantic_embedder_paraphrase():
+    """semantic_embedder 为嵌入模型名时，FAQ 的不同问法复用回答"""
+    embeddings = TopicEmbeddings()
+    saved = sys.modules.get("openai")
+    sys.modules["openai"] = types.SimpleNamespace(embeddings=embeddings, api_key=None)
+    try:
+        get_mock_registry().configure("mock/faq", response_tokens=5)
+        agent = AgentManager().create_agent(
+            "FAQ", "mock/faq", "客服", cache=False, semantic_cache=True,
+            semantic_embedder="test-embedding-faq"
+        )
+        assert agent.semantic_cache is get_semantic_cache("test-embedding-faq")
+        assert agent.semantic_cache is not get_semantic_cache()
+        assert agent.semantic_cache.threshold == EMBEDDING_THRESHOLD
+
+        answer = agent.chat("报销流程是怎样的？")
+        assert agent.chat("发票报销要走什么流程") == answer
+        assert agent.chat("怎么报账") == answer
+        assert agent.stats["semantic_hits"] == 2
+        # 其他问题不命中
+        agent.chat("请假流程是怎样的？")
+        agent.chat("今天天气怎么样")
+        assert agent.stats["semantic_hits"] == 2
+        assert embeddings.requests == 5
+    finally:
+        if saved is None:
+            sys.modules.pop("openai", None)
+        else:
+            sys.modules["openai"] = saved
+
+
+def test_semantic_embedder_failure_is_miss():
+    """嵌入服务不可用时语义缓存按未命中处理，请求照常完成"""
+    def broken(text):
+        raise ConnectionError("嵌入服务不可用")
+
+    get_mock_registry().configure("mock/faq-down", response_tokens=5)
+    agent = AgentManager().create_agent(
+        "FAQ 降级", "mock/faq-down", "客服", cache=False, semantic_cache=True,
+        semantic_embedder=broken
+    )
+    assert agent.chat("报销流程是怎样的？")
+    assert agent.chat("报销流程是怎样的？")
+    stats = agent.semantic_cache.get_stats()
+    assert stats["hits"] == 0 and stats["embed_errors"] == 4
+
+
+if __name__ == "__main__":
+    for name, fn in list(globals().items()):
+        if name.startswith("test_") and callable(fn):
+            fn()
+            print(f"✅ {name}")
@@ -0,0 +1,87 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+调用统计测试（使用本地模拟模型，不需要 API key）
+
+覆盖：
+- 不同管理器中的同名智能体各自统计，get_stats 互不混淆
+- 路由副本计入原智能体；by_agent 按名称合并同名实例
+- 动态创建又丢弃的智能体被回收后，其汇总随之删除，统计规模有界
+
+用法:
+    python examples/test_llm_metrics.py
+"""
+import os
+import gc
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scripts.agent_manager import AgentManager
+from scripts.llm_metrics import get_metrics
+from scripts.mock_provider import get_mock_registry
+
+
+def test_same_name_agents_separate():
+    """两个管理器各有一个“小爱”，调用次数分别统计"""
+    get_mock_registry().configure("mock/metrics", response_tokens=5)
+    first = AgentManager().create_agent("小爱", "mock/metrics", "群聊助手", cache=False)
+    second_manager = AgentManager()
+    second = second_manager.create_agent("小爱", "mock/metrics", "群聊助手", cache=False)
+    assert first.metrics_id != second.metrics_id
+
+    for _ in range(3):
+        first.chat("你好")
+    second.chat("你好")
+
+    stats = second_manager.get_stats()["小爱"]["models"]
+    assert stats["mock/metrics"]["calls"] == 1, stats
+    assert get_metrics().for_agent(first.metrics_id)["mock/metrics"]["calls"] == 3
+
+    merged = get_metrics().by_agent(["小爱"])["小爱"]["mock/metrics"]
+    assert merged["calls"] >= 4
+    assert merged["outcomes"]["ok"] >= 4
+
+
+def test_variant_counts_for_owner():
+    """按模型路由出的副本与原智能体共用统计"""
+    get_mock_registry().configure("mock/metrics-main", response_tokens=5)
+    get_mock_registry().configure("mock/metrics-alt", response_tokens=5)
+    manager = AgentManager()
+    agent = manager.create_agent("路由", "mock/metrics-main", "助手", cache=False)
+    agent.chat("你好")
+    agent.chat("你好", context={"model": "mock/metrics-alt"})
+    models = manager.get_stats()["路由"]["models"]
+    assert models["mock/metrics-main"]["calls"] == 1, models
+    assert models["mock/metrics-alt"]["calls"] == 1, models
+
+
+def test_discarded_agents_released():
+    """每条消息临时创建一个智能体：回收后汇总被删除，不随创建次数增长"""
+    get_mock_registry().configure("mock/metrics-temp", response_tokens=5)
+    metrics = get_metrics()
+    names = [f"临时-{i}" for i in range(200)]
+    sizes = []
+    for i, name in enumerate(names):
+        manager = AgentManager()
+        agent = manager.create_agent(name, "mock/metrics-temp", "一次性助手", cache=False)
+        agent.chat("你好")
+        agent.chat("你好", context={"model": "mock/metrics-main"})
+        metrics_id = agent.metrics_id
+        assert len(metrics.for_agent(metrics_id)) == 2
+        del manager, agent
+        if i % 50 == 49:
+            gc.collect()
+            assert metrics.by_agent(names) == {}
+            sizes.append(len(metrics._by_agent))
+    gc.collect()
+    assert metrics.for_agent(metrics_id) == {}
+    assert metrics.by_agent(names) == {}
+    assert max(sizes) - min(sizes) <= 2, sizes
+
+
+if __name__ == "__main__":
+    for name, fn in list(globals().items()):
+        if name.startswith("test_") and callable(fn):
+            fn()
+            print(f"✅ {name}")
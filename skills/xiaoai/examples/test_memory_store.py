@@ -0,0 +1,171 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+记忆存储测试（数据库写入临时目录，不需要 API key）
+
+覆盖：
+- Memory.embeddings 原样保留调用方的向量（float32 数组）
+- SQLite 存储仍持久化嵌入，重新打开后重建索引
+- 淘汰策略：条数有界，向量索引随淘汰同步缩减，TTL 过期
+- HybridMemoryStore 只从其他层级删除确实存在的 key，全新批量导入不产生删除
+- SQLite 存储的 HybridMemoryStore 各层级共用一个文件，单独清空、统计一个层级不影响其他层级
+
+用法:
+    python examples/test_memory_store.py
+"""
+import os
+import sys
+import math
+import tempfile
+from array import array
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scripts.memory_store import (
+    MemoryStore, VectorMemoryStore, HybridMemoryStore, MemoryType, EvictionPolicy
+)
+
+
+def _embed(text, dim=16):
+    seed = sum(ord(c) for c in text)
+    return [math.sin(seed * (j + 1)) for j in range(dim)]
+
+
+def test_embeddings_round_trip():
+    """Memory.embeddings 保留调用方传入的原始向量（float32 数组，不归一化）"""
+    store = VectorMemoryStore(embedder=_embed)
+    memory = store.remember("k", "带嵌入", embeddings=[3.0, 4.0, 0.0, 12.0])
+    assert isinstance(memory.embeddings, array) and memory.embeddings.typecode == "f"
+    assert list(memory.embeddings) == [3.0, 4.0, 0.0, 12.0]
+    assert list(store.recall_by_key("k", MemoryType.VECTOR).embeddings) == [3.0, 4.0, 0.0, 12.0]
+
+    batch = VectorMemoryStore(embedder=_embed)
+    written = batch.remember_many([{"key": f"b{i}", "value": f"批量 {i}"} for i in range(10)])
+    for item in written:
+        expected = array("f", _embed(item.value))
+        assert item.embeddings == expected, item.key
+        assert batch.recall_by_key(item.key, MemoryType.VECTOR).embeddings == expected
+    assert len(batch.index) == 10
+    assert batch.semantic_search("批量 3", top_k=1)[0].key == "b3"
+
+    batch.forget("b3")
+    assert "b3" not in batch.index and len(batch.index) == 9
+
+
+def test_sqlite_persists_embeddings():
+    """SQLite 存储重新打开后从持久化的嵌入重建索引"""
+    db_path = os.path.join(tempfile.mkdtemp(), "memory.db")
+    store = VectorMemoryStore(embedder=_embed, store_type="sqlite", db_path=db_path)
+    store.remember_many([{"key": f"m{i}", "value": f"消息 {i}"} for i in range(20)])
+    store.close()
+
+    reopened = VectorMemoryStore(embedder=_embed, store_type="sqlite", db_path=db_path)
+    assert len(reopened.index) == 20
+    assert reopened.recall_by_key("m7", MemoryType.VECTOR).embeddings == array("f", _embed("消息 7"))
+    assert reopened.semantic_search("消息 7", top_k=1)[0].key == "m7"
+    reopened.close()
+
+
+def test_eviction_bounded():
+    """持续写入时条数不超过上限 + check_every，淘汰的向量同步移出索引"""
+    policy = EvictionPolicy(max_entries=100, check_every=8)
+    store = VectorMemoryStore(embedder=_embed, policies={MemoryType.VECTOR: policy})
+    for i in range(1000):
+        store.remember(f"m{i}", f"消息 {i}")
+        count = len(store.memories[MemoryType.VECTOR])
+        assert count <= policy.max_entries + policy.check_every, (i, count)
+        assert len(store.index) == count
+    assert store.evicted["capacity"] >= 1000 - policy.max_entries - policy.check_every
+    # 重要性相同时先淘汰较早写入的
+    assert "m999" in store.memories[MemoryType.VECTOR]
+    assert "m0" not in store.memories[MemoryType.VECTOR]
+
+    store.remember_many([{"key": f"n{i}", "value": f"批量 {i}"} for i in range(1000)])
+    count = len(store.memories[MemoryType.VECTOR])
+    assert count <= policy.max_entries + policy.check_every
+    assert len(store.index) == count
+
+
+def test_ttl_eviction():
+    """超过 ttl 的记忆在整理时过期"""
+    store = MemoryStore(policies={MemoryType.WORKING: EvictionPolicy(ttl=60)})
+    store.remember("旧", "旧消息", MemoryType.WORKING)
+    store.remember("新", "新消息", MemoryType.WORKING)
+    store.recall_by_key("旧", MemoryType.WORKING).timestamp -= 120
+    assert store.evict(MemoryType.WORKING) == 1
+    assert store.recall_by_key("旧", MemoryType.WORKING) is None
+    assert store.recall_by_key("新", MemoryType.WORKING) is not None
+
+
+def test_hybrid_moves_between_tiers():
+    """重要性变化时记忆移到新层级，旧层级中的副本被删除"""
+    store = HybridMemoryStore()
+    store.remember("k", "先是工作记忆", importance=0.3)
+    store.remember("k", "升为长期与向量记忆", importance=0.9)
+    assert store.working.recall_by_key("k", MemoryType.WORKING) is None
+    assert store.long_term.recall_by_key("k", MemoryType.LONG_TERM) is not None
+    assert "k" in store.vector.index
+
+    store.remember_many([{"key": "k", "value": "降回工作记忆", "importance": 0.1}])
+    assert store.long_term.recall_by_key("k", MemoryType.LONG_TERM) is None
+    assert "k" not in store.vector.index
+    assert store.recall_by_key("k").value == "降回工作记忆"
+
+
+def test_hybrid_bulk_import_no_deletes():
+    """SQLite 存储全新导入时不对其他层级执行 DELETE；已存在的 key（含未提交的）仍被移除"""
+    db_path = os.path.join(tempfile.mkdtemp(), "memory.db")
+    store = HybridMemoryStore(store_type="sqlite", db_path=db_path)
+    statements = []
+    for tier, _ in store._tiers():
+        tier.backend._conn.set_trace_callback(statements.append)
+    store.remember_many([{"key": f"m{i}", "value": f"消息 {i}"} for i in range(1200)])
+    store.flush()
+    assert not [sql for sql in statements if sql.lstrip().upper().startswith("DELETE")]
+
+    store.remember("m5", "升为长期记忆", importance=0.7)           # 已提交到数据库
+    store.remember("new", "未提交的工作记忆", importance=0.3)      # 仍在写入缓冲区
+    store.remember_many([{"key": "new", "value": "升为长期记忆", "importance": 0.7}])
+    for key in ("m5", "new"):
+        assert store.working.recall_by_key(key, MemoryType.WORKING) is None, key
+        assert store.long_term.recall_by_key(key, MemoryType.LONG_TERM) is not None, key
+    store.close()
+
+
+def test_hybrid_sqlite_tiers_isolated():
+    """清空工作记忆层级不删除长期、向量记忆；各层级统计只计自己的记忆；重新打开后一致"""
+    db_path = os.path.join(tempfile.mkdtemp(), "memory.db")
+    store = HybridMemoryStore(store_type="sqlite", db_path=db_path, namespace="产品群")
+    store.remember_many(
+        [{"key": f"w{i}", "value": f"闲聊 {i}", "importance": 0.3} for i in range(5)] +
+        [{"key": f"l{i}", "value": f"决定 {i}", "importance": 0.7} for i in range(3)] +
+        [{"key": f"v{i}", "value": f"目标 {i}", "importance": 0.9} for i in range(2)]
+    )
+    assert store.working.get_stats() == {"working": 5, "long_term": 0, "vector": 0, "total": 5}
+    assert store.long_term.get_stats()["total"] == 5      # l0-l2 与 v0-v1
+    assert store.vector.get_stats() == {"working": 0, "long_term": 0, "vector": 2, "total": 2}
+    assert len(store.working) == 5 and len(store.vector) == 2
+
+    store.working.clear()
+    assert store.recall_by_key("w0") is None
+    assert store.long_term.get_stats()["total"] == 5 and len(store.vector.index) == 2
+    assert store.recall_by_key("l1").value == "决定 1"
+    assert store.vector.semantic_search("目标 1", top_k=1)[0].key == "v1"
+
+    store.long_term.clear()
+    assert store.vector.recall_by_key("v0").value == "目标 0"
+    assert len(store.vector.index) == 2
+    store.close()
+
+    reopened = HybridMemoryStore(store_type="sqlite", db_path=db_path, namespace="产品群")
+    assert reopened.working.get_stats()["total"] == 0
+    assert reopened.long_term.get_stats()["total"] == 0
+    assert reopened.vector.get_stats()["vector"] == 2 and len(reopened.vector.index) == 2
+    reopened.close()
+
+
+if __name__ == "__main__":
+    for name, fn in list(globals().items()):
+        if name.startswith("test_") and callable(fn):
+            fn()
+            print(f"✅ {name}")
@@ -0,0 +1,105 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+提示词预算测试（不需要 API key）
+
+覆盖：
+- fit_turns 整组丢弃工具调用轮次，保留的历史不以 tool 轮次开头
+- tiktoken 按需导入，加载失败不重试
+
+用法:
+    python examples/test_prompt_budget.py
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scripts import prompt_budget
+from scripts.prompt_budget import PromptBudget
+
+
+def _tool_round(i):
+    return [
+        {"role": "assistant", "content": "",
+         "tool_calls": [{"id": f"call_{i}", "type": "function",
+                         "function": {"name": "search", "arguments": '{"q": "天气"}'}}]},
+        {"role": "tool", "content": f"搜索结果 {i} " + "数据" * 40,
+         "tool_call_id": f"call_{i}", "name": "search"},
+        {"role": "tool", "content": f"补充结果 {i} " + "数据" * 40,
+         "tool_call_id": f"call_{i}", "name": "search"},
+    ]
+
+
+def _check(turns):
+    """每个 tool 轮次前都有发起调用的 assistant 轮次，历史以 user 开头"""
+    chat = [t for t in turns if t["role"] != "system"]
+    assert chat[0]["role"] == "user", chat[0]
+    calls = set()
+    for t in chat:
+        if t.get("tool_calls"):
+            calls = {c["id"] for c in t["tool_calls"]}
+        elif t["role"] == "tool":
+            assert t["tool_call_id"] in calls, t
+        else:
+            calls = set()
+
+
+def test_fit_turns_drops_tool_groups():
+    """不同预算下裁剪都不会拆开工具调用组"""
+    turns = [{"role": "system", "content": "早前对话摘要"}]
+    for i in range(4):
+        turns.append({"role": "user", "content": f"问题 {i} " + "内容" * 20})
+        turns.extend(_tool_round(i))
+        turns.append({"role": "assistant", "content": f"回答 {i} " + "内容" * 20})
+    turns.append({"role": "user", "content": "最新的问题"})
+
+    full = PromptBudget(10 ** 6).count
+    total = sum(full(t["content"]) for t in turns)
+    for budget in range(50, total, 17):
+        fitted, trimmed = PromptBudget(budget).fit_turns("系统", turns)
+        _check(fitted)
+        assert fitted[0]["role"] == "system"
+        assert fitted[-1]["content"] == "最新的问题"
+
+
+def test_fit_turns_never_starts_with_tool():
+    """历史开头是孤立的工具结果时一并丢弃"""
+    turns = _tool_round(0)[1:] + [
+        {"role": "user", "content": "问题 " + "内容" * 50},
+        {"role": "assistant", "content": "回答"},
+        {"role": "user", "content": "最新的问题"},
+    ]
+    fitted, _ = PromptBudget(60).fit_turns("", turns)
+    assert fitted[0]["role"] == "user", fitted
+
+
+def test_tiktoken_failure_cached():
+    """tiktoken 导入失败只尝试一次"""
+    if prompt_budget._tiktoken is None:
+        prompt_budget._import_tiktoken()
+    loaded = prompt_budget._tiktoken
+    attempts = []
+    saved = sys.modules.get("tiktoken")
+    try:
+        sys.modules["tiktoken"] = None  # 模拟导入失败
+        prompt_budget._tiktoken = None
+        prompt_budget._encoding.cache_clear()
+        for _ in range(3):
+            attempts.append(prompt_budget._import_tiktoken())
+        assert attempts == [None, None, None]
+        assert prompt_budget._tiktoken is False
+    finally:
+        if saved is None:
+            sys.modules.pop("tiktoken", None)
+        else:
+            sys.modules["tiktoken"] = saved
+        prompt_budget._tiktoken = loaded
+        prompt_budget._encoding.cache_clear()
+
+
+if __name__ == "__main__":
+    for name, fn in list(globals().items()):
+        if name.startswith("test_") and callable(fn):
+            fn()
+            print(f"✅ {name}")
@@ -0,0 +1,87 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+RAG 引擎测试（模拟嵌入服务，不需要 API key）
+
+覆盖：嵌入服务中途降级为 64 维哈希嵌入时，不一致的分块被跳过，导入与检索不抛异常
+
+用法:
+    python examples/test_rag_engine.py
+"""
+import os
+import sys
+import types
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("XIAOAI_CACHE_DIR", tempfile.mkdtemp())
+
+from scripts.rag_engine import RAGEngine
+
+
+class FlakyEmbeddings:
+    """前 healthy 次请求返回 1536 维向量，之后失败"""
+
+    def __init__(self, healthy: int):
+        self.healthy = healthy
+
+    def create(self, model, input):
+        if self.healthy <= 0:
+            raise ConnectionError("嵌入服务不可用")
+        self.healthy -= 1
+        vector = [float((hash(input) >> i) & 1) for i in range(1536)]
+        return types.SimpleNamespace(data=[types.SimpleNamespace(embedding=vector)])
+
+
+def _with_openai(embeddings, fn):
+    saved = sys.modules.get("openai")
+    sys.modules["openai"] = types.SimpleNamespace(embeddings=embeddings, api_key=None)
+    try:
+        return fn()
+    finally:
+        if saved is None:
+            sys.modules.pop("openai", None)
+        else:
+            sys.modules["openai"] = saved
+
+
+def test_dimension_mismatch_skipped():
+    """首个文档以 1536 维建索引，降级后的分块与查询被跳过"""
+    rag = RAGEngine(embedding_model="test-embedding-dim", chunk_size=40, chunk_overlap=0)
+
+    def run():
+        rag.add_document("第一篇文档：" + "人工智能。" * 10)
+        indexed = len(rag.index)
+        rag.add_document("第二篇文档：" + "机器学习。" * 10)
+        return indexed
+
+    indexed = _with_openai(FlakyEmbeddings(healthy=2), run)
+    stats = rag.get_stats()
+    assert stats["total_documents"] == 2
+    assert rag.index.dim == 1536
+    assert len(rag.index) == indexed
+    assert stats["skipped_chunks"] == stats["total_chunks"] - indexed > 0
+    # 查询也降级：返回空结果而不是抛出维度错误
+    assert _with_openai(FlakyEmbeddings(healthy=0), lambda: rag.search("机器学习")) == []
+    assert _with_openai(FlakyEmbeddings(healthy=0),
+                        lambda: rag.search_batch(["人工智能", "机器学习"])) == [[], []]
+
+
+def test_offline_consistent():
+    """嵌入服务始终不可用时全部使用哈希嵌入，检索正常"""
+    rag = RAGEngine(embedding_model="test-embedding-offline", chunk_size=40, chunk_overlap=0)
+
+    def run():
+        rag.add_document("离线文档：" + "向量检索。" * 10)
+        return rag.search("离线文档", top_k=2)
+
+    results = _with_openai(FlakyEmbeddings(healthy=0), run)
+    assert rag.index.dim == 64 and rag.skipped_chunks == 0
+    assert len(results) == 2
+
+
+if __name__ == "__main__":
+    for name, fn in list(globals().items()):
+        if name.startswith("test_") and callable(fn):
+            fn()
+            print(f"✅ {name}")
@@ -0,0 +1,109 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+限流器测试（使用本地模拟模型，不需要 API key）
+
+覆盖：
+- 提前停止 / 取消的流式请求归还限流名额
+- 限流错误识别与 retry-after 解析
+- 故障切换后按实际出错的路由生成错误回复
+
+用法:
+    python examples/test_rate_limiter.py
+"""
+import os
+import sys
+import asyncio
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scripts.agent_manager import AgentManager
+from scripts.mock_provider import get_mock_registry, MockAPIError, MockRateLimitError
+from scripts.rate_limiter import is_rate_limited, parse_rate_limit_headers
+
+
+def _agent(model: str, **profile):
+    get_mock_registry().configure(model, response_tokens=50, **profile)
+    return AgentManager().create_agent("限流测试", model, "测试角色", cache=False)
+
+
+def _in_flight(agent):
+    return [limiter.in_flight for limiter in agent.routes[0].limiter.limiters]
+
+
+def test_abandoned_stream_releases():
+    """消费方 break 后名额归还"""
+    agent = _agent("mock/limiter-sync")
+    for i in range(3):
+        for _ in agent.chat_stream(f"问题 {i}"):
+            break
+    assert _in_flight(agent) == [0, 0], _in_flight(agent)
+
+
+def test_abandoned_async_stream_releases():
+    """异步流 break / aclose 后名额归还"""
+    agent = _agent("mock/limiter-async")
+
+    async def run():
+        for i in range(3):
+            stream = agent.achat_stream(f"问题 {i}")
+            async for _ in stream:
+                break
+            await stream.aclose()
+
+    asyncio.run(run())
+    assert _in_flight(agent) == [0, 0], _in_flight(agent)
+
+
+def test_cancelled_async_stream_releases():
+    """等待首 token 时任务被取消，名额归还"""
+    agent = _agent("mock/limiter-cancel", ttft=0.5)
+
+    async def consume():
+        async for _ in agent.achat_stream("慢问题"):
+            pass
+
+    async def run():
+        task = asyncio.ensure_future(consume())
+        await asyncio.sleep(0.05)
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+
+    asyncio.run(run())
+    assert _in_flight(agent) == [0, 0], _in_flight(agent)
+
+
+def test_is_rate_limited():
+    """只按状态码 / 异常类型识别限流，错误文本中的 "429" 不算"""
+    assert is_rate_limited(MockRateLimitError(0.1))
+    assert not is_rate_limited(MockAPIError("prompt is 4290 tokens too long", 400))
+    assert not is_rate_limited(ValueError("request id req_429abc"))
+
+
+def test_malformed_retry_after_ms():
+    """retry-after-ms 格式错误时不抛异常，退回 retry-after"""
+    assert parse_rate_limit_headers({"retry-after-ms": "250"})["retry_after"] == 0.25
+    assert parse_rate_limit_headers({"retry-after-ms": "soon", "retry-after": "2"})["retry_after"] == 2
+    assert "retry_after" not in parse_rate_limit_headers({"Retry-After-Ms": "soon"})
+
+
+def test_error_reply_uses_failing_route():
+    """主模型（Anthropic）失败后切换到模拟模型，最终错误按模拟模型的规则以文本返回"""
+    get_mock_registry().configure("mock/limiter-down", error_rate=1.0)
+    agent = AgentManager().create_agent(
+        "故障切换", "claude-3-5-haiku-latest", "测试角色",
+        fallback_models=["mock/limiter-down"], cache=False
+    )
+    assert agent.chat("你好").startswith("Error:")
+    reply = "".join(agent.chat_stream("你好"))
+    assert reply.startswith("Error:"), reply
+
+
+if __name__ == "__main__":
+    for name, fn in list(globals().items()):
+        if name.startswith("test_") and callable(fn):
+            fn()
+            print(f"✅ {name}")
@@ -1,36 +1,60 @@
 """
 Teamily AI Core
 多智能体协作核心能力包
+
+子模块按需加载：`from scripts import Agent` 只导入 agent_manager，
+GUI、企业微信、技能市场等模块在首次访问时才导入。
 """
 
-from .agent_manager import Agent, AgentConfig, AgentManager, ModelProvider
-from .memory_store import Memory, MemoryStore, VectorMemoryStore, HybridMemoryStore, MemoryType
-from .group_manager import Group, Message, Task, DiscussionResult, TaskResult, CollaborationStrategy
-from .rag_engine import RAGEngine, MultiSourceRAG, Document
+import importlib
+from typing import TYPE_CHECKING
 
 __version__ = "0.1.0"
 
-__all__ = [
+# 导出名称 -> 所在子模块
+_EXPORTS = {
     # Agent
-    "Agent",
-    "AgentConfig", 
-    "AgentManager",
-    "ModelProvider",
+    "Agent": ".agent_manager",
+    "AgentConfig": ".agent_manager",
+    "AgentManager": ".agent_manager",
+    "ModelProvider": ".agent_manager",
     # Memory
-    "Memory",
-    "MemoryStore",
-    "VectorMemoryStore", 
-    "HybridMemoryStore",
-    "MemoryType",
+    "Memory": ".memory_store",
+    "MemoryStore": ".memory_store",
+    "VectorMemoryStore": ".memory_store",
+    "HybridMemoryStore": ".memory_store",
+    "MemoryType": ".memory_store",
     # Group
-    "Group",
-    "Message",
-    "Task",
-    "DiscussionResult",
-    "TaskResult",
-    "CollaborationStrategy",
+    "Group": ".group_manager",
+    "Message": ".group_manager",
+    "Task": ".group_manager",
+    "DiscussionResult": ".group_manager",
+    "TaskResult": ".group_manager",
+    "CollaborationStrategy": ".group_manager",
     # RAG
-    "RAGEngine",
-    "MultiSourceRAG",
-    "Document"
-]
+    "RAGEngine": ".rag_engine",
+    "MultiSourceRAG": ".rag_engine",
+    "Document": ".rag_engine",
+}
+
+__all__ = list(_EXPORTS)
+
+if TYPE_CHECKING:
+    from .agent_manager import Agent, AgentConfig, AgentManager, ModelProvider
+    from .memory_store import Memory, MemoryStore, VectorMemoryStore, HybridMemoryStore, MemoryType
+    from .group_manager import Group, Message, Task, DiscussionResult, TaskResult, CollaborationStrategy
+    from .rag_engine import RAGEngine, MultiSourceRAG, Document
+
+
+def __getattr__(name: str):
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module, __name__), name)
+    # 缓存到包命名空间，之后的访问不再经过 __getattr__
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_EXPORTS))
@@ -4,19 +4,195 @@ Teamily AI Core - Agent Manager
 """
 
 import os
-from typing import Optional, List, Dict, Any
-from dataclasses import dataclass, field
+import json
+import time
+import threading
+import weakref
+from typing import Optional, List, Dict, Any, Iterator, AsyncIterator, Tuple
+from dataclasses import dataclass, field, replace
 from enum import Enum
 
+from .llm_cache import (
+    ResponseCache, SemanticCache, SingleFlight,
+    get_response_cache, get_semantic_cache, get_single_flight
+)
+from .rate_limiter import (
+    CompositeLimiter, get_rate_limiter_registry, is_rate_limited, retry_after_from_error
+)
+from .llm_router import get_latency_tracker, get_hedge_executor
+from .chat_session import ChatSession
+from .prompt_budget import PromptBudget, context_window
+from .agent_tools import (
+    Tool, ToolSet, ToolCall, ToolResult, execute_tool_calls, aexecute_tool_calls,
+    get_tool_registry, parse_arguments
+)
+from .llm_metrics import (
+    CallRecord, MetricsCollector, current_scope, estimate_tokens, get_metrics, new_agent_id,
+    usage_from_response
+)
+
 class ModelProvider(Enum):
     ANTHROPIC = "anthropic"
     OPENAI = "openai"
     OPENROUTER = "openrouter"
     NVIDIA = "nvidia"
+    MOCK = "mock"  # 本地模拟模型（mock/ 前缀），用于离线基准测试
 
     @property
     def is_openai_compatible(self):
-        return self in (ModelProvider.OPENAI, ModelProvider.OPENROUTER, ModelProvider.NVIDIA)
+        return self in (ModelProvider.OPENAI, ModelProvider.OPENROUTER,
+                        ModelProvider.NVIDIA, ModelProvider.MOCK)
+
+
+# OpenAI 兼容端点
+PROVIDER_BASE_URLS = {
+    ModelProvider.OPENROUTER: "https://openrouter.ai/api/v1",
+    ModelProvider.NVIDIA: "https://integrate.api.nvidia.com/v1",
+}
+
+# 异步连接池参数（每个 provider 一个连接池，所有 Agent 共用）
+ASYNC_POOL_LIMITS = {
+    "max_connections": 100,
+    "max_keepalive_connections": 20,
+}
+
+class ClientRegistry:
+    """
+    进程级 LLM 客户端注册表
+    
+    按 (provider, model, api_key) 复用客户端，所有 AgentManager / Agent 共享，
+    避免每次对话都重新构造客户端并重新建立 TLS 连接。
+    只有 NVIDIA 的 LangChain 客户端与模型绑定；其余 provider 的客户端与模型无关，
+    model 维度统一记为空字符串，同一个 key 的所有模型共用连接。
+    """
+    
+    def __init__(self):
+        self._clients: Dict[tuple, Any] = {}
+        # 事件循环 -> {key: 异步客户端}
+        # httpx 连接绑定在创建它的事件循环上，因此按循环隔离，循环销毁后自动释放
+        self._async_clients: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+    
+    @staticmethod
+    def _key(provider: ModelProvider, model: str, api_key: Optional[str]) -> tuple:
+        if provider != ModelProvider.NVIDIA:
+            model = ""
+        return (provider, model, api_key or "")
+    
+    def get(self, provider: ModelProvider, model: str, api_key: Optional[str]):
+        """获取同步客户端"""
+        key = self._key(provider, model, api_key)
+        with self._lock:
+            client = self._clients.get(key)
+            if client is None:
+                client = self._create(provider, model, api_key)
+                self._clients[key] = client
+            return client
+    
+    def get_async(self, provider: ModelProvider, api_key: Optional[str]):
+        """获取当前事件循环下的共享异步客户端（所有 provider 均走 HTTP 连接池，与模型无关）"""
+        import asyncio
+        loop = asyncio.get_running_loop()
+        key = self._key(provider, "", api_key)
+        with self._lock:
+            clients = self._async_clients.setdefault(loop, {})
+            client = clients.get(key)
+            if client is None:
+                client = self._create_async(provider, api_key)
+                clients[key] = client
+            return client
+    
+    def _create(self, provider: ModelProvider, model: str, api_key: Optional[str]):
+        """创建同步客户端"""
+        if provider == ModelProvider.ANTHROPIC:
+            import anthropic
+            return anthropic.Anthropic(api_key=api_key)
+        
+        if provider == ModelProvider.MOCK:
+            from .mock_provider import MockClient
+            return MockClient()
+        
+        if provider == ModelProvider.NVIDIA:
+            # 使用 LangChain NVIDIA wrapper
+            from langchain_nvidia_ai_endpoints import ChatNVIDIA
+            return ChatNVIDIA(model=model, nvidia_api_key=api_key)
+        
+        # 使用独立的客户端实例，不修改 openai 模块的全局配置，
+        # 避免 OpenRouter 的 base_url 串到 OpenAI 智能体上
+        import openai
+        return openai.OpenAI(
+            api_key=api_key,
+            base_url=PROVIDER_BASE_URLS.get(provider)
+        )
+    
+    def _create_async(self, provider: ModelProvider, api_key: Optional[str]):
+        """创建带连接池的异步客户端"""
+        if provider == ModelProvider.MOCK:
+            from .mock_provider import AsyncMockClient
+            return AsyncMockClient()
+        
+        import httpx
+        http_client = httpx.AsyncClient(
+            limits=httpx.Limits(**ASYNC_POOL_LIMITS),
+            timeout=httpx.Timeout(120.0, connect=10.0)
+        )
+        
+        if provider == ModelProvider.ANTHROPIC:
+            import anthropic
+            return anthropic.AsyncAnthropic(api_key=api_key, http_client=http_client)
+        
+        # OpenAI / OpenRouter / NVIDIA 均走 OpenAI 兼容协议
+        import openai
+        return openai.AsyncOpenAI(
+            api_key=api_key,
+            base_url=PROVIDER_BASE_URLS.get(provider),
+            http_client=http_client
+        )
+    
+    def clear(self):
+        """清空已缓存的客户端（如 API key 轮换后）"""
+        with self._lock:
+            self._clients.clear()
+            self._async_clients = weakref.WeakKeyDictionary()
+    
+    def __len__(self):
+        return len(self._clients)
+
+
+# 全局客户端注册表
+_registry = None
+_registry_lock = threading.Lock()
+
+def get_client_registry() -> ClientRegistry:
+    """获取进程级客户端注册表"""
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = ClientRegistry()
+    return _registry
+
+
+def chat_many(agents: List["Agent"], prompts: List[str]) -> List[str]:
+    """
+    并发地让多个智能体各自回答一个提示
+    
+    无事件循环时通过 achat 并发执行；已处于事件循环内时退化为顺序调用
+    （此时调用方应直接 await Agent.achat）。
+    """
+    import asyncio
+    
+    async def _gather():
+        return await asyncio.gather(*[
+            agent.achat(prompt) for agent, prompt in zip(agents, prompts)
+        ])
+    
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return list(asyncio.run(_gather()))
+    return [agent.chat(prompt) for agent, prompt in zip(agents, prompts)]
+
 
 @dataclass
 class AgentConfig:
@@ -27,14 +203,112 @@ class AgentConfig:
     system_prompt: str = ""
     temperature: float = 0.7
     max_tokens: int = 4096
+    # 响应缓存：相同模型/角色/温度/提示词直接返回历史响应
+    cache: bool = False
+    cache_ttl: Optional[float] = None  # 秒，None 表示不过期
+    # 语义缓存：措辞不同但意思相近的提问复用历史回答
+    semantic_cache: bool = False
+    semantic_threshold: Optional[float] = None  # 余弦相似度阈值，None 使用缓存默认值
+    # 语义缓存的嵌入：嵌入模型名（如 "text-embedding-3-small"，与 RAG 共用嵌入缓存）或 str -> 向量 的函数；
+    # None 使用 n-gram 嵌入，只复用几乎相同的提问
+    semantic_embedder: Any = None
+    # 请求合并：并发的相同请求只发送一次，共享结果；仅在 temperature == 0 时生效，
+    # temperature > 0 时每次调用都应得到独立采样
+    single_flight: bool = True
+    # 自适应限流：按 provider / 模型排队，遇到 429 退避后重试
+    rate_limit: bool = True
+    max_retries: int = 3
+    # 多模型路由：主模型失败时依次切换到备用模型（可跨 provider）
+    fallback_models: List[str] = field(default_factory=list)
+    # 对冲请求：主模型超过历史延迟分位数仍未返回时，向下一个模型并发请求，取先返回者
+    hedge: bool = False
+    hedge_percentile: float = 0.95
+    hedge_after: Optional[float] = None  # 固定对冲延迟（秒），None 按历史延迟估计
+    # 前缀缓存：Anthropic 标记 cache_control，OpenAI 附带 prompt_cache_key，复用固定的系统提示词前缀
+    prompt_cache: bool = True
+    # 上下文窗口（token）：发送前把提示词压缩到 context_window - max_tokens 以内，None 按模型查表
+    context_window: Optional[int] = None
+    # 工具调用：tools 中的工具以原生 function calling 提供给模型，最多往返 max_tool_rounds 轮
+    max_tool_rounds: int = 5
+    tool_result_tokens: Optional[int] = 2000  # 每个工具结果回传给模型的 token 上限
+    # 模型路由（model_router.ModelRouter）：按请求特征选择模型档位，model 仅作为未路由时的默认模型
+    router: Any = None
+
+
+@dataclass
+class ModelRoute:
+    """一个请求目标：模型及其 provider、限流器和客户端"""
+    model: str
+    provider: ModelProvider
+    limiter: Optional[CompositeLimiter] = None
+    client: Any = None
+
+
+def _tag_route(error: Exception, route: ModelRoute):
+    """在异常上记录抛出它的路由（故障切换后用于错误回复和统计）"""
+    try:
+        error._route = route
+    except AttributeError:
+        pass
+
+
+@dataclass
+class Completion:
+    """一次成功的请求：回复文本、实际应答的路由与 provider 返回的 token 用量"""
+    text: str
+    route: ModelRoute
+    prompt_tokens: Optional[int] = None
+    completion_tokens: Optional[int] = None
+    cached_tokens: int = 0   # 命中 provider 前缀缓存的输入 token
+    coalesced: bool = False  # 由合并的并发请求共享得到
+    tool_calls: List[ToolCall] = field(default_factory=list)  # 模型请求的工具调用
+
 
 class Agent:
-    def __init__(self, config: AgentConfig):
+    def __init__(self, config: AgentConfig, registry: ClientRegistry = None):
         self.config = config
         self.provider = self._get_provider(config.model)
-        self._client = None
+        self.registry = registry or get_client_registry()
+        self.cache: Optional[ResponseCache] = get_response_cache() if config.cache else None
+        self.semantic_cache: Optional[SemanticCache] = (
+            get_semantic_cache(config.semantic_embedder) if config.semantic_cache else None
+        )
+        self.single_flight: Optional[SingleFlight] = (
+            get_single_flight() if config.single_flight else None
+        )
+        # 主模型在前，备用模型按顺序在后
+        self.routes: List[ModelRoute] = [
+            self._make_route(model) for model in [config.model, *config.fallback_models]
+        ]
+        self.stats = {
+            "cache_hits": 0, "semantic_hits": 0, "cache_misses": 0,
+            "coalesced": 0, "retries": 0, "failovers": 0, "hedged": 0,
+            "trimmed_tokens": 0, "tool_calls": 0, "tool_errors": 0
+        }
+        self.metrics: MetricsCollector = get_metrics()
+        self.metrics_id = new_agent_id()
+        # 智能体被回收时删除其调用汇总
+        weakref.finalize(self, self.metrics.forget_agent, self.metrics_id)
+        self.sessions: Dict[str, ChatSession] = {}
+        window = config.context_window or context_window(config.model)
+        # 为输出预留 max_tokens；未知模型不做整体限制
+        self.budget: Optional[PromptBudget] = (
+            PromptBudget(max(window - config.max_tokens, 0), model=config.model) if window else None
+        )
+        self._sessions_lock = threading.Lock()
+        self._tools: Optional[Tuple[Tool, ...]] = None
+        self._variants: Dict[str, "Agent"] = {}
+    
+    def _make_route(self, model: str) -> ModelRoute:
+        provider = self._get_provider(model)
+        limiter = None
+        if self.config.rate_limit:
+            limiter = get_rate_limiter_registry().get(provider.value, model)
+        return ModelRoute(model=model, provider=provider, limiter=limiter)
     
     def _get_provider(self, model: str) -> ModelProvider:
+        if model.startswith("mock/"):
+            return ModelProvider.MOCK
         # 检查是否使用 OpenRouter
         if model.startswith("openrouter/"):
             return ModelProvider.OPENROUTER
@@ -47,90 +321,1216 @@ class Agent:
             return ModelProvider.ANTHROPIC
         return ModelProvider.OPENAI
     
-    def _get_client(self):
-        if self._client is None:
-            if self.provider == ModelProvider.ANTHROPIC:
-                import anthropic
-                self._client = anthropic.Anthropic(
-                    api_key=os.getenv("ANTHROPIC_API_KEY")
-                )
-            elif self.provider == ModelProvider.NVIDIA:
-                # 使用 LangChain NVIDIA wrapper
-                from langchain_nvidia_ai_endpoints import ChatNVIDIA
-                self._client = ChatNVIDIA(
-                    model=self.config.model,
-                    nvidia_api_key=os.getenv("NVIDIA_API_KEY")
+    def _get_client(self, route: ModelRoute = None):
+        route = route or self.routes[0]
+        if route.client is None:
+            route.client = self.registry.get(
+                route.provider, route.model, self._api_key(route.provider)
+            )
+        return route.client
+    
+    def _get_async_client(self, route: ModelRoute):
+        return self.registry.get_async(route.provider, self._api_key(route.provider))
+    
+    def _api_key(self, provider: ModelProvider = None) -> Optional[str]:
+        """provider 使用的 API key（默认主模型的 provider）"""
+        provider = provider or self.provider
+        if provider == ModelProvider.ANTHROPIC:
+            return os.getenv("ANTHROPIC_API_KEY")
+        if provider == ModelProvider.NVIDIA:
+            return os.getenv("NVIDIA_API_KEY")
+        return os.getenv("OPENAI_API_KEY") or os.getenv("ANTHROPIC_API_KEY")
+    
+    def _api_model(self, route: ModelRoute = None) -> str:
+        """提取实际发送给 API 的模型名称"""
+        route = route or self.routes[0]
+        model = route.model
+        # NVIDIA 端点要求带组织前缀的完整名称，模拟模型按完整名称查找配置
+        if route.provider not in (ModelProvider.NVIDIA, ModelProvider.MOCK) and "/" in model:
+            model = model.split("/")[-1]
+        return model
+    
+    def _system_prompt(self, turns: List[Dict]) -> str:
+        """系统提示词：角色设定，加上会话摘要等 system 轮次"""
+        parts = [self.config.system_prompt or self.config.role]
+        parts.extend(t["content"] for t in turns if t["role"] == "system")
+        return "\n\n".join(p for p in parts if p)
+    
+    def _chat_turns(self, turns: List[Dict]) -> List[Dict]:
+        """去掉 system 轮次后的 user / assistant 消息"""
+        return [t for t in turns if t["role"] != "system"]
+    
+    def _build_messages(self, turns: List[Dict]) -> List[Dict]:
+        """构建 OpenAI 格式的消息列表"""
+        return [
+            {"role": "system", "content": self._system_prompt(turns)},
+            *(self._openai_turn(t) for t in self._chat_turns(turns))
+        ]
+    
+    @staticmethod
+    def _openai_turn(turn: Dict) -> Dict:
+        """工具调用轮次转换为 OpenAI 的 tool_calls / tool 消息，其余原样保留"""
+        if turn.get("tool_calls"):
+            return {
+                "role": "assistant",
+                "content": turn["content"] or None,
+                "tool_calls": [{
+                    "id": call["id"],
+                    "type": "function",
+                    "function": {
+                        "name": call["name"],
+                        "arguments": json.dumps(call["arguments"], ensure_ascii=False)
+                    }
+                } for call in turn["tool_calls"]]
+            }
+        if turn["role"] == "tool":
+            return {"role": "tool", "tool_call_id": turn["tool_call_id"], "content": turn["content"]}
+        return turn
+    
+    def _langchain_messages(self, turns: List[Dict]) -> List[Any]:
+        """构建 LangChain 格式的消息列表（NVIDIA wrapper 使用）"""
+        messages = []
+        system = self._system_prompt(turns)
+        if system:
+            messages.append(("system", system))
+        for t in self._chat_turns(turns):
+            if t.get("tool_calls") or t["role"] == "tool":
+                from langchain_core.messages import AIMessage, ToolMessage
+                if t["role"] == "tool":
+                    messages.append(ToolMessage(content=t["content"], tool_call_id=t["tool_call_id"]))
+                else:
+                    messages.append(AIMessage(content=t["content"], tool_calls=[
+                        {"id": c["id"], "name": c["name"], "args": c["arguments"]}
+                        for c in t["tool_calls"]
+                    ]))
+            else:
+                messages.append((t["role"], t["content"]))
+        return messages
+    
+    def _anthropic_system(self, turns: List[Dict]):
+        """
+        Anthropic 的 system 参数
+        
+        开启 prompt_cache 时拆成内容块：固定的角色设定在前并标记 cache_control，
+        会话摘要等动态内容在后，摘要变化不影响角色设定前缀的缓存。
+        """
+        if not self.config.prompt_cache:
+            return self._system_prompt(turns)
+        role = self.config.system_prompt or self.config.role
+        blocks = []
+        if role:
+            blocks.append({"type": "text", "text": role, "cache_control": {"type": "ephemeral"}})
+        blocks.extend({"type": "text", "text": t["content"]} for t in turns if t["role"] == "system")
+        return blocks or ""
+    
+    def _anthropic_messages(self, turns: List[Dict]) -> List[Dict]:
+        """
+        Anthropic 的 messages 参数
+        
+        开启 prompt_cache 且带历史时，在最后一条历史消息上设置缓存断点，
+        下一轮请求可直接复用整段历史前缀。
+        工具调用轮次转换为 tool_use 块，同一轮的工具结果合并为一条 user 消息。
+        """
+        messages = []
+        for t in self._chat_turns(turns):
+            if t["role"] == "tool":
+                block = {"type": "tool_result", "tool_use_id": t["tool_call_id"], "content": t["content"]}
+                if t.get("is_error"):
+                    block["is_error"] = True
+                if messages and messages[-1]["role"] == "user" and isinstance(messages[-1]["content"], list):
+                    messages[-1]["content"].append(block)
+                else:
+                    messages.append({"role": "user", "content": [block]})
+            elif t.get("tool_calls"):
+                blocks = [{"type": "text", "text": t["content"]}] if t["content"] else []
+                blocks.extend(
+                    {"type": "tool_use", "id": c["id"], "name": c["name"], "input": c["arguments"]}
+                    for c in t["tool_calls"]
                 )
+                messages.append({"role": "assistant", "content": blocks})
             else:
-                import openai
-                # 根据 provider 选择 API key
-                api_key = os.getenv("OPENAI_API_KEY") or os.getenv("ANTHROPIC_API_KEY")
+                messages.append(t)
+        if not self.config.prompt_cache or len(messages) < 2:
+            return messages
+        last = messages[-2]
+        if isinstance(last["content"], list):
+            blocks = [dict(b) for b in last["content"]]
+        else:
+            blocks = [{"type": "text", "text": last["content"]}]
+        blocks[-1]["cache_control"] = {"type": "ephemeral"}
+        messages[-2] = {"role": last["role"], "content": blocks}
+        return messages
+    
+    def _cache_hint(self, route: ModelRoute) -> Dict:
+        """
+        OpenAI 的前缀缓存路由提示
+        
+        OpenAI 对超过 1024 token 的相同前缀自动缓存；prompt_cache_key 让共享同一
+        系统提示词的请求落到同一批缓存节点上。其他 OpenAI 兼容端点不附加该参数。
+        """
+        if not self.config.prompt_cache or route.provider != ModelProvider.OPENAI:
+            return {}
+        key = ResponseCache.make_key(route.model, self.config.system_prompt or self.config.role, 0, "")
+        return {"extra_body": {"prompt_cache_key": key[:32]}}
+    
+    def _stream_options(self, route: ModelRoute) -> Dict:
+        """让流式响应在最后一个分片中返回 token 用量（NVIDIA 端点不附加）"""
+        if route.provider == ModelProvider.NVIDIA:
+            return {}
+        return {"stream_options": {"include_usage": True}}
+    
+    @property
+    def tools(self) -> Tuple[Tool, ...]:
+        """AgentConfig.tools 解析出的工具（首次访问时解析，未知名称抛出 KeyError）"""
+        if self._tools is None:
+            self._tools = tuple(get_tool_registry().resolve(self.config.tools, self))
+        return self._tools
+    
+    def _toolset(self, context: Dict = None) -> Optional[ToolSet]:
+        """
+        本次请求提供给模型的工具
+        
+        context["tools"] 可覆盖 AgentConfig.tools：工具名称列表，或 False 表示不使用工具。
+        """
+        names = (context or {}).get("tools")
+        if names is False:
+            return None
+        tools = self.tools if names is None else tuple(get_tool_registry().resolve(names, self))
+        return ToolSet(tools) if tools else None
+    
+    def _tool_params(self, route: ModelRoute, toolset: Optional[ToolSet]) -> Dict:
+        """原生 function calling 的请求参数（Anthropic / OpenAI 兼容格式）"""
+        if not toolset:
+            return {}
+        if route.provider == ModelProvider.ANTHROPIC:
+            params = {"tools": [t.to_anthropic() for t in toolset.tools]}
+            if toolset.choice == "none":
+                params["tool_choice"] = {"type": "none"}
+            return params
+        params = {"tools": [t.to_openai() for t in toolset.tools]}
+        if toolset.choice == "none":
+            params["tool_choice"] = "none"
+        return params
+    
+    def session(self, session_id: str, **kwargs) -> ChatSession:
+        """
+        获取（或创建）一个多轮会话
+        
+        kwargs 在首次创建时传给 ChatSession（max_tokens、keep_recent、summarizer 等）。
+        """
+        with self._sessions_lock:
+            session = self.sessions.get(session_id)
+            if session is None:
+                session = ChatSession(self, session_id, **kwargs)
+                self.sessions[session_id] = session
+            return session
+    
+    def end_session(self, session_id: str):
+        with self._sessions_lock:
+            self.sessions.pop(session_id, None)
+    
+    def _variant(self, model: str) -> "Agent":
+        """
+        同一角色使用另一个模型的副本（路由用）
+        
+        副本与本智能体共享会话和计数，调用统计仍记在本智能体名下、按模型区分。
+        """
+        if model == self.config.model:
+            return self
+        with self._sessions_lock:
+            variant = self._variants.get(model)
+            if variant is None:
+                variant = Agent(replace(self.config, model=model, router=None), registry=self.registry)
+                variant.stats = self.stats
+                variant.metrics_id = self.metrics_id
+                variant.sessions = self.sessions
+                variant._sessions_lock = self._sessions_lock
+                self._variants[model] = variant
+            return variant
+    
+    def _route(self, message: str, context: Dict = None) -> tuple:
+        """
+        按路由器选择本次请求由哪个模型回答
+        
+        返回 (目标智能体, context)。context["response_type"]、context["quality"] 作为路由特征，
+        context["model"] 可直接指定模型；会话 ID 解析为会话对象，以便副本共用同一会话。
+        """
+        context = dict(context or {})
+        if self.config.router is None and "model" not in context:
+            return self, context
+        session = context.get("session")
+        if isinstance(session, str):
+            session = context["session"] = self.session(session)
+        
+        model = context.pop("model", None)
+        if model is None:
+            model = self.config.router.route(
+                message,
+                response_type=context.get("response_type"),
+                quality=context.get("quality"),
+                agent=self.config.name,
+                history_tokens=session.history_tokens if session is not None else 0
+            ).model
+        return self._variant(model), context
+    
+    def _prepare(self, message: str, context: Dict = None) -> tuple:
+        """
+        确定本次请求的会话与多轮消息（已按上下文预算压缩）
+        
+        context["session"] 可以是 ChatSession 或会话 ID；未指定时只发送本条消息。
+        """
+        session = (context or {}).get("session")
+        if isinstance(session, str):
+            session = self.session(session)
+        if session is None:
+            turns = [{"role": "user", "content": message}]
+        else:
+            turns = session.build(message)
+        return session, self._fit_budget(turns)
+    
+    def _fit_budget(self, turns: List[Dict]) -> List[Dict]:
+        """超出上下文预算时丢弃最早的历史、截断超长消息，裁剪量计入 stats["trimmed_tokens"]"""
+        if self.budget is None:
+            return turns
+        turns, trimmed = self.budget.fit_turns(self.config.system_prompt or self.config.role, turns)
+        if trimmed:
+            self.stats["trimmed_tokens"] += trimmed
+        return turns
+    
+    def _error_reply(self, error: Exception, route: ModelRoute = None) -> str:
+        """
+        OpenAI / OpenRouter 的错误以文本形式返回（保持原有行为），其余 provider 直接抛出
+        
+        按抛出错误的路由（故障切换后可能不是主模型）判断 provider。
+        模拟模型与 OpenAI 一致，注入的错误不会中断基准测试。
+        """
+        route = route or getattr(error, "_route", None) or self.routes[0]
+        if route.provider in (ModelProvider.OPENAI, ModelProvider.OPENROUTER, ModelProvider.MOCK):
+            return f"Error: {str(error)}"
+        raise error
+    
+    def _cache_lookup(self, message: str, turns: List[Dict], context: Dict = None,
+                      toolset: Optional[ToolSet] = None) -> tuple:
+        """
+        依次查询精确缓存和语义缓存
+        
+        返回 (命中的回复, 待写回信息)；命中时待写回信息为 None。
+        精确缓存按完整的多轮消息匹配。
+        context["semantic_key"] 可指定语义匹配所用的文本（默认使用完整提示词），
+        例如群聊中只用用户原话匹配，忽略每次都不同的聊天上下文。
+        带历史的会话请求不做默认的语义匹配，以免忽略上下文返回答非所问的回复。
+        提供了工具的请求不查也不写缓存：回复取决于工具结果（搜索、天气等），不只取决于提示词。
+        """
+        if toolset:
+            return None, None
+        start = time.monotonic()
+        key = None
+        if self.cache is not None:
+            key = self._request_key(turns)
+            cached = self.cache.get(key, ttl=self.config.cache_ttl)
+            if cached is not None:
+                self.stats["cache_hits"] += 1
+                self._record("cache_hit", start)
+                return cached, None
+        
+        semantic_text = None
+        if self.semantic_cache is not None:
+            semantic_text = (context or {}).get("semantic_key")
+            if semantic_text is None and len(turns) == 1:
+                semantic_text = message
+            if semantic_text is not None:
+                cached = self.semantic_cache.get(
+                    self._semantic_namespace(), semantic_text, self.config.semantic_threshold
+                )
+                if cached is not None:
+                    self.stats["semantic_hits"] += 1
+                    self._record("semantic_hit", start)
+                    # 回填精确缓存，下次同样的提示词不必再做向量检索
+                    if key is not None:
+                        self.cache.set(key, cached)
+                    return cached, None
+        
+        if key is None and semantic_text is None:
+            return None, None
+        self.stats["cache_misses"] += 1
+        return None, (key, semantic_text)
+    
+    def _cache_store(self, pending: Optional[tuple], reply: str):
+        """将新回复写回缓存"""
+        if pending is None:
+            return
+        key, semantic_text = pending
+        if key is not None:
+            self.cache.set(key, reply)
+        if semantic_text is not None:
+            self.semantic_cache.set(self._semantic_namespace(), semantic_text, reply)
+    
+    def _record(self, outcome: str, start: float, route: ModelRoute = None,
+                turns: List[Dict] = (), reply: str = "", usage: tuple = (None, None, 0),
+                ttft: Optional[float] = None):
+        """
+        记录一次调用的统计
+        
+        只有成功发出的请求（ok）计 token；provider 未返回 usage 时按文本估算。
+        """
+        prompt_tokens = completion_tokens = cached_tokens = 0
+        estimated = False
+        if outcome == "ok":
+            prompt_tokens, completion_tokens, cached_tokens = usage
+            estimated = prompt_tokens is None or completion_tokens is None
+            if prompt_tokens is None:
+                prompt_tokens = (estimate_tokens(self._system_prompt(turns))
+                                 + sum(estimate_tokens(t["content"]) for t in self._chat_turns(turns)))
+            if completion_tokens is None:
+                completion_tokens = estimate_tokens(reply)
+        
+        route = route or self.routes[0]
+        self.metrics.record(CallRecord(
+            agent=self.config.name,
+            agent_id=self.metrics_id,
+            model=route.model,
+            provider=route.provider.value,
+            outcome=outcome,
+            prompt_tokens=prompt_tokens,
+            completion_tokens=completion_tokens,
+            cached_tokens=cached_tokens,
+            latency=time.monotonic() - start,
+            ttft=ttft,
+            estimated=estimated,
+            scope=current_scope()
+        ))
+    
+    def _record_completion(self, completion: Completion, start: float, turns: List[Dict]):
+        if completion.coalesced:
+            self._record("coalesced", start, completion.route)
+            return
+        self._record(
+            "ok", start, completion.route, turns, completion.text,
+            usage=(completion.prompt_tokens, completion.completion_tokens, completion.cached_tokens)
+        )
+    
+    def _request_key(self, turns: List[Dict], toolset: Optional[ToolSet] = None) -> str:
+        """标识一次完整请求（模型、角色、温度、长度上限、提示词、工具）"""
+        # 单条消息沿用纯文本作为键，与已有的持久缓存保持兼容
+        prompt = turns[0]["content"] if len(turns) == 1 else turns
+        if toolset:
+            prompt = [toolset.names, toolset.choice, prompt]
+        return ResponseCache.make_key(
+            self.config.model,
+            self.config.system_prompt or self.config.role,
+            self.config.temperature,
+            prompt,
+            self.config.max_tokens
+        )
+    
+    def _coalesces(self) -> bool:
+        """是否合并并发的相同请求：只有 temperature == 0 时相同请求的结果可以共享"""
+        return self.single_flight is not None and self.config.temperature == 0
+    
+    def _call(self, turns: List[Dict], toolset: Optional[ToolSet] = None) -> Completion:
+        """发送请求；temperature == 0 时并发的相同请求合并为一次"""
+        if not self._coalesces():
+            return self._routed(turns, toolset)
+        completion, shared = self.single_flight.do(
+            self._request_key(turns, toolset), lambda: self._routed(turns, toolset)
+        )
+        if shared:
+            self.stats["coalesced"] += 1
+            completion = replace(completion, coalesced=True)
+        return completion
+    
+    async def _acall(self, turns: List[Dict], toolset: Optional[ToolSet] = None) -> Completion:
+        """异步版 _call"""
+        if not self._coalesces():
+            return await self._arouted(turns, toolset)
+        completion, shared = await self.single_flight.ado(
+            self._request_key(turns, toolset), lambda: self._arouted(turns, toolset)
+        )
+        if shared:
+            self.stats["coalesced"] += 1
+            completion = replace(completion, coalesced=True)
+        return completion
+    
+    def _routed(self, turns: List[Dict], toolset: Optional[ToolSet] = None) -> Completion:
+        """按路由发送请求：主模型失败时依次故障切换，开启对冲时并发备用模型"""
+        if len(self.routes) == 1:
+            return self._limited(turns, self.routes[0], toolset)
+        if self.config.hedge:
+            return self._hedged(turns, toolset)
+        
+        for i, route in enumerate(self.routes):
+            try:
+                return self._limited(turns, route, toolset)
+            except Exception:
+                if i == len(self.routes) - 1:
+                    raise
+                self.stats["failovers"] += 1
+    
+    async def _arouted(self, turns: List[Dict], toolset: Optional[ToolSet] = None) -> Completion:
+        """异步版 _routed"""
+        if len(self.routes) == 1:
+            return await self._alimited(turns, self.routes[0], toolset)
+        if self.config.hedge:
+            return await self._ahedged(turns, toolset)
+        
+        for i, route in enumerate(self.routes):
+            try:
+                return await self._alimited(turns, route, toolset)
+            except Exception:
+                if i == len(self.routes) - 1:
+                    raise
+                self.stats["failovers"] += 1
+    
+    def _hedge_delay(self, route: ModelRoute) -> float:
+        if self.config.hedge_after is not None:
+            return self.config.hedge_after
+        return get_latency_tracker().hedge_delay(route.model, self.config.hedge_percentile)
+    
+    def _hedged(self, turns: List[Dict], toolset: Optional[ToolSet] = None) -> Completion:
+        """
+        对冲请求
+        
+        先请求主模型；超过对冲延迟仍未返回，或返回错误时，启动下一个模型，
+        以最先成功的结果为准。被放弃的请求在后台线程中自然结束。
+        """
+        from concurrent.futures import wait, FIRST_COMPLETED
+        
+        executor = get_hedge_executor()
+        pending = {}
+        errors = []
+        next_index = 0
+        
+        def launch():
+            nonlocal next_index
+            route = self.routes[next_index]
+            next_index += 1
+            pending[executor.submit(self._limited, turns, route, toolset)] = route
+        
+        launch()
+        while pending:
+            timeout = None
+            if next_index < len(self.routes):
+                timeout = self._hedge_delay(self.routes[next_index - 1])
+            done, _ = wait(list(pending), timeout=timeout, return_when=FIRST_COMPLETED)
+            
+            if not done:
+                # 超过截止时间：发出对冲请求
+                self.stats["hedged"] += 1
+                launch()
+                continue
+            
+            for future in done:
+                pending.pop(future)
+                try:
+                    return future.result()
+                except Exception as e:
+                    errors.append(e)
+            
+            if not pending and next_index < len(self.routes):
+                self.stats["failovers"] += 1
+                launch()
+        
+        raise errors[-1]
+    
+    async def _ahedged(self, turns: List[Dict], toolset: Optional[ToolSet] = None) -> Completion:
+        """异步版 _hedged，返回后取消仍在进行的请求"""
+        import asyncio
+        
+        pending = {}
+        errors = []
+        next_index = 0
+        
+        def launch():
+            nonlocal next_index
+            route = self.routes[next_index]
+            next_index += 1
+            pending[asyncio.ensure_future(self._alimited(turns, route, toolset))] = route
+        
+        launch()
+        try:
+            while pending:
+                timeout = None
+                if next_index < len(self.routes):
+                    timeout = self._hedge_delay(self.routes[next_index - 1])
+                done, _ = await asyncio.wait(
+                    list(pending), timeout=timeout, return_when=asyncio.FIRST_COMPLETED
+                )
                 
-                openai.api_key = api_key
+                if not done:
+                    self.stats["hedged"] += 1
+                    launch()
+                    continue
                 
-                # OpenRouter 使用自定义端点
-                if self.provider == ModelProvider.OPENROUTER:
-                    openai.base_url = "https://openrouter.ai/api/v1"
+                for task in done:
+                    pending.pop(task)
+                    if task.exception() is None:
+                        return task.result()
+                    errors.append(task.exception())
                 
-                self._client = openai
-        return self._client
+                if not pending and next_index < len(self.routes):
+                    self.stats["failovers"] += 1
+                    launch()
+        finally:
+            for task in pending:
+                task.cancel()
+        
+        raise errors[-1]
+    
+    def _release_after_error(self, route: ModelRoute, error: Exception, attempt: int,
+                             can_retry: bool = True) -> bool:
+        """归还限流名额，返回是否应当重试（仅限流错误且未超过重试次数）"""
+        throttled = is_rate_limited(error)
+        route.limiter.release(
+            throttled=throttled,
+            success=False,
+            retry_after=retry_after_from_error(error) if throttled else None
+        )
+        if can_retry and throttled and attempt < self.config.max_retries:
+            self.stats["retries"] += 1
+            return True
+        return False
+    
+    def _limited(self, turns: List[Dict], route: ModelRoute,
+                 toolset: Optional[ToolSet] = None) -> Completion:
+        """在限流器控制下发送请求，被限流时排队重试而不是直接失败"""
+        if route.limiter is None:
+            return self._timed_complete(turns, route, toolset)
+        
+        for attempt in range(self.config.max_retries + 1):
+            route.limiter.acquire()
+            try:
+                completion = self._timed_complete(turns, route, toolset)
+            except Exception as e:
+                if self._release_after_error(route, e, attempt):
+                    continue
+                raise
+            route.limiter.release()
+            return completion
+    
+    async def _alimited(self, turns: List[Dict], route: ModelRoute,
+                        toolset: Optional[ToolSet] = None) -> Completion:
+        """异步版 _limited"""
+        import asyncio
+        
+        if route.limiter is None:
+            return await self._atimed_complete(turns, route, toolset)
+        
+        for attempt in range(self.config.max_retries + 1):
+            await route.limiter.aacquire()
+            try:
+                completion = await self._atimed_complete(turns, route, toolset)
+            except asyncio.CancelledError:
+                route.limiter.release(success=False)
+                raise
+            except Exception as e:
+                if self._release_after_error(route, e, attempt):
+                    continue
+                raise
+            route.limiter.release()
+            return completion
+    
+    def _timed_complete(self, turns: List[Dict], route: ModelRoute,
+                        toolset: Optional[ToolSet] = None) -> Completion:
+        """发送请求并记录成功请求的延迟"""
+        start = time.monotonic()
+        try:
+            completion = self._complete(turns, route, toolset)
+        except Exception as e:
+            _tag_route(e, route)
+            raise
+        get_latency_tracker().record(route.model, time.monotonic() - start)
+        return completion
+    
+    async def _atimed_complete(self, turns: List[Dict], route: ModelRoute,
+                               toolset: Optional[ToolSet] = None) -> Completion:
+        start = time.monotonic()
+        try:
+            completion = await self._acomplete(turns, route, toolset)
+        except Exception as e:
+            _tag_route(e, route)
+            raise
+        get_latency_tracker().record(route.model, time.monotonic() - start)
+        return completion
+    
+    def _routed_stream(self, turns: List[Dict], trace: Dict) -> Iterator[str]:
+        """
+        流式请求的故障切换：尚未产出内容时失败则切换到下一个模型
+        
+        trace["route"] 记录最近一次尝试的路由，trace["usage"] 记录 provider 返回的用量，供调用统计使用。
+        """
+        for i, route in enumerate(self.routes):
+            trace["route"] = route
+            started = False
+            stream = self._limited_stream(turns, route, trace)
+            try:
+                for delta in stream:
+                    started = True
+                    yield delta
+                return
+            except Exception:
+                if started or i == len(self.routes) - 1:
+                    raise
+                self.stats["failovers"] += 1
+            finally:
+                # 提前停止时立即关闭内层生成器，使其归还限流名额
+                stream.close()
+    
+    async def _arouted_stream(self, turns: List[Dict], trace: Dict) -> AsyncIterator[str]:
+        """异步版 _routed_stream"""
+        for i, route in enumerate(self.routes):
+            trace["route"] = route
+            started = False
+            stream = self._alimited_stream(turns, route, trace)
+            try:
+                async for delta in stream:
+                    started = True
+                    yield delta
+                return
+            except Exception:
+                if started or i == len(self.routes) - 1:
+                    raise
+                self.stats["failovers"] += 1
+            finally:
+                # 异步生成器不会随引用释放立即关闭，显式关闭以归还限流名额
+                await stream.aclose()
+    
+    def _limited_stream(self, turns: List[Dict], route: ModelRoute, trace: Dict) -> Iterator[str]:
+        """在限流器控制下流式请求；尚未产出内容时被限流可重试"""
+        if route.limiter is None:
+            yield from self._stream(turns, route, trace)
+            return
+        
+        for attempt in range(self.config.max_retries + 1):
+            route.limiter.acquire()
+            started = False
+            released = False
+            try:
+                for delta in self._stream(turns, route, trace):
+                    started = True
+                    yield delta
+            except Exception as e:
+                released = True
+                if self._release_after_error(route, e, attempt, can_retry=not started):
+                    continue
+                raise
+            else:
+                released = True
+                route.limiter.release()
+                return
+            finally:
+                if not released:
+                    # 消费方提前停止迭代（break / close）：归还名额，不计入成败
+                    route.limiter.release(success=False)
+    
+    async def _alimited_stream(self, turns: List[Dict], route: ModelRoute,
+                               trace: Dict) -> AsyncIterator[str]:
+        """异步版 _limited_stream"""
+        if route.limiter is None:
+            async for delta in self._astream(turns, route, trace):
+                yield delta
+            return
+        
+        for attempt in range(self.config.max_retries + 1):
+            await route.limiter.aacquire()
+            started = False
+            released = False
+            try:
+                async for delta in self._astream(turns, route, trace):
+                    started = True
+                    yield delta
+            except Exception as e:
+                released = True
+                if self._release_after_error(route, e, attempt, can_retry=not started):
+                    continue
+                raise
+            else:
+                released = True
+                route.limiter.release()
+                return
+            finally:
+                if not released:
+                    # 消费方提前停止（aclose）或任务被取消：与 _alimited 相同，归还名额
+                    route.limiter.release(success=False)
+    
+    def _create(self, route: ModelRoute, endpoint, **kwargs):
+        """调用 SDK 的 create，并把响应头中的限流信息反馈给限流器"""
+        raw = getattr(endpoint, "with_raw_response", None)
+        if raw is None or route.limiter is None:
+            return endpoint.create(**kwargs)
+        response = raw.create(**kwargs)
+        route.limiter.update_from_headers(response.headers)
+        return response.parse()
+    
+    async def _acreate(self, route: ModelRoute, endpoint, **kwargs):
+        """异步版 _create"""
+        raw = getattr(endpoint, "with_raw_response", None)
+        if raw is None or route.limiter is None:
+            return await endpoint.create(**kwargs)
+        response = await raw.create(**kwargs)
+        route.limiter.update_from_headers(response.headers)
+        return response.parse()
+    
+    def _remember(self, session: Optional[ChatSession], message: str, reply: str):
+        if session is not None:
+            session.record(message, reply)
+    
+    async def _aremember(self, session: Optional[ChatSession], message: str, reply: str):
+        """异步版 _remember：会话摘要在线程池中进行，不阻塞事件循环"""
+        if session is not None:
+            await session.arecord(message, reply)
+    
+    def _semantic_namespace(self) -> int:
+        return SemanticCache.namespace(
+            self.config.model,
+            self.config.system_prompt or self.config.role,
+            self.config.temperature
+        )
+    
+    def _call_recorded(self, turns: List[Dict], toolset: Optional[ToolSet] = None) -> Completion:
+        """发送请求并记录调用统计，失败时记录后抛出"""
+        start = time.monotonic()
+        try:
+            completion = self._call(turns, toolset)
+        except Exception as e:
+            self._record("error", start, getattr(e, "_route", None))
+            raise
+        self._record_completion(completion, start, turns)
+        return completion
+    
+    async def _acall_recorded(self, turns: List[Dict],
+                              toolset: Optional[ToolSet] = None) -> Completion:
+        """异步版 _call_recorded"""
+        start = time.monotonic()
+        try:
+            completion = await self._acall(turns, toolset)
+        except Exception as e:
+            self._record("error", start, getattr(e, "_route", None))
+            raise
+        self._record_completion(completion, start, turns)
+        return completion
+    
+    def _tool_turns(self, completion: Completion, results: List[ToolResult]) -> List[Dict]:
+        """把一轮工具调用及其结果追加为多轮消息（不写入会话历史）"""
+        return [
+            {"role": "assistant", "content": completion.text,
+             "tool_calls": [call.to_dict() for call in completion.tool_calls]},
+            *({"role": "tool", "content": r.content, "tool_call_id": r.call_id,
+               "name": r.name, "is_error": r.is_error} for r in results)
+        ]
+    
+    def _next_toolset(self, toolset: ToolSet, rounds: int) -> ToolSet:
+        """达到 max_tool_rounds 后仍发送工具定义，但要求模型直接回答"""
+        if rounds >= self.config.max_tool_rounds:
+            return replace(toolset, choice="none")
+        return toolset
+    
+    def _tool_loop(self, turns: List[Dict], completion: Completion,
+                   toolset: ToolSet) -> Completion:
+        """
+        执行模型请求的工具并回传结果，直到模型给出最终回复
+        
+        同一轮的多个工具在有界线程池中并发执行，结果在一次后续请求中一起回传。
+        """
+        rounds = 0
+        while completion.tool_calls:
+            results = self.run_tools(completion.tool_calls, toolset.tools)
+            turns = turns + self._tool_turns(completion, results)
+            rounds += 1
+            completion = self._call_recorded(turns, self._next_toolset(toolset, rounds))
+        return completion
+    
+    async def _atool_loop(self, turns: List[Dict], completion: Completion,
+                          toolset: ToolSet) -> Completion:
+        """异步版 _tool_loop"""
+        rounds = 0
+        while completion.tool_calls:
+            results = await self.arun_tools(completion.tool_calls, toolset.tools)
+            turns = turns + self._tool_turns(completion, results)
+            rounds += 1
+            completion = await self._acall_recorded(turns, self._next_toolset(toolset, rounds))
+        return completion
+    
+    def _count_tools(self, results: List[ToolResult]):
+        self.stats["tool_calls"] += len(results)
+        self.stats["tool_errors"] += sum(1 for r in results if r.is_error)
+    
+    def run_tools(self, calls: List[ToolCall], tools: Tuple[Tool, ...] = None) -> List[ToolResult]:
+        """执行一轮工具调用（多个调用并发执行），结果与 calls 顺序一致"""
+        results = execute_tool_calls(
+            calls, self.tools if tools is None else tools, self.config.tool_result_tokens
+        )
+        self._count_tools(results)
+        return results
+    
+    async def arun_tools(self, calls: List[ToolCall],
+                         tools: Tuple[Tool, ...] = None) -> List[ToolResult]:
+        """异步版 run_tools"""
+        results = await aexecute_tool_calls(
+            calls, self.tools if tools is None else tools, self.config.tool_result_tokens
+        )
+        self._count_tools(results)
+        return results
     
     def chat(self, message: str, context: Dict = None) -> str:
-        client = self._get_client()
+        """
+        对话
+        
+        context["session"] 指定多轮会话（ChatSession 或会话 ID）时，
+        请求带上该会话的历史，回复写回会话。
+        配置了工具时模型可以请求调用工具，工具结果回传后返回模型的最终回复。
+        配置了路由器时按 context 中的回复类型 / 所需质量选择模型。
+        """
+        target, context = self._route(message, context)
+        if target is not self:
+            return target.chat(message, context)
+        
+        session, turns = self._prepare(message, context)
+        toolset = self._toolset(context)
+        cached, pending = self._cache_lookup(message, turns, context, toolset)
+        if cached is not None:
+            self._remember(session, message, cached)
+            return cached
+        return self._chat_complete(session, message, turns, toolset, pending)
+    
+    def _chat_complete(self, session: Optional[ChatSession], message: str, turns: List[Dict],
+                       toolset: Optional[ToolSet], pending: Optional[tuple] = None) -> str:
+        """发送请求并完成工具调用，回复写回缓存与会话"""
+        try:
+            completion = self._call_recorded(turns, toolset)
+            if completion.tool_calls:
+                completion = self._tool_loop(turns, completion, toolset)
+        except Exception as e:
+            return self._error_reply(e)
+        
+        self._cache_store(pending, completion.text)
+        self._remember(session, message, completion.text)
+        return completion.text
+    
+    async def achat(self, message: str, context: Dict = None) -> str:
+        """
+        异步对话
+        
+        与 chat 语义一致，但通过进程内共享的异步连接池发送请求，
+        多个智能体可在同一事件循环中并发等待 LLM 响应。
+        """
+        target, context = self._route(message, context)
+        if target is not self:
+            return await target.achat(message, context)
+        
+        session, turns = self._prepare(message, context)
+        toolset = self._toolset(context)
+        cached, pending = self._cache_lookup(message, turns, context, toolset)
+        if cached is not None:
+            await self._aremember(session, message, cached)
+            return cached
+        return await self._achat_complete(session, message, turns, toolset, pending)
+    
+    async def _achat_complete(self, session: Optional[ChatSession], message: str,
+                              turns: List[Dict], toolset: Optional[ToolSet],
+                              pending: Optional[tuple] = None) -> str:
+        """异步版 _chat_complete"""
+        try:
+            completion = await self._acall_recorded(turns, toolset)
+            if completion.tool_calls:
+                completion = await self._atool_loop(turns, completion, toolset)
+        except Exception as e:
+            return self._error_reply(e)
+        
+        self._cache_store(pending, completion.text)
+        await self._aremember(session, message, completion.text)
+        return completion.text
+    
+    def chat_stream(self, message: str, context: Dict = None) -> Iterator[str]:
+        """
+        流式对话
+        
+        逐段产出模型生成的增量文本，拼接后等于 chat 的返回值。
+        缓存命中时一次性产出完整回复。
+        本次请求提供了工具时不使用流式接口：与 chat 相同地执行工具循环，完成后一次性产出最终回复
+        （流式响应中的工具调用分片不做解析）。
+        """
+        target, context = self._route(message, context)
+        if target is not self:
+            yield from target.chat_stream(message, context)
+            return
+        
+        session, turns = self._prepare(message, context)
+        toolset = self._toolset(context)
+        if toolset:
+            yield self._chat_complete(session, message, turns, toolset)
+            return
+        cached, pending = self._cache_lookup(message, turns, context)
+        if cached is not None:
+            self._remember(session, message, cached)
+            yield cached
+            return
+        
+        start = time.monotonic()
+        trace = {}
+        ttft = None
+        parts = []
+        stream = self._routed_stream(turns, trace)
+        try:
+            for delta in stream:
+                if ttft is None:
+                    ttft = time.monotonic() - start
+                parts.append(delta)
+                yield delta
+        except Exception as e:
+            self._record("error", start, trace.get("route"), ttft=ttft)
+            yield self._error_reply(e, trace.get("route"))
+            return
+        finally:
+            stream.close()
+        
+        reply = "".join(parts)
+        self._record("ok", start, trace.get("route"), turns, reply,
+                     usage=trace.get("usage", (None, None, 0)), ttft=ttft)
+        self._cache_store(pending, reply)
+        self._remember(session, message, reply)
+    
+    async def achat_stream(self, message: str, context: Dict = None) -> AsyncIterator[str]:
+        """异步流式对话（提供了工具时同 chat_stream，执行工具循环后一次性产出）"""
+        target, context = self._route(message, context)
+        if target is not self:
+            async for delta in target.achat_stream(message, context):
+                yield delta
+            return
+        
+        session, turns = self._prepare(message, context)
+        toolset = self._toolset(context)
+        if toolset:
+            yield await self._achat_complete(session, message, turns, toolset)
+            return
+        cached, pending = self._cache_lookup(message, turns, context)
+        if cached is not None:
+            await self._aremember(session, message, cached)
+            yield cached
+            return
+        
+        start = time.monotonic()
+        trace = {}
+        ttft = None
+        parts = []
+        stream = self._arouted_stream(turns, trace)
+        try:
+            async for delta in stream:
+                if ttft is None:
+                    ttft = time.monotonic() - start
+                parts.append(delta)
+                yield delta
+        except Exception as e:
+            self._record("error", start, trace.get("route"), ttft=ttft)
+            yield self._error_reply(e, trace.get("route"))
+            return
+        finally:
+            await stream.aclose()
+        
+        reply = "".join(parts)
+        self._record("ok", start, trace.get("route"), turns, reply,
+                     usage=trace.get("usage", (None, None, 0)), ttft=ttft)
+        self._cache_store(pending, reply)
+        await self._aremember(session, message, reply)
+    
+    def _complete(self, turns: List[Dict], route: ModelRoute,
+                  toolset: Optional[ToolSet] = None) -> Completion:
+        """向 provider 发送一次请求，失败时抛出异常"""
+        client = self._get_client(route)
         
         # LangChain NVIDIA wrapper
-        if self.provider == ModelProvider.NVIDIA:
-            # 构建消息
-            messages = []
-            if self.config.system_prompt or self.config.role:
-                messages.append(("system", self.config.system_prompt or self.config.role))
-            messages.append(("user", message))
-            
-            # 重新创建 client 以确保使用正确的模型
-            from langchain_nvidia_ai_endpoints import ChatNVIDIA
-            llm = ChatNVIDIA(
-                model=self.config.model,
-                nvidia_api_key=os.getenv("NVIDIA_API_KEY")
+        if route.provider == ModelProvider.NVIDIA:
+            # 注册表中的 client 已按模型区分，直接复用
+            if toolset:
+                client = client.bind_tools(**self._tool_params(route, toolset))
+            result = client.invoke(self._langchain_messages(turns))
+            return self._langchain_completion(result, route)
+        
+        model = self._api_model(route)
+        
+        if route.provider == ModelProvider.ANTHROPIC:
+            response = self._create(
+                route,
+                client.messages,
+                model=model,
+                max_tokens=self.config.max_tokens,
+                temperature=self.config.temperature,
+                system=self._anthropic_system(turns),
+                messages=self._anthropic_messages(turns),
+                **self._tool_params(route, toolset)
             )
-            result = llm.invoke(messages)
-            return result.content
+            return self._anthropic_completion(response, route)
         
-        # 提取实际模型名称
-        model = self.config.model
-        if "/" in model:
-            model = model.split("/")[-1]
+        # OpenAI compatible (OpenAI, OpenRouter)
+        response = self._create(
+            route,
+            client.chat.completions,
+            model=model,
+            temperature=self.config.temperature,
+            max_tokens=self.config.max_tokens,
+            messages=self._build_messages(turns),
+            **self._cache_hint(route),
+            **self._tool_params(route, toolset)
+        )
+        return self._openai_completion(response, route)
+    
+    async def _acomplete(self, turns: List[Dict], route: ModelRoute,
+                         toolset: Optional[ToolSet] = None) -> Completion:
+        """异步版 _complete"""
+        client = self._get_async_client(route)
+        model = self._api_model(route)
         
-        if self.provider == ModelProvider.ANTHROPIC:
-            response = client.messages.create(
+        if route.provider == ModelProvider.ANTHROPIC:
+            response = await self._acreate(
+                route,
+                client.messages,
                 model=model,
                 max_tokens=self.config.max_tokens,
                 temperature=self.config.temperature,
-                system=self.config.system_prompt or self.config.role,
-                messages=[{"role": "user", "content": message}]
+                system=self._anthropic_system(turns),
+                messages=self._anthropic_messages(turns),
+                **self._tool_params(route, toolset)
             )
-            return response.content[0].text
-        else:
-            # OpenAI compatible (OpenAI, OpenRouter)
-            try:
-                response = client.chat.completions.create(
-                    model=model,
-                    temperature=self.config.temperature,
-                    max_tokens=self.config.max_tokens,
-                    messages=[
-                        {"role": "system", "content": self.config.system_prompt or self.config.role},
-                        {"role": "user", "content": message}
-                    ]
-                )
-                if hasattr(response, 'choices'):
-                    return response.choices[0].message.content
-                return str(response)
-            except Exception as e:
-                return f"Error: {str(e)}"
+            return self._anthropic_completion(response, route)
+        
+        # OpenAI compatible (OpenAI, OpenRouter, NVIDIA)
+        response = await self._acreate(
+            route,
+            client.chat.completions,
+            model=model,
+            temperature=self.config.temperature,
+            max_tokens=self.config.max_tokens,
+            messages=self._build_messages(turns),
+            **self._cache_hint(route),
+            **self._tool_params(route, toolset)
+        )
+        return self._openai_completion(response, route)
+    
+    @staticmethod
+    def _openai_completion(response, route: ModelRoute) -> Completion:
+        """解析 OpenAI 兼容响应：文本、工具调用与用量"""
+        if not hasattr(response, 'choices'):
+            return Completion(str(response), route)
+        message = response.choices[0].message
+        tool_calls = [
+            ToolCall(call.id, call.function.name, parse_arguments(call.function.arguments))
+            for call in getattr(message, "tool_calls", None) or []
+        ]
+        text = message.content
+        if tool_calls and text is None:
+            text = ""
+        return Completion(text, route, *usage_from_response(response), tool_calls=tool_calls)
+    
+    @staticmethod
+    def _anthropic_completion(response, route: ModelRoute) -> Completion:
+        """解析 Anthropic 响应：拼接 text 块，tool_use 块转换为工具调用"""
+        text = "".join(block.text for block in response.content if block.type == "text")
+        tool_calls = [
+            ToolCall(block.id, block.name, parse_arguments(block.input))
+            for block in response.content if block.type == "tool_use"
+        ]
+        return Completion(text, route, *usage_from_response(response), tool_calls=tool_calls)
+    
+    @staticmethod
+    def _langchain_completion(result, route: ModelRoute) -> Completion:
+        """解析 LangChain 消息（NVIDIA wrapper）"""
+        tool_calls = [
+            ToolCall(call.get("id") or f"call_{i}", call["name"], parse_arguments(call.get("args")))
+            for i, call in enumerate(getattr(result, "tool_calls", None) or [])
+        ]
+        return Completion(result.content, route, *usage_from_response(result), tool_calls=tool_calls)
+    
+    def _stream(self, turns: List[Dict], route: ModelRoute, trace: Dict) -> Iterator[str]:
+        """向 provider 发送流式请求，逐段产出增量文本，token 用量写入 trace["usage"]"""
+        client = self._get_client(route)
+        
+        if route.provider == ModelProvider.NVIDIA:
+            for chunk in client.stream(self._langchain_messages(turns)):
+                if getattr(chunk, "usage_metadata", None):
+                    trace["usage"] = usage_from_response(chunk)
+                if chunk.content:
+                    yield chunk.content
+            return
+        
+        model = self._api_model(route)
+        
+        if route.provider == ModelProvider.ANTHROPIC:
+            with client.messages.stream(
+                model=model,
+                max_tokens=self.config.max_tokens,
+                temperature=self.config.temperature,
+                system=self._anthropic_system(turns),
+                messages=self._anthropic_messages(turns)
+            ) as stream:
+                for text in stream.text_stream:
+                    yield text
+                trace["usage"] = usage_from_response(stream.get_final_message())
+            return
+        
+        # OpenAI compatible (OpenAI, OpenRouter)
+        stream = client.chat.completions.create(
+            model=model,
+            temperature=self.config.temperature,
+            max_tokens=self.config.max_tokens,
+            messages=self._build_messages(turns),
+            stream=True,
+            **self._stream_options(route),
+            **self._cache_hint(route)
+        )
+        for chunk in stream:
+            if getattr(chunk, "usage", None):
+                trace["usage"] = usage_from_response(chunk)
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+    
+    async def _astream(self, turns: List[Dict], route: ModelRoute,
+                       trace: Dict) -> AsyncIterator[str]:
+        """异步版 _stream"""
+        client = self._get_async_client(route)
+        model = self._api_model(route)
+        
+        if route.provider == ModelProvider.ANTHROPIC:
+            async with client.messages.stream(
+                model=model,
+                max_tokens=self.config.max_tokens,
+                temperature=self.config.temperature,
+                system=self._anthropic_system(turns),
+                messages=self._anthropic_messages(turns)
+            ) as stream:
+                async for text in stream.text_stream:
+                    yield text
+                trace["usage"] = usage_from_response(await stream.get_final_message())
+            return
+        
+        # OpenAI compatible (OpenAI, OpenRouter, NVIDIA)
+        stream = await client.chat.completions.create(
+            model=model,
+            temperature=self.config.temperature,
+            max_tokens=self.config.max_tokens,
+            messages=self._build_messages(turns),
+            stream=True,
+            **self._stream_options(route),
+            **self._cache_hint(route)
+        )
+        async for chunk in stream:
+            if getattr(chunk, "usage", None):
+                trace["usage"] = usage_from_response(chunk)
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
     
     def tool_call(self, tool_name: str, **kwargs) -> Any:
-        """调用工具"""
-        # TODO: 实现工具调用逻辑
-        pass
+        """
+        直接调用工具（不经过模型），返回工具的原始结果
+        
+        tool_name 可以是已配置工具的名称，也可以是任何可由工具注册表解析的名称
+        （已注册函数、技能 ID、"mcp:<服务ID>"）。
+        """
+        for tool in self.tools:
+            if tool.name == tool_name:
+                return tool.invoke(kwargs)
+        tool = get_tool_registry().get(tool_name, self)
+        if tool is None:
+            raise KeyError(f"未知的工具: {tool_name}")
+        return tool.invoke(kwargs)
     
     def __repr__(self):
         return f"Agent({self.config.name}, {self.config.model})"
@@ -139,17 +1539,22 @@ class Agent:
 class AgentManager:
     """智能体管理器"""
     
-    def __init__(self):
+    def __init__(self, registry: ClientRegistry = None, router=None):
         self.agents: Dict[str, Agent] = {}
+        # 所有管理器默认共享进程级客户端注册表，新建管理器不会重新建连
+        self.registry = registry or get_client_registry()
+        # 默认模型路由器：create_agent 未指定 router 时使用
+        self.router = router
     
     def create_agent(self, name: str, model: str, role: str, **kwargs) -> Agent:
+        kwargs.setdefault("router", self.router)
         config = AgentConfig(
             name=name,
             model=model,
             role=role,
             **kwargs
         )
-        agent = Agent(config)
+        agent = Agent(config, registry=self.registry)
         self.agents[name] = agent
         return agent
     
@@ -162,6 +1567,20 @@ class AgentManager:
     def remove_agent(self, name: str):
         if name in self.agents:
             del self.agents[name]
+    
+    def get_stats(self) -> Dict[str, Dict]:
+        """
+        各智能体的调用统计
+        
+        返回 {智能体: {"models": {模型: 汇总}, "counters": 缓存/路由计数}}，
+        模型汇总包含调用数、结果分布、token、估算费用，以及延迟和首 token 时间的分位数。
+        按场景（swarm 策略、技能）的汇总见 get_metrics().by_scope()。
+        """
+        metrics = get_metrics()
+        return {
+            name: {"models": metrics.for_agent(agent.metrics_id), "counters": dict(agent.stats)}
+            for name, agent in self.agents.items()
+        }
 
 
 if __name__ == "__main__":
@@ -0,0 +1,393 @@
+"""
+Teamily AI Core - 智能体工具
+工具定义、注册表与并发执行
+
+工具来源：
+1. 普通函数 - 通过 ToolRegistry.register / @registry.tool 注册
+2. 技能市场 - SkillMarket 中的技能（按技能 ID 引用）
+3. 魔搭 MCP - ModelScopeMCP 中的服务（按 "mcp:<服务ID>" 引用）
+
+模型在一轮回复中请求多个工具时，工具在有界线程池中并发执行，
+结果一次性回传给模型。
+"""
+
+import json
+import time
+import threading
+from types import SimpleNamespace
+from dataclasses import dataclass, field
+from typing import Optional, Dict, List, Any, Callable, Tuple, TYPE_CHECKING
+
+from .prompt_budget import PromptBudget
+
+if TYPE_CHECKING:
+    from concurrent.futures import ThreadPoolExecutor
+
+# 工具线程池大小：同时执行的工具调用上限（所有智能体共用）
+TOOL_WORKERS = 8
+
+MCP_PREFIX = "mcp:"
+
+# 技能参数类型 -> JSON Schema 类型
+_SCHEMA_TYPES = {
+    "string": "string", "str": "string",
+    "int": "integer", "integer": "integer",
+    "float": "number", "number": "number",
+    "bool": "boolean", "boolean": "boolean",
+    "list": "array", "array": "array",
+    "dict": "object", "object": "object",
+}
+
+# 已知 MCP 服务的参数（未列出的服务接受任意参数）
+MCP_PARAMETERS = {
+    "modelscope_search": {"query": {"type": "string", "description": "搜索关键词"}},
+    "web_search": {"query": {"type": "string", "description": "搜索关键词"}},
+    "modelscope_inference": {
+        "prompt": {"type": "string", "description": "输入文本"},
+        "model": {"type": "string", "description": "模型 ID，默认 qwen/Qwen-7B-Chat"},
+    },
+    "amap_map": {
+        "action": {"type": "string", "description": "接口路径，如 geocode/geo"},
+        "key": {"type": "string", "description": "高德 API Key"},
+    },
+}
+
+
+@dataclass
+class Tool:
+    """
+    一个可供模型调用的工具
+
+    parameters 为 JSON Schema（type=object）；handler 接收参数字典并返回结果，
+    非字符串结果以 JSON 形式回传给模型。
+    """
+    name: str
+    description: str
+    handler: Callable[[Dict], Any]
+    parameters: Dict = field(default_factory=lambda: {"type": "object", "properties": {}})
+    source: str = "function"  # function / skill / mcp
+
+    def to_openai(self) -> Dict:
+        """OpenAI 兼容的 tools 条目"""
+        return {
+            "type": "function",
+            "function": {
+                "name": self.name,
+                "description": self.description,
+                "parameters": self.parameters,
+            }
+        }
+
+    def to_anthropic(self) -> Dict:
+        """Anthropic 的 tools 条目"""
+        return {"name": self.name, "description": self.description, "input_schema": self.parameters}
+
+    def invoke(self, arguments: Dict) -> Any:
+        return self.handler(arguments or {})
+
+
+@dataclass(frozen=True)
+class ToolSet:
+    """
+    一次请求提供给模型的工具
+
+    choice 为 "none" 时仍发送工具定义（历史中有工具调用时 provider 要求），但不允许模型再调用。
+    """
+    tools: Tuple[Tool, ...] = ()
+    choice: str = "auto"  # auto / none
+
+    def __bool__(self):
+        return bool(self.tools)
+
+    @property
+    def names(self) -> List[str]:
+        return [tool.name for tool in self.tools]
+
+
+@dataclass
+class ToolCall:
+    """模型请求的一次工具调用"""
+    id: str
+    name: str
+    arguments: Dict = field(default_factory=dict)
+
+    def to_dict(self) -> Dict:
+        return {"id": self.id, "name": self.name, "arguments": self.arguments}
+
+
+@dataclass
+class ToolResult:
+    """一次工具调用的结果（content 为回传给模型的文本）"""
+    call_id: str
+    name: str
+    content: str
+    is_error: bool = False
+    duration: float = 0.0
+
+
+def parse_arguments(arguments) -> Dict:
+    """解析模型返回的工具参数（OpenAI 为 JSON 字符串，其余 provider 为字典）"""
+    if isinstance(arguments, dict):
+        return arguments
+    if not arguments:
+        return {}
+    try:
+        parsed = json.loads(arguments)
+    except (TypeError, ValueError):
+        return {"input": arguments}
+    return parsed if isinstance(parsed, dict) else {"input": parsed}
+
+
+def _to_text(output: Any) -> str:
+    if isinstance(output, str):
+        return output
+    return json.dumps(output, ensure_ascii=False, default=str)
+
+
+def skill_tool(skill, market, agent=None) -> Tool:
+    """把技能市场中的技能包装为工具；技能执行失败时抛出异常"""
+    properties = {}
+    required = []
+    for param in skill.parameters:
+        schema = {
+            "type": _SCHEMA_TYPES.get(param.get("type", "string"), "string"),
+            "description": param.get("description", ""),
+        }
+        if "default" in param:
+            schema["default"] = param["default"]
+        properties[param["name"]] = schema
+        if param.get("required"):
+            required.append(param["name"])
+
+    # 以提示词模板执行的技能由 agent 回答；这次回答不再提供工具，避免技能内递归调用工具
+    runner = None
+    if agent is not None:
+        runner = SimpleNamespace(
+            chat=lambda prompt, context=None: agent.chat(prompt, {**(context or {}), "tools": False})
+        )
+
+    def handler(arguments: Dict) -> Any:
+        params = {
+            p["name"]: p["default"] for p in skill.parameters
+            if "default" in p and p["name"] not in arguments
+        }
+        params.update(arguments)
+        execution = market.execute(skill.id, params, runner)
+        if execution.status != "success":
+            raise RuntimeError(execution.error or f"技能执行失败: {skill.id}")
+        return execution.output
+
+    return Tool(
+        name=skill.id,
+        description=f"{skill.name}：{skill.description}",
+        handler=handler,
+        parameters={"type": "object", "properties": properties, "required": required},
+        source="skill"
+    )
+
+
+def mcp_tool(mcp_id: str, mcp) -> Tool:
+    """把魔搭 MCP 服务包装为工具（工具名为 mcp_<服务ID>，满足各 provider 的命名限制）"""
+    info = mcp.mcp_registry[mcp_id]
+
+    def handler(arguments: Dict) -> Any:
+        result = mcp.call_mcp(mcp_id, arguments)
+        if isinstance(result, dict) and result.get("error"):
+            raise RuntimeError(result["error"])
+        return result
+
+    properties = MCP_PARAMETERS.get(mcp_id)
+    parameters = {"type": "object", "properties": properties or {}}
+    if properties is None:
+        parameters["additionalProperties"] = True
+    return Tool(
+        name=f"mcp_{mcp_id}",
+        description=f"{info['name']}：{info['description']}",
+        handler=handler,
+        parameters=parameters,
+        source="mcp"
+    )
+
+
+class ToolRegistry:
+    """
+    工具注册表
+
+    AgentConfig.tools 中的名称按以下顺序解析：
+    已注册的工具 -> "mcp:<服务ID>"（魔搭 MCP）-> 技能 ID（技能市场）
+
+    Example:
+        registry = get_tool_registry()
+
+        @registry.tool(description="查询城市天气", parameters={
+            "type": "object",
+            "properties": {"city": {"type": "string"}},
+            "required": ["city"],
+        })
+        def weather(city: str) -> str:
+            ...
+
+        agent = manager.create_agent("助手", "gpt-4o", "你是助手",
+                                     tools=["weather", "market_research", "mcp:web_search"])
+    """
+
+    def __init__(self, market=None):
+        self._tools: Dict[str, Tool] = {}
+        self._market = market
+        self._lock = threading.Lock()
+
+    def register(self, tool: Tool) -> Tool:
+        with self._lock:
+            self._tools[tool.name] = tool
+        return tool
+
+    def tool(self, name: str = None, description: str = "", parameters: Dict = None):
+        """装饰器：把函数注册为工具（模型给出的参数按关键字传入）"""
+        def decorator(func: Callable) -> Callable:
+            self.register(Tool(
+                name=name or func.__name__,
+                description=description or (func.__doc__ or "").strip(),
+                handler=lambda arguments: func(**arguments),
+                parameters=parameters or {"type": "object", "properties": {}}
+            ))
+            return func
+        return decorator
+
+    def unregister(self, name: str):
+        with self._lock:
+            self._tools.pop(name, None)
+
+    @property
+    def market(self):
+        """技能市场（首次解析技能或 MCP 工具时才创建）"""
+        if self._market is None:
+            from .skill_market import get_skill_market
+            self._market = get_skill_market()
+        return self._market
+
+    def get(self, name: str, agent=None) -> Optional[Tool]:
+        """
+        按名称解析工具，未知名称返回 None
+
+        技能工具绑定 agent：以提示词模板执行的技能由该智能体回答。
+        """
+        with self._lock:
+            tool = self._tools.get(name)
+        if tool is not None:
+            return tool
+
+        if name.startswith(MCP_PREFIX):
+            mcp = self.market.modelscope
+            mcp_id = name[len(MCP_PREFIX):]
+            if mcp is None or mcp_id not in mcp.mcp_registry:
+                return None
+            return mcp_tool(mcp_id, mcp)
+
+        skill = self.market.get(name)
+        if skill is None:
+            return None
+        return skill_tool(skill, self.market, agent)
+
+    def resolve(self, names: List[str], agent=None) -> List[Tool]:
+        """解析一组工具名称，未知名称抛出 KeyError"""
+        tools = []
+        for name in names:
+            tool = self.get(name, agent)
+            if tool is None:
+                raise KeyError(f"未知的工具: {name}")
+            tools.append(tool)
+        return tools
+
+    def list_tools(self) -> List[str]:
+        with self._lock:
+            return list(self._tools)
+
+
+def _run_one(call: ToolCall, tools: Dict[str, Tool], max_tokens: Optional[int]) -> ToolResult:
+    """执行一次工具调用；异常作为错误结果回传给模型，而不是中断对话"""
+    start = time.monotonic()
+    tool = tools.get(call.name)
+    try:
+        if tool is None:
+            raise KeyError(f"未知的工具: {call.name}")
+        content, is_error = _to_text(tool.invoke(call.arguments)), False
+    except Exception as e:
+        content, is_error = f"Error: {e}", True
+    if max_tokens is not None:
+        content = PromptBudget(max_tokens).truncate_middle(content, max_tokens)
+    return ToolResult(call.id, call.name, content, is_error, time.monotonic() - start)
+
+
+def execute_tool_calls(calls: List[ToolCall], tools: List[Tool],
+                       max_tokens: Optional[int] = None) -> List[ToolResult]:
+    """
+    执行一轮工具调用，结果与 calls 顺序一致
+
+    多个调用在共享的有界线程池中并发执行；max_tokens 限制每个结果回传给模型的长度。
+    """
+    by_name = {tool.name: tool for tool in tools}
+    if len(calls) == 1:
+        return [_run_one(calls[0], by_name, max_tokens)]
+    executor = get_tool_executor()
+    futures = [executor.submit(_run_one, call, by_name, max_tokens) for call in calls]
+    return [future.result() for future in futures]
+
+
+async def aexecute_tool_calls(calls: List[ToolCall], tools: List[Tool],
+                              max_tokens: Optional[int] = None) -> List[ToolResult]:
+    """异步版 execute_tool_calls：工具在线程池中执行，不阻塞事件循环"""
+    import asyncio
+    by_name = {tool.name: tool for tool in tools}
+    loop = asyncio.get_running_loop()
+    executor = get_tool_executor()
+    return list(await asyncio.gather(*[
+        loop.run_in_executor(executor, _run_one, call, by_name, max_tokens)
+        for call in calls
+    ]))
+
+
+# 全局工具线程池
+_executor = None
+_executor_lock = threading.Lock()
+
+def get_tool_executor() -> "ThreadPoolExecutor":
+    """获取工具调用共用的有界线程池"""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                from concurrent.futures import ThreadPoolExecutor
+                _executor = ThreadPoolExecutor(max_workers=TOOL_WORKERS, thread_name_prefix="agent-tool")
+    return _executor
+
+
+# 全局工具注册表
+_tool_registry = None
+_tool_registry_lock = threading.Lock()
+
+def get_tool_registry() -> ToolRegistry:
+    """获取进程级工具注册表"""
+    global _tool_registry
+    if _tool_registry is None:
+        with _tool_registry_lock:
+            if _tool_registry is None:
+                _tool_registry = ToolRegistry()
+    return _tool_registry
+
+
+__all__ = [
+    "Tool",
+    "ToolSet",
+    "ToolCall",
+    "ToolResult",
+    "ToolRegistry",
+    "skill_tool",
+    "mcp_tool",
+    "parse_arguments",
+    "execute_tool_calls",
+    "aexecute_tool_calls",
+    "get_tool_executor",
+    "get_tool_registry",
+    "TOOL_WORKERS",
+    "MCP_PARAMETERS",
+]
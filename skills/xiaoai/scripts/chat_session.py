@@ -0,0 +1,196 @@
+"""
+Teamily AI Core - 多轮会话
+按 (智能体, 会话) 维护滚动的对话历史：超出 token 预算的早期轮次压缩进摘要，
+每次请求发送结构化的多轮消息，提示词长度不再随对话轮数线性增长。
+"""
+
+import threading
+from typing import Optional, Dict, List, Callable
+
+from .llm_metrics import estimate_tokens
+
+
+# 摘要函数：(已有摘要, 被移出历史的轮次, 摘要 token 上限) -> 新摘要
+Summarizer = Callable[[str, List[Dict], int], str]
+
+
+def truncate_summary(summary: str, evicted: List[Dict], max_tokens: int,
+                     line_chars: int = 80) -> str:
+    """
+    默认摘要：每个被移出的轮次保留开头一行，超出上限时丢弃最早的行
+
+    不调用模型，开销可以忽略；需要更高质量的摘要时使用 llm_summarizer。
+    """
+    lines = summary.splitlines() if summary else []
+    for turn in evicted:
+        text = " ".join(turn["content"].split())
+        if len(text) > line_chars:
+            text = text[:line_chars] + "…"
+        lines.append(f"- 我: {text}" if turn["role"] == "assistant" else f"- {text}")
+
+    total = sum(estimate_tokens(line) for line in lines)
+    while lines and total > max_tokens:
+        total -= estimate_tokens(lines.pop(0))
+    return "\n".join(lines)
+
+
+def llm_summarizer(agent) -> Summarizer:
+    """用智能体（通常是便宜的小模型）把早期对话压缩成要点"""
+    def summarize(summary: str, evicted: List[Dict], max_tokens: int) -> str:
+        transcript = "\n".join(
+            f"{'我' if t['role'] == 'assistant' else '对方'}: {t['content']}"
+            for t in evicted
+        )
+        prompt = f"""请把下面的对话并入已有摘要，输出不超过 {max_tokens} token 的要点列表，保留结论、决定和未解决的问题。
+
+已有摘要:
+{summary or "（无）"}
+
+新增对话:
+{transcript}"""
+        return agent.chat(prompt)
+    return summarize
+
+
+class ChatSession:
+    """
+    一个智能体在一个会话中的多轮历史
+
+    - turns: user / assistant 交替的结构化消息（连续同角色的消息会合并）
+    - summary: 超出预算后被移出历史的早期轮次的摘要，随请求作为 system 轮次发送
+    - max_tokens: 历史（不含摘要）的 token 预算；至少保留最近 keep_recent 个轮次
+
+    摘要函数在锁外调用（llm_summarizer 需要一次模型请求），其间其他线程仍可读写历史；
+    移出后尚未并入摘要的轮次照常随请求发送。异步路径（arecord）在线程池中调用同步摘要函数。
+
+    Example:
+        session = agent.session("user-42")
+        session.chat("帮我规划一下周末")
+        session.chat("预算再低一点")      # 自动带上前面的对话
+    """
+
+    def __init__(self, agent, session_id: str,
+                 max_tokens: int = 2000,
+                 summary_tokens: int = 300,
+                 keep_recent: int = 2,
+                 summarizer: Optional[Summarizer] = None):
+        self.agent = agent
+        self.id = session_id
+        self.max_tokens = max_tokens
+        self.summary_tokens = summary_tokens
+        self.keep_recent = keep_recent
+        self.summarizer = summarizer or truncate_summary
+
+        self.turns: List[Dict] = []
+        self.summary = ""
+        self._tokens: List[int] = []  # 与 turns 一一对应
+        self._evicted: List[Dict] = []  # 已移出历史、尚未并入摘要的轮次（按时间顺序）
+        self._generation = 0  # clear() 时递增，丢弃清空前开始的摘要结果
+        self._lock = threading.Lock()
+        self._summary_lock = threading.Lock()  # 串行化摘要，保证按移出顺序并入
+
+    def _append(self, role: str, content: str):
+        """追加一条消息；与上一条同角色时合并（Anthropic 要求 user / assistant 交替）"""
+        if self.turns and self.turns[-1]["role"] == role:
+            last = self.turns[-1]
+            last["content"] = f"{last['content']}\n\n{content}"
+            self._tokens[-1] = estimate_tokens(last["content"])
+            return
+        self.turns.append({"role": role, "content": content})
+        self._tokens.append(estimate_tokens(content))
+
+    def observe(self, author: str, content: str):
+        """记录会话中其他参与者的发言（例如群聊中别人的消息）"""
+        with self._lock:
+            self._append("user", f"{author}: {content}")
+            compacted = self._compact()
+        if compacted:
+            self._summarize()
+
+    def record(self, message: str, reply: str):
+        """记录一轮问答"""
+        with self._lock:
+            self._append("user", message)
+            self._append("assistant", reply)
+            compacted = self._compact()
+        if compacted:
+            self._summarize()
+
+    async def arecord(self, message: str, reply: str):
+        """异步版 record：摘要不阻塞事件循环"""
+        with self._lock:
+            self._append("user", message)
+            self._append("assistant", reply)
+            compacted = self._compact()
+        if compacted:
+            import asyncio
+            await asyncio.to_thread(self._summarize)
+
+    def build(self, message: str) -> List[Dict]:
+        """构建本次请求的多轮消息（不修改历史）"""
+        with self._lock:
+            turns = []
+            if self.summary:
+                turns.append({"role": "system", "content": f"早前对话摘要:\n{self.summary}"})
+            turns.extend(dict(t) for t in self._evicted)
+            turns.extend(dict(t) for t in self.turns)
+        if turns and turns[-1]["role"] == "user":
+            turns[-1] = {"role": "user", "content": f"{turns[-1]['content']}\n\n{message}"}
+        else:
+            turns.append({"role": "user", "content": message})
+        return turns
+
+    def _compact(self) -> bool:
+        """历史超出预算时把最早的轮次移到待摘要队列（调用方持有锁），返回是否有轮次移出"""
+        start = len(self._evicted)
+        while sum(self._tokens) > self.max_tokens and len(self.turns) > self.keep_recent:
+            self._evicted.append(self.turns.pop(0))
+            self._tokens.pop(0)
+        # 历史需以 user 开头
+        while self.turns and self.turns[0]["role"] == "assistant":
+            self._evicted.append(self.turns.pop(0))
+            self._tokens.pop(0)
+        return len(self._evicted) > start
+
+    def _summarize(self):
+        """把待摘要队列并入摘要；摘要函数在会话锁外调用"""
+        with self._summary_lock:
+            with self._lock:
+                evicted = list(self._evicted)
+                summary = self.summary
+                generation = self._generation
+            if not evicted:
+                return  # 已被其他线程一并处理
+            summary = self.summarizer(summary, evicted, self.summary_tokens)
+            with self._lock:
+                if generation == self._generation:
+                    self.summary = summary
+                    del self._evicted[:len(evicted)]
+
+    @property
+    def history_tokens(self) -> int:
+        return (sum(self._tokens) + estimate_tokens(self.summary)
+                + sum(estimate_tokens(t["content"]) for t in self._evicted))
+
+    def chat(self, message: str) -> str:
+        return self.agent.chat(message, context={"session": self})
+
+    async def achat(self, message: str) -> str:
+        return await self.agent.achat(message, context={"session": self})
+
+    def clear(self):
+        with self._lock:
+            self.turns.clear()
+            self._tokens.clear()
+            self._evicted = []
+            self.summary = ""
+            self._generation += 1
+
+    def __len__(self):
+        return len(self.turns)
+
+    def __repr__(self):
+        return f"ChatSession({self.id}, turns={len(self.turns)}, tokens={self.history_tokens})"
+
+
+__all__ = ["ChatSession", "truncate_summary", "llm_summarizer"]
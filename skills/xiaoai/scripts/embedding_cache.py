@@ -0,0 +1,410 @@
+"""
+Teamily AI Core - 嵌入缓存
+按 (模型, sha256(文本)) 缓存文本嵌入，记忆系统与 RAG 共用一个进程级实例：
+重复导入的文档、相同的聊天消息、重复的查询不再重新计算嵌入
+"""
+
+import os
+import re
+import math
+import time
+import struct
+import hashlib
+import threading
+import mmap
+from array import array
+from collections import OrderedDict
+from typing import Optional, Dict, List, Callable, Sequence, Tuple
+
+from .llm_cache import _default_cache_dir
+
+
+def _as_float32(vector: Sequence[float]) -> array:
+    """嵌入向量转为 float32 数组"""
+    if isinstance(vector, array) and vector.typecode == "f":
+        return vector
+    if hasattr(vector, "astype"):
+        return array("f", vector.astype("float32").tobytes())
+    return array("f", vector)
+
+
+class _EmbeddingFile:
+    """
+    磁盘层的一个记录文件
+
+    文件头之后为定长记录：32 字节 sha256 + dim 个 float32。新记录以 O_APPEND 一次写入追加，
+    读取通过 mmap 直接取对应字节，不把文件读入内存；打开时只扫描各记录的 sha256 建立行号索引。
+    """
+
+    MAGIC = b"XAEMB001"
+    HEADER = 16
+
+    def __init__(self, path: str, dim: int):
+        self.path = path
+        flags = os.O_RDWR | getattr(os, "O_BINARY", 0)
+        try:
+            fd = os.open(path, flags | os.O_CREAT | os.O_EXCL)
+            os.write(fd, struct.pack("<8sII", self.MAGIC, dim, 0))
+            os.close(fd)
+        except FileExistsError:
+            pass
+        self._fd = os.open(path, flags | os.O_APPEND)
+        os.lseek(self._fd, 0, os.SEEK_SET)
+        header = os.read(self._fd, self.HEADER)
+        if len(header) < self.HEADER or header[:8] != self.MAGIC:
+            os.close(self._fd)
+            raise ValueError(f"不是嵌入缓存文件: {path}")
+        _, self.dim, _ = struct.unpack("<8sII", header)
+        self.record = 32 + 4 * self.dim
+        self.inode = os.fstat(self._fd).st_ino
+        self._rows: Dict[bytes, int] = {}
+        self._indexed = 0
+        self._mm: Optional[mmap.mmap] = None
+        self.refresh()
+
+    def __len__(self):
+        return len(self._rows)
+
+    def refresh(self, size: int = None):
+        """映射文件的当前长度（size 为已知的文件长度），索引新增的记录（末尾不完整的记录忽略）"""
+        if size is None:
+            size = os.fstat(self._fd).st_size
+        count = (size - self.HEADER) // self.record
+        if count <= self._indexed:
+            return
+        if self._mm is not None:
+            self._mm.close()
+        self._mm = mmap.mmap(self._fd, self.HEADER + count * self.record, access=mmap.ACCESS_READ)
+        for row in range(self._indexed, count):
+            offset = self.HEADER + row * self.record
+            self._rows.setdefault(self._mm[offset:offset + 32], row)
+        self._indexed = count
+
+    def get(self, digest: bytes) -> Optional[array]:
+        """读取已索引的记录（不检查其他进程的新追加）"""
+        row = self._rows.get(digest)
+        if row is None:
+            return None
+        offset = self.HEADER + row * self.record + 32
+        return array("f", self._mm[offset:offset + 4 * self.dim])
+
+    def append(self, items: List[Tuple[bytes, array]]):
+        data = b"".join(digest + vector.tobytes() for digest, vector in items
+                        if len(vector) == self.dim and digest not in self._rows)
+        view = memoryview(data)
+        while view:
+            view = view[os.write(self._fd, view):]
+        self.refresh()
+
+    def close(self):
+        if self._mm is not None:
+            self._mm.close()
+            self._mm = None
+        os.close(self._fd)
+
+
+class _DiskTier:
+    """
+    一个模型的磁盘层：当前文件 + 上一代文件（<路径>.1）
+
+    当前文件达到 max_entries 条时轮转：当前文件改名为上一代（替换更早的一代），
+    新建空的当前文件。上一代中命中的记录写回当前文件，常用的嵌入跨轮转保留。
+    每个模型最多 2 × max_entries 条，打开时扫描与内存中的行号索引也以此为界。
+
+    其他进程追加或轮转的文件在未命中时检查，但至多每 refresh_interval 秒一次（一次 stat）。
+    """
+
+    def __init__(self, path: str, dim: int, max_entries: int, refresh_interval: float):
+        self.path = path
+        self.max_entries = max_entries
+        self.refresh_interval = refresh_interval
+        self.current: Optional[_EmbeddingFile] = None
+        self.previous: Optional[_EmbeddingFile] = None
+        self._open(dim)
+
+    def _open(self, dim: int):
+        self.current = _EmbeddingFile(self.path, dim)
+        previous = self.path + ".1"
+        self.previous = _EmbeddingFile(previous, 0) if os.path.exists(previous) else None
+        self._checked = time.monotonic()
+
+    def _close_files(self):
+        for disk in (self.current, self.previous):
+            if disk is not None:
+                disk.close()
+        self.current = self.previous = None
+
+    def __len__(self):
+        return len(self.current) + (len(self.previous) if self.previous is not None else 0)
+
+    def _sync(self):
+        """跟上其他进程的追加与轮转"""
+        self._checked = time.monotonic()
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return  # 其他进程正在轮转
+        if stat.st_ino == self.current.inode:
+            self.current.refresh(stat.st_size)
+            return
+        dim = self.current.dim
+        self._close_files()
+        self._open(dim)
+
+    def get(self, digest: bytes) -> Optional[array]:
+        vector = self.current.get(digest)
+        if vector is None and self.previous is not None:
+            vector = self.previous.get(digest)
+            if vector is not None:
+                self.append([(digest, vector)])
+        if vector is None and time.monotonic() - self._checked >= self.refresh_interval:
+            self._sync()
+            vector = self.current.get(digest)
+        return vector
+
+    def append(self, items: List[Tuple[bytes, array]]):
+        if len(self.current) + len(items) > self.max_entries:
+            self._rotate()
+        self.current.append(items)
+
+    def _rotate(self):
+        dim = self.current.dim
+        try:
+            os.replace(self.path, self.path + ".1")
+        except FileNotFoundError:
+            # 其他进程刚完成轮转：改用它新建的当前文件
+            self._sync()
+            return
+        if self.previous is not None:
+            self.previous.close()
+        self.previous = self.current
+        self.current = _EmbeddingFile(self.path, dim)
+
+    def close(self):
+        self._close_files()
+
+    def remove(self):
+        self._close_files()
+        for path in (self.path, self.path + ".1"):
+            if os.path.exists(path):
+                os.remove(path)
+
+
+class EmbeddingCache:
+    """
+    内容寻址的嵌入缓存
+
+    两级存储：
+    - 内存 LRU：最多 max_entries 条，float32 数组，命中无 IO
+    - 磁盘层（cache_dir 为 None 时不使用）：每个模型一个定长记录文件，mmap 读取，
+      进程重启后仍然有效；同一模型的维度以首次写入为准，维度不同的向量只进内存层。
+      每个文件最多 max_disk_entries 条，满时轮转，每个模型至多保留两代
+
+    返回的向量为 array('f')，与其他调用方共享，不应修改。
+    """
+
+    def __init__(self, max_entries: int = 4096, cache_dir: Optional[str] = None,
+                 max_disk_entries: int = 50000, refresh_interval: float = 1.0):
+        self.max_entries = max_entries
+        self.cache_dir = cache_dir
+        self.max_disk_entries = max_disk_entries
+        self.refresh_interval = refresh_interval
+
+        self._memory: "OrderedDict[tuple, array]" = OrderedDict()  # (model, sha256) -> 向量
+        self._files: Dict[str, Optional[_DiskTier]] = {}
+        self._absent: Dict[str, float] = {}  # 尚无磁盘文件的模型 -> 上次检查时间
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def digest(text: str) -> bytes:
+        return hashlib.sha256(text.encode("utf-8")).digest()
+
+    def _file(self, model: str, dim: int = None) -> Optional[_DiskTier]:
+        """
+        模型对应的磁盘层；尚未创建且未给出 dim，或目录不可写时返回 None
+
+        文件不存在的结果缓存 refresh_interval 秒，未命中时不必每次检查文件系统。
+        """
+        if self.cache_dir is None:
+            return None
+        if model in self._files:
+            return self._files[model]
+        if dim is None and time.monotonic() - self._absent.get(model, -math.inf) < self.refresh_interval:
+            return None
+        name = re.sub(r"[^\w.-]", "_", model)[:64]
+        suffix = hashlib.sha256(model.encode("utf-8")).hexdigest()[:8]
+        path = os.path.join(self.cache_dir, f"{name}-{suffix}.emb")
+        if dim is None and not os.path.exists(path):
+            self._absent[model] = time.monotonic()
+            return None
+        self._absent.pop(model, None)
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            self._files[model] = _DiskTier(path, dim or 0, self.max_disk_entries,
+                                           self.refresh_interval)
+        except (OSError, ValueError):
+            # 目录不可写或文件损坏：该模型只使用内存层
+            self._files[model] = None
+        return self._files[model]
+
+    def _put_memory(self, key: tuple, vector: array):
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _lookup(self, model: str, digest: bytes) -> Optional[array]:
+        key = (model, digest)
+        vector = self._memory.get(key)
+        if vector is not None:
+            self._memory.move_to_end(key)
+            self.hits += 1
+            return vector
+        disk = self._file(model)
+        if disk is not None:
+            vector = disk.get(digest)
+            if vector is not None:
+                # 回填内存层
+                self._put_memory(key, vector)
+                self.hits += 1
+                self.disk_hits += 1
+                return vector
+        self.misses += 1
+        return None
+
+    def _store(self, model: str, items: List[Tuple[bytes, array]]):
+        for digest, vector in items:
+            self._put_memory((model, digest), vector)
+        if items:
+            disk = self._file(model, len(items[0][1]))
+            if disk is not None:
+                try:
+                    disk.append(items)
+                except OSError:
+                    pass
+
+    def get(self, model: str, text: str) -> Optional[array]:
+        """读取缓存的嵌入，未命中返回 None"""
+        with self._lock:
+            return self._lookup(model, self.digest(text))
+
+    def set(self, model: str, text: str, vector: Sequence[float]) -> array:
+        """写入嵌入，返回缓存中的 float32 向量"""
+        vector = _as_float32(vector)
+        with self._lock:
+            self._store(model, [(self.digest(text), vector)])
+        return vector
+
+    def get_or_compute(self, model: str, text: str,
+                       embed: Callable[[str], Sequence[float]]) -> array:
+        """命中时直接返回，否则调用 embed(text) 计算并写入缓存"""
+        vector = self.get(model, text)
+        if vector is None:
+            vector = self.set(model, text, embed(text))
+        return vector
+
+    def get_or_compute_many(self, model: str, texts: Sequence[str],
+                            embed_many: Callable[[List[str]], List[Sequence[float]]]) -> List[array]:
+        """批量版本：未命中的文本去重后一次调用 embed_many(texts) 计算，结果与 texts 顺序一致"""
+        digests = [self.digest(text) for text in texts]
+        vectors: List[Optional[array]] = [None] * len(texts)
+        missing: Dict[bytes, List[int]] = {}
+        with self._lock:
+            for i, digest in enumerate(digests):
+                if digest in missing:
+                    missing[digest].append(i)
+                    continue
+                vectors[i] = self._lookup(model, digest)
+                if vectors[i] is None:
+                    missing[digest] = [i]
+        if missing:
+            computed = embed_many([texts[rows[0]] for rows in missing.values()])
+            items = [(digest, _as_float32(vector)) for digest, vector in zip(missing, computed)]
+            with self._lock:
+                self._store(model, items)
+            for (digest, vector) in items:
+                for i in missing[digest]:
+                    vectors[i] = vector
+        return vectors
+
+    def enable_disk(self, cache_dir: Optional[str] = None):
+        """
+        启用磁盘层（进程级实例默认只用内存层）
+
+        cache_dir 缺省为 XIAOAI_CACHE_DIR/embeddings（默认 ~/.cache/xiaoai/embeddings）。
+        """
+        with self._lock:
+            self.cache_dir = cache_dir or os.path.join(_default_cache_dir(), "embeddings")
+            self._absent.clear()
+
+    def clear(self):
+        """清空缓存（包括磁盘层文件）"""
+        with self._lock:
+            self._memory.clear()
+            for disk in self._files.values():
+                if disk is not None:
+                    disk.remove()
+            self._files.clear()
+            self._absent.clear()
+
+    def close(self):
+        with self._lock:
+            for disk in self._files.values():
+                if disk is not None:
+                    disk.close()
+            self._files.clear()
+
+    def get_stats(self) -> Dict:
+        """获取缓存统计"""
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "memory_entries": len(self._memory),
+            "disk_entries": sum(len(d) for d in self._files.values() if d is not None),
+        }
+
+
+# 全局嵌入缓存实例
+_embedding_cache = None
+_embedding_cache_lock = threading.Lock()
+
+def get_embedding_cache() -> EmbeddingCache:
+    """
+    获取进程级嵌入缓存
+
+    默认只用内存层，不写磁盘；需要跨进程重启复用时调用 get_embedding_cache().enable_disk()。
+    """
+    global _embedding_cache
+    if _embedding_cache is None:
+        with _embedding_cache_lock:
+            if _embedding_cache is None:
+                _embedding_cache = EmbeddingCache()
+    return _embedding_cache
+
+
+def openai_embedding(model: str, text: str) -> List[float]:
+    """请求 OpenAI 嵌入接口（不经缓存，失败时抛出异常）"""
+    import openai
+    openai.api_key = os.getenv("OPENAI_API_KEY")
+    return openai.embeddings.create(model=model, input=text).data[0].embedding
+
+
+def cached_embedder(model: str) -> Callable[[str], array]:
+    """返回 text -> 向量 的嵌入函数：先查进程级嵌入缓存，未命中时请求 model 的嵌入接口"""
+    cache = get_embedding_cache()
+    return lambda text: cache.get_or_compute(model, text, lambda t: openai_embedding(model, t))
+
+
+__all__ = [
+    "EmbeddingCache",
+    "get_embedding_cache",
+    "openai_embedding",
+    "cached_embedder",
+]
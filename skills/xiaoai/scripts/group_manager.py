@@ -9,8 +9,10 @@ from typing import List, Dict, Optional, Callable, Any
 from dataclasses import dataclass, field
 from enum import Enum
 
-from .agent_manager import Agent, AgentManager
-from .memory_store import HybridMemoryStore, MemoryType
+from .agent_manager import Agent, AgentManager, chat_many
+from .chat_session import ChatSession
+from .prompt_budget import PromptBudget, PromptSection, KEEP, DROP_OLDEST
+from .memory_store import HybridMemoryStore, MemoryType, WORKING_MEMORY_POLICY
 
 class CollaborationStrategy(Enum):
     SEQUENTIAL = "sequential"   # 顺序执行
@@ -35,19 +37,32 @@ class Task:
     dependencies: List[str] = field(default_factory=list)
 
 class Group:
-    """协作群组"""
+    """
+    协作群组
     
-    def __init__(self, name: str, members: List[str] = None):
+    memory 默认为进程内记忆；需要在重启后保留群记忆时传入持久化的记忆库，如
+    HybridMemoryStore(store_type="sqlite", db_path="data/memory.db", namespace=群名称)。
+    默认记忆库的工作记忆（群消息）按 WORKING_MEMORY_POLICY 淘汰，长期运行时占用保持稳定。
+    """
+    
+    def __init__(self, name: str, members: List[str] = None,
+                 memory: HybridMemoryStore = None):
         self.id = str(uuid.uuid4())
         self.name = name
         self.human_members = members or []
         
         self.agents = AgentManager()
-        self.memory = HybridMemoryStore()
+        self.memory = memory or HybridMemoryStore(
+            policies={MemoryType.WORKING: WORKING_MEMORY_POLICY}
+        )
         
         self.messages: List[Message] = []
         self.tasks: Dict[str, Task] = {}
         
+        # 任务提示词的 token 预算（stats 中记录累计裁剪的 token 数）
+        self.budget = PromptBudget(4000)
+        self.result_tokens = 1000  # 顺序执行时每个前序结果的 token 上限
+        
         self.event_handlers: Dict[str, List[Callable]] = {
             "message": [],
             "task_complete": [],
@@ -94,28 +109,50 @@ class Group:
             importance=0.3
         )
         
+        # 同步到各智能体的群聊会话（发言者自己的回复已由会话记录）
+        for agent in self.agents.list_agents():
+            session = agent.sessions.get(self._session_id)
+            if session is not None and agent.config.name != author:
+                session.observe(author, content)
+        
         self._emit("message", msg)
         return msg
     
+    @property
+    def _session_id(self) -> str:
+        return f"group:{self.id}"
+    
+    def _session(self, agent: Agent) -> ChatSession:
+        """
+        智能体在本群组的多轮会话
+        
+        历史以结构化消息随请求发送并受 token 预算约束，不再把整段聊天记录拼进提示词。
+        首次加入讨论时用最近的群聊消息初始化。
+        """
+        session = agent.sessions.get(self._session_id)
+        if session is None:
+            session = agent.session(self._session_id)
+            for msg in self.messages[-10:]:
+                if msg.author != agent.config.name:
+                    session.observe(msg.author, msg.content)
+        return session
+    
     def discuss(self, topic: str, context: Dict = None) -> 'DiscussionResult':
         """发起讨论"""
         # 构建上下文
         context_str = "\n".join([f"{k}: {v}" for k, v in (context or {}).items()])
-        history = self._get_conversation_history()
         
         results = []
         
         # 让每个智能体参与讨论
         for agent in self.agents.list_agents():
+            session = self._session(agent)
             prompt = f"""讨论主题: {topic}
 {context_str}
 
-历史对话:
-{history}
-
 请作为 {agent.config.name}（{agent.config.role}）参与讨论，发表你的观点。"""
             
-            response = agent.chat(prompt)
+            response = agent.chat(prompt, context={"session": session})
             results.append({
                 "agent": agent.config.name,
                 "response": response
@@ -135,16 +172,13 @@ class Group:
             # 收集所有智能体的观点
             responses = []
             for agent in self.agents.list_agents():
-                history = self._get_conversation_history()
+                session = self._session(agent)
                 prompt = f"""讨论主题: {topic}
 
 当前是第 {round_num + 1} 轮讨论。
-历史对话:
-{history}
-
 请作为 {agent.config.name} 发表观点，并尝试总结当前共识或分歧。"""
                 
-                response = agent.chat(prompt)
+                response = agent.chat(prompt, context={"session": session})
                 responses.append(response)
                 self.add_message(agent.config.name, response)
             
@@ -176,21 +210,37 @@ class Group:
     def _assign_sequential(self, goal: str, agents: List[Agent]) -> 'TaskResult':
         """顺序执行任务"""
         results = []
-        shared_context = {"goal": goal}
-        
-        for agent in agents:
-            prompt = f"""任务目标: {goal}
+        template = """任务目标: {goal}
 
-之前的任务结果:
-{shared_context}
+请作为 {name}（{role}）执行你的部分任务。
 
-请作为 {agent.config.name}（{agent.config.role}）执行你的部分任务。"""
+之前的任务结果:
+{previous}"""
+        
+        for agent in agents:
+            # 前序结果逐条限长，总量超出预算时丢弃最早的结果
+            self.budget.model = agent.config.model
+            fitted = self.budget.fit([
+                PromptSection("goal", goal, strategy=KEEP),
+                PromptSection(
+                    "previous",
+                    items=[f"{r['agent']}: {r['result']}" for r in results],
+                    strategy=DROP_OLDEST,
+                    item_tokens=self.result_tokens
+                ),
+            ], overhead=template.format(
+                goal="", name=agent.config.name, role=agent.config.role, previous=""
+            ))
+            prompt = template.format(
+                goal=fitted["goal"],
+                name=agent.config.name,
+                role=agent.config.role,
+                previous=fitted["previous"] or "（无）"
+            )
             
             result = agent.chat(prompt)
             results.append({"agent": agent.config.name, "result": result})
             
-            shared_context[agent.config.name] = result
-            
             # 创建任务记录
             task = Task(
                 id=str(uuid.uuid4()),
@@ -206,15 +256,18 @@ class Group:
     
     def _assign_parallel(self, goal: str, agents: List[Agent]) -> 'TaskResult':
         """并行执行任务"""
-        # 简化版：实际应使用并发
-        results = []
-        
-        for agent in agents:
-            prompt = f"""任务目标: {goal}
+        prompts = [
+            f"""任务目标: {goal}
 
 请作为 {agent.config.name}（{agent.config.role}）独立完成这个任务。"""
-            
-            result = agent.chat(prompt)
+            for agent in agents
+        ]
+        
+        # 所有智能体并发请求 LLM
+        outputs = chat_many(agents, prompts)
+        
+        results = []
+        for agent, result in zip(agents, outputs):
             results.append({"agent": agent.config.name, "result": result})
             
             task = Task(
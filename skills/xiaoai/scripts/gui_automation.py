@@ -7,19 +7,33 @@ import os
 import sys
 import json
 import time
+import threading
 from typing import Optional, Tuple, List, Dict
 
-# 自动安装依赖
-try:
-    import pyautogui
-except ImportError:
-    import subprocess
-    subprocess.run([sys.executable, "-m", "pip", "install", "pyautogui", "-q"])
-    import pyautogui
+# pyautogui 在首次使用 GUI 功能时才导入（缺失时自动安装），导入本模块不加载 GUI 依赖
+pyautogui = None
+_pyautogui_lock = threading.Lock()
 
-# 安全设置
-pyautogui.FAILSAFE = True
-pyautogui.PAUSE = 0.5
+
+def _load_pyautogui():
+    """导入 pyautogui 并应用安全设置"""
+    global pyautogui
+    if pyautogui is None:
+        with _pyautogui_lock:
+            if pyautogui is None:
+                # 自动安装依赖
+                try:
+                    import pyautogui as module
+                except ImportError:
+                    import subprocess
+                    subprocess.run([sys.executable, "-m", "pip", "install", "pyautogui", "-q"])
+                    import pyautogui as module
+                
+                # 安全设置
+                module.FAILSAFE = True
+                module.PAUSE = 0.5
+                pyautogui = module
+    return pyautogui
 
 
 class GUIAutomation:
@@ -30,6 +44,7 @@ class GUIAutomation:
     """
     
     def __init__(self):
+        _load_pyautogui()
         self.screen_size = pyautogui.size()
     
     def get_screen_size(self) -> Tuple[int, int]:
@@ -184,7 +199,25 @@ def create_automation_task(task: str, gui: GUIAutomation = None) -> Dict:
     }
 
 
-# 便捷函数
-automation = GUIAutomation()
+# 全局实例（首次访问 automation 时创建）
+_automation = None
+_automation_lock = threading.Lock()
+
+def get_automation() -> GUIAutomation:
+    """获取全局 GUI 自动化实例"""
+    global _automation
+    if _automation is None:
+        with _automation_lock:
+            if _automation is None:
+                _automation = GUIAutomation()
+    return _automation
+
+
+def __getattr__(name: str):
+    # 兼容 from scripts.gui_automation import automation
+    if name == "automation":
+        return get_automation()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 
-__all__ = ["GUIAutomation", "automation", "create_automation_task"]
+__all__ = ["GUIAutomation", "automation", "get_automation", "create_automation_task"]
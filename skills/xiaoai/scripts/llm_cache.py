@@ -0,0 +1,538 @@
+"""
+Teamily AI Core - LLM 响应缓存
+相同请求（模型、系统角色、温度、提示词）直接复用历史响应；
+语义缓存让措辞不同但意思相近的问题也能命中；
+并发的相同请求合并为一次调用
+"""
+
+import os
+import weakref
+import json
+import math
+import time
+import hashlib
+import threading
+import importlib.util
+from collections import OrderedDict
+from typing import Optional, Dict, List, Callable, Any, Awaitable, Tuple
+
+# numpy（可选）：只检查是否安装，首次创建语义缓存时才导入，避免拖慢包的导入
+NUMPY_AVAILABLE = importlib.util.find_spec("numpy") is not None
+np = None
+
+
+def _import_numpy():
+    global np
+    if np is None:
+        import numpy
+        np = numpy
+    return np
+
+
+def _default_cache_dir() -> str:
+    return os.getenv("XIAOAI_CACHE_DIR") or os.path.join(
+        os.path.expanduser("~"), ".cache", "xiaoai"
+    )
+
+
+class ResponseCache:
+    """
+    精确匹配的 LLM 响应缓存
+
+    两级存储：
+    - 内存 LRU：容量有界，命中无 IO
+    - SQLite 持久层：进程重启后仍然有效（db_path=None 时仅使用内存）
+
+    过期时间在读取时按调用方的 ttl 判断，同一条缓存可被不同 TTL 的智能体共享。
+    """
+
+    def __init__(self, max_entries: int = 1024,
+                 db_path: Optional[str] = None,
+                 max_disk_entries: int = 100000):
+        self.max_entries = max_entries
+        self.max_disk_entries = max_disk_entries
+        self.db_path = db_path
+
+        self._memory: "OrderedDict[str, tuple]" = OrderedDict()  # key -> (value, created_at)
+        self._lock = threading.Lock()
+        self._conn = None
+        self._writes = 0
+
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        if db_path:
+            import sqlite3
+            os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+            self._conn = sqlite3.connect(db_path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, created_at REAL NOT NULL)"
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_responses_created ON responses(created_at)"
+            )
+            self._conn.commit()
+
+    @staticmethod
+    def make_key(model: str, system: str, temperature: float,
+                 prompt, max_tokens: int = None) -> str:
+        """根据请求参数生成缓存键（prompt 为提示词文本，多轮对话时为消息列表）"""
+        payload = json.dumps(
+            [model, system, temperature, max_tokens, prompt],
+            ensure_ascii=False
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str, ttl: Optional[float] = None) -> Optional[str]:
+        """读取缓存，超过 ttl 秒的记录视为未命中"""
+        now = time.time()
+
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                value, created_at = entry
+                if ttl is None or now - created_at <= ttl:
+                    self._memory.move_to_end(key)
+                    self.hits += 1
+                    return value
+
+            if self._conn is not None:
+                row = self._conn.execute(
+                    "SELECT value, created_at FROM responses WHERE key = ?", (key,)
+                ).fetchone()
+                if row and (ttl is None or now - row[1] <= ttl):
+                    # 回填内存层
+                    self._put_memory(key, row[0], row[1])
+                    self.hits += 1
+                    self.disk_hits += 1
+                    return row[0]
+
+            self.misses += 1
+            return None
+
+    def set(self, key: str, value: str):
+        """写入缓存"""
+        now = time.time()
+
+        with self._lock:
+            self._put_memory(key, value, now)
+
+            if self._conn is not None:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO responses (key, value, created_at) VALUES (?, ?, ?)",
+                    (key, value, now)
+                )
+                self._conn.commit()
+
+                # 定期裁剪磁盘层，删除最旧的记录
+                self._writes += 1
+                if self._writes % 1000 == 0:
+                    self._conn.execute(
+                        "DELETE FROM responses WHERE key IN ("
+                        "SELECT key FROM responses ORDER BY created_at DESC LIMIT -1 OFFSET ?)",
+                        (self.max_disk_entries,)
+                    )
+                    self._conn.commit()
+
+    def _put_memory(self, key: str, value: str, created_at: float):
+        self._memory[key] = (value, created_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            self._memory.clear()
+            if self._conn is not None:
+                self._conn.execute("DELETE FROM responses")
+                self._conn.commit()
+
+    def get_stats(self) -> Dict:
+        """获取缓存统计"""
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "memory_entries": len(self._memory),
+        }
+
+
+# 全局响应缓存实例
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_response_cache() -> ResponseCache:
+    """获取进程级响应缓存（持久化到 XIAOAI_CACHE_DIR，默认 ~/.cache/xiaoai）"""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = ResponseCache(
+                    db_path=os.path.join(_default_cache_dir(), "responses.db")
+                )
+    return _cache
+
+
+def ngram_embedding(text: str, dim: int = 256, n: int = 2) -> List[float]:
+    """
+    字符 n-gram 哈希嵌入（已归一化）
+
+    不依赖外部模型，只能识别大小写、空白、句末标点不同的近似重复：
+    只差一两个字（"今天" / "明天"）的提问相似度仍有 0.8~0.9，
+    因此 SemanticCache 使用它时阈值为 NGRAM_THRESHOLD。需要识别同义改写时传入真实嵌入函数。
+    """
+    text = "".join(text.lower().split()).rstrip("?？!！。.~～")
+    vec = [0.0] * dim
+    grams = [text[i:i + n] for i in range(max(len(text) - n + 1, 1))]
+    for gram in grams:
+        h = int(hashlib.md5(gram.encode("utf-8")).hexdigest()[:8], 16)
+        vec[h % dim] += 1.0 if (h >> 31) & 1 else -1.0
+    norm = math.sqrt(sum(x * x for x in vec))
+    return [x / norm for x in vec] if norm > 0 else vec
+
+
+# 语义缓存的默认命中阈值：真实嵌入模型 / 字符 n-gram 嵌入
+EMBEDDING_THRESHOLD = 0.85
+NGRAM_THRESHOLD = 0.97
+
+
+class SemanticCache:
+    """
+    语义响应缓存
+
+    将提示词嵌入为单位向量存入定长矩阵，查询时一次矩阵-向量乘法求出全部余弦相似度，
+    同一命名空间（模型 + 系统角色 + 温度）内相似度超过阈值即直接返回历史回答。
+    容量有界，满时淘汰最久未使用的条目。
+
+    threshold 缺省时按嵌入函数选择：传入 embedder 为 EMBEDDING_THRESHOLD；
+    使用默认的 n-gram 嵌入为 NGRAM_THRESHOLD，只复用几乎相同的提问，
+    避免 "今天北京天气怎么样" 命中 "明天北京天气怎么样" 这类误命中。
+    """
+
+    def __init__(self, capacity: int = 2048,
+                 threshold: Optional[float] = None,
+                 embedder: Callable[[str], List[float]] = None,
+                 dim: int = 256):
+        self.capacity = capacity
+        if threshold is None:
+            threshold = EMBEDDING_THRESHOLD if embedder is not None else NGRAM_THRESHOLD
+        self.threshold = threshold
+        # dim 仅作用于默认嵌入；自定义嵌入函数的维度在首次写入时确定
+        self.embedder = embedder or (lambda text: ngram_embedding(text, dim))
+
+        self._lock = threading.Lock()
+        self._size = 0
+        self._clock = 0
+        self._answers: List[Optional[str]] = [None] * capacity
+        self._prompts: List[Optional[str]] = [None] * capacity
+        self._vectors = None
+        if NUMPY_AVAILABLE:
+            _import_numpy()
+            self._namespaces = np.zeros(capacity, dtype=np.int64)
+            self._last_used = np.zeros(capacity, dtype=np.int64)
+        else:
+            self._namespaces = [0] * capacity
+            self._last_used = [0] * capacity
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.embed_errors = 0
+
+    @staticmethod
+    def namespace(model: str, system: str, temperature: float) -> int:
+        """命名空间 ID：只有相同模型、角色和温度的请求之间才会互相命中"""
+        payload = json.dumps([model, system, temperature], ensure_ascii=False)
+        return int(hashlib.sha256(payload.encode("utf-8")).hexdigest()[:15], 16)
+
+    def _embed(self, text: str):
+        vec = self.embedder(text)
+        if NUMPY_AVAILABLE:
+            vec = np.asarray(vec, dtype=np.float32)
+            norm = float(np.linalg.norm(vec))
+            return vec / norm if norm > 0 else vec
+        norm = math.sqrt(sum(x * x for x in vec))
+        return [x / norm for x in vec] if norm > 0 else list(vec)
+
+    def _best_match(self, namespace: int, vec):
+        """返回 (槽位, 相似度)，没有同命名空间条目时槽位为 -1"""
+        n = self._size
+        if n == 0:
+            return -1, 0.0
+        if NUMPY_AVAILABLE:
+            scores = self._vectors[:n] @ vec
+            scores[self._namespaces[:n] != namespace] = -np.inf
+            slot = int(np.argmax(scores))
+            score = float(scores[slot])
+            return (slot, score) if score != -np.inf else (-1, 0.0)
+
+        best, best_score = -1, 0.0
+        for slot in range(n):
+            if self._namespaces[slot] != namespace:
+                continue
+            score = sum(a * b for a, b in zip(self._vectors[slot], vec))
+            if best < 0 or score > best_score:
+                best, best_score = slot, score
+        return best, best_score
+
+    def get(self, namespace: int, text: str,
+            threshold: Optional[float] = None) -> Optional[str]:
+        """查找语义相近的历史提问，命中时返回其回答（threshold 缺省使用实例阈值）"""
+        threshold = self.threshold if threshold is None else threshold
+        try:
+            vec = self._embed(text)
+        except Exception:
+            # 嵌入服务不可用时按未命中处理，不影响正常请求
+            with self._lock:
+                self.embed_errors += 1
+                self.misses += 1
+            return None
+        with self._lock:
+            slot, score = self._best_match(namespace, vec)
+            if slot >= 0 and score >= threshold:
+                self._clock += 1
+                self._last_used[slot] = self._clock
+                self.hits += 1
+                return self._answers[slot]
+            self.misses += 1
+            return None
+
+    def set(self, namespace: int, text: str, answer: str):
+        """写入一条问答（嵌入失败时不写入）"""
+        try:
+            vec = self._embed(text)
+        except Exception:
+            with self._lock:
+                self.embed_errors += 1
+            return
+        with self._lock:
+            # 同命名空间下几乎相同的问题直接覆盖，避免重复占位
+            slot, score = self._best_match(namespace, vec)
+            if slot < 0 or score < 0.999:
+                if self._size < self.capacity:
+                    slot = self._size
+                    self._size += 1
+                else:
+                    slot = self._evict_slot()
+                    self.evictions += 1
+
+            if self._vectors is None:
+                if NUMPY_AVAILABLE:
+                    self._vectors = np.zeros((self.capacity, len(vec)), dtype=np.float32)
+                else:
+                    self._vectors = [None] * self.capacity
+
+            self._clock += 1
+            self._vectors[slot] = vec
+            self._namespaces[slot] = namespace
+            self._last_used[slot] = self._clock
+            self._prompts[slot] = text
+            self._answers[slot] = answer
+
+    def _evict_slot(self) -> int:
+        """最久未使用的槽位"""
+        if NUMPY_AVAILABLE:
+            return int(np.argmin(self._last_used[:self._size]))
+        return min(range(self._size), key=self._last_used.__getitem__)
+
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            self._size = 0
+            self._answers = [None] * self.capacity
+            self._prompts = [None] * self.capacity
+
+    def __len__(self):
+        return self._size
+
+    def get_stats(self) -> Dict:
+        """获取缓存统计"""
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "evictions": self.evictions,
+            "embed_errors": self.embed_errors,
+            "entries": self._size,
+            "capacity": self.capacity,
+            "threshold": self.threshold,
+        }
+
+
+# 全局语义缓存实例（每个嵌入一个：不同嵌入的向量之间不可比较）
+_semantic_caches: Dict[Any, SemanticCache] = {}
+
+def get_semantic_cache(embedder: Any = None) -> SemanticCache:
+    """
+    获取进程级语义缓存
+
+    embedder 为 None 时使用 n-gram 嵌入（阈值 NGRAM_THRESHOLD，只复用几乎相同的提问）；
+    为字符串时作为嵌入模型名，经进程级嵌入缓存请求嵌入接口（与 RAG 相同，见
+    embedding_cache.cached_embedder）；也可以传入 str -> 向量 的函数。后两种阈值为
+    EMBEDDING_THRESHOLD，同一问题的不同问法可以命中。
+    """
+    cache = _semantic_caches.get(embedder)
+    if cache is None:
+        with _cache_lock:
+            cache = _semantic_caches.get(embedder)
+            if cache is None:
+                fn = embedder
+                if isinstance(embedder, str):
+                    from .embedding_cache import cached_embedder
+                    fn = cached_embedder(embedder)
+                cache = _semantic_caches[embedder] = SemanticCache(embedder=fn)
+    return cache
+
+
+class _Call:
+    """一次进行中的同步调用"""
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error: Optional[BaseException] = None
+
+
+class _LeaderCancelled(Exception):
+    """合并调用的执行方被取消（仅在 SingleFlight 内部传递，等待方据此重新执行）"""
+
+
+class SingleFlight:
+    """
+    请求合并（single-flight）
+
+    同一个 key 同时只有一个调用真正执行，其间到达的相同请求等待并共享其结果
+    （包括异常）。调用结束后立即移除，不承担缓存职责。
+    同步调用按线程合并，异步调用按事件循环合并。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[str, _Call] = {}
+        # 事件循环 -> {key: Future}
+        self._async_calls: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+
+        self.calls = 0
+        self.coalesced = 0
+
+    def do(self, key: str, fn: Callable[[], Any]) -> Tuple[Any, bool]:
+        """执行 fn 或等待进行中的相同调用，返回 (结果, 是否共享了他人的调用)"""
+        with self._lock:
+            call = self._calls.get(key)
+            if call is None:
+                call = _Call()
+                self._calls[key] = call
+                self.calls += 1
+                leader = True
+            else:
+                self.coalesced += 1
+                leader = False
+
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.event.set()
+        return call.result, False
+
+    async def ado(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """
+        异步版 do，fn 返回协程
+
+        执行方被取消时不取消共享的 Future：等待方中的一个以自己的 fn 重新执行，
+        其余等待方改为等待它，不会因为别人的取消而收到 CancelledError。
+        """
+        import asyncio
+        loop = asyncio.get_running_loop()
+        while True:
+            with self._lock:
+                calls = self._async_calls.setdefault(loop, {})
+                future = calls.get(key)
+                if future is None:
+                    future = loop.create_future()
+                    calls[key] = future
+                    self.calls += 1
+                    leader = True
+                else:
+                    self.coalesced += 1
+                    leader = False
+
+            if leader:
+                break
+            try:
+                # shield：某个等待方被取消不影响其他等待方
+                return await asyncio.shield(future), True
+            except _LeaderCancelled:
+                # 执行方被取消：重新竞争执行权
+                continue
+
+        try:
+            result = await fn()
+        except asyncio.CancelledError:
+            future.set_exception(_LeaderCancelled())
+            future.exception()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            # 没有其他等待方时避免 "exception was never retrieved" 警告
+            future.exception()
+            raise
+        else:
+            future.set_result(result)
+        finally:
+            with self._lock:
+                if calls.get(key) is future:
+                    del calls[key]
+        return result, False
+
+    def get_stats(self) -> Dict:
+        """获取合并统计"""
+        total = self.calls + self.coalesced
+        return {
+            "calls": self.calls,
+            "coalesced": self.coalesced,
+            "coalesce_rate": self.coalesced / total if total else 0.0,
+            "in_flight": len(self._calls) + sum(len(c) for c in list(self._async_calls.values())),
+        }
+
+
+# 全局请求合并实例
+_single_flight = None
+
+def get_single_flight() -> SingleFlight:
+    """获取进程级请求合并器"""
+    global _single_flight
+    if _single_flight is None:
+        with _cache_lock:
+            if _single_flight is None:
+                _single_flight = SingleFlight()
+    return _single_flight
+
+
+__all__ = [
+    "ResponseCache",
+    "SemanticCache",
+    "SingleFlight",
+    "ngram_embedding",
+    "get_response_cache",
+    "get_semantic_cache",
+    "get_single_flight",
+]
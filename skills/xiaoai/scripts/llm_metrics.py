@@ -0,0 +1,326 @@
+"""
+Teamily AI Core - LLM 调用统计
+记录每次调用的 token、耗时、首 token 时间、provider 与结果，按智能体 / 模型 / 场景汇总
+"""
+
+import math
+import time
+import itertools
+import threading
+import contextvars
+from collections import deque
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Optional, Dict, List, Iterable, Tuple
+
+
+# 每百万 token 价格（美元）：(输入, 输出, 命中前缀缓存的输入)，未列出的模型按 0 计
+MODEL_PRICES: Dict[str, tuple] = {
+    "gpt-4o": (2.5, 10.0, 1.25),
+    "gpt-4o-mini": (0.15, 0.6, 0.075),
+    "claude-sonnet-4-20250514": (3.0, 15.0, 0.3),
+    "claude-3-5-haiku-20241022": (0.8, 4.0, 0.08),
+}
+
+# 智能体实例编号（同名智能体可能分属不同的管理器 / 群组，统计按实例区分）
+_agent_ids = itertools.count(1)
+
+# 当前统计场景（如 "swarm:debate"、"skill:market_research"）
+_scope: contextvars.ContextVar = contextvars.ContextVar("llm_metrics_scope", default="")
+
+
+@contextmanager
+def metrics_scope(name: str):
+    """
+    在场景内发起的 LLM 调用都会打上该场景标签
+
+    Example:
+        with metrics_scope("swarm:debate"):
+            swarm.collaborative_think(problem)
+    """
+    token = _scope.set(name)
+    try:
+        yield
+    finally:
+        _scope.reset(token)
+
+
+def current_scope() -> str:
+    return _scope.get()
+
+
+def new_agent_id() -> int:
+    """分配进程内唯一的智能体编号（不同于 id()，实例回收后不会复用）"""
+    return next(_agent_ids)
+
+
+def _is_cjk(ch: str) -> bool:
+    return "一" <= ch <= "鿿" or "぀" <= ch <= "ヿ" or "가" <= ch <= "힯"
+
+
+def estimate_tokens(text: str) -> int:
+    """估算 token 数：中日韩字符约 1 token/字，其余约 4 字符/token"""
+    if not text:
+        return 0
+    cjk = sum(1 for ch in text if _is_cjk(ch))
+    return cjk + math.ceil((len(text) - cjk) / 4)
+
+
+def set_model_price(model: str, input_price: float, output_price: float,
+                    cached_price: float = None):
+    """设置模型的每百万 token 价格（例如给 mock/ 模型套用真实模型的价格做离线估算）"""
+    cached = input_price if cached_price is None else cached_price
+    MODEL_PRICES[model.split("/")[-1]] = (input_price, output_price, cached)
+
+
+def estimate_cost(model: str, prompt_tokens: int, completion_tokens: int,
+                  cached_tokens: int = 0) -> float:
+    """
+    按 MODEL_PRICES 估算费用（美元）
+
+    prompt_tokens 包含 cached_tokens，命中前缀缓存的部分按缓存价格计。
+    Anthropic 写入缓存的溢价未计入。
+    """
+    price_in, price_out, *rest = MODEL_PRICES.get(model.split("/")[-1], (0.0, 0.0))
+    price_cached = rest[0] if rest else price_in
+    uncached = prompt_tokens - cached_tokens
+    return (uncached * price_in + cached_tokens * price_cached
+            + completion_tokens * price_out) / 1_000_000
+
+
+def usage_from_response(response) -> Tuple[Optional[int], Optional[int], int]:
+    """
+    读取 provider 返回的 token 用量 (prompt, completion, cached)，缺失时 prompt / completion 为 None
+
+    prompt 为全部输入 token（含命中前缀缓存的部分），cached 为命中缓存的输入 token。
+    兼容 OpenAI（usage.prompt_tokens_details.cached_tokens）、
+    Anthropic（usage.input_tokens 不含缓存部分，另有 cache_read / cache_creation）
+    以及 LangChain（usage_metadata["input_token_details"]["cache_read"]）。
+    """
+    usage = getattr(response, "usage", None)
+    if usage is not None:
+        completion = getattr(usage, "completion_tokens", None)
+        if completion is None:
+            completion = getattr(usage, "output_tokens", None)
+
+        prompt = getattr(usage, "prompt_tokens", None)
+        if prompt is not None:
+            details = getattr(usage, "prompt_tokens_details", None)
+            return prompt, completion, getattr(details, "cached_tokens", None) or 0
+
+        prompt = getattr(usage, "input_tokens", None)
+        cache_read = getattr(usage, "cache_read_input_tokens", None) or 0
+        cache_write = getattr(usage, "cache_creation_input_tokens", None) or 0
+        if prompt is not None:
+            prompt += cache_read + cache_write
+        return prompt, completion, cache_read
+
+    metadata = getattr(response, "usage_metadata", None)
+    if isinstance(metadata, dict):
+        details = metadata.get("input_token_details") or {}
+        return (metadata.get("input_tokens"), metadata.get("output_tokens"),
+                details.get("cache_read") or 0)
+    return None, None, 0
+
+
+@dataclass
+class CallRecord:
+    """一次 LLM 调用"""
+    agent: str
+    model: str
+    provider: str
+    outcome: str                  # ok, error, cache_hit, semantic_hit, coalesced
+    prompt_tokens: int = 0        # 仅 ok 的调用计 token，其余为 0
+    completion_tokens: int = 0
+    cached_tokens: int = 0        # 命中 provider 前缀缓存的输入 token
+    latency: float = 0.0          # 墙钟耗时（秒）
+    ttft: Optional[float] = None  # 首 token 时间（仅流式调用）
+    estimated: bool = False       # token 数是否为估算值
+    scope: str = ""
+    agent_id: int = 0             # 智能体实例编号（见 new_agent_id）
+    timestamp: float = field(default_factory=time.time)
+
+    @property
+    def cost(self) -> float:
+        return estimate_cost(self.model, self.prompt_tokens, self.completion_tokens,
+                             self.cached_tokens)
+
+
+def percentile(values: List[float], p: float) -> Optional[float]:
+    """第 p 分位（p 取 0-100，最近秩法）"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, math.ceil(p / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+class _Bucket:
+    """某一维度（智能体+模型 / 场景）的累计值与最近样本"""
+
+    def __init__(self, window: int):
+        self.calls = 0
+        self.outcomes: Dict[str, int] = {}
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.cached_tokens = 0
+        self.cost = 0.0
+        self.latencies: deque = deque(maxlen=window)
+        self.ttfts: deque = deque(maxlen=window)
+
+    def add(self, record: CallRecord):
+        self.calls += 1
+        self.outcomes[record.outcome] = self.outcomes.get(record.outcome, 0) + 1
+        self.prompt_tokens += record.prompt_tokens
+        self.completion_tokens += record.completion_tokens
+        self.cached_tokens += record.cached_tokens
+        self.cost += record.cost
+        self.latencies.append(record.latency)
+        if record.ttft is not None:
+            self.ttfts.append(record.ttft)
+
+    def merge(self, other: "_Bucket"):
+        """并入另一个维度的累计值与样本（样本数仍以 window 为上限）"""
+        self.calls += other.calls
+        for outcome, count in other.outcomes.items():
+            self.outcomes[outcome] = self.outcomes.get(outcome, 0) + count
+        self.prompt_tokens += other.prompt_tokens
+        self.completion_tokens += other.completion_tokens
+        self.cached_tokens += other.cached_tokens
+        self.cost += other.cost
+        self.latencies.extend(other.latencies)
+        self.ttfts.extend(other.ttfts)
+
+    def summary(self) -> Dict:
+        latencies = list(self.latencies)
+        ttfts = list(self.ttfts)
+        return {
+            "calls": self.calls,
+            "outcomes": dict(self.outcomes),
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "cached_tokens": self.cached_tokens,
+            "cost_usd": round(self.cost, 6),
+            "latency_p50": percentile(latencies, 50),
+            "latency_p95": percentile(latencies, 95),
+            "latency_p99": percentile(latencies, 99),
+            "ttft_p50": percentile(ttfts, 50),
+            "ttft_p95": percentile(ttfts, 95),
+        }
+
+
+class MetricsCollector:
+    """
+    LLM 调用统计
+
+    累计值（调用数、token、费用）永久累加；延迟分位数基于每个维度最近 window 次调用。
+    智能体维度按实例（CallRecord.agent_id）区分：同名智能体分属不同管理器 / 群组时互不混淆，
+    for_agent 读取单个实例，by_agent 按名称合并。智能体实例被回收后其汇总随之删除（见 forget_agent），
+    动态创建的大量智能体不会让统计无限增长。
+    """
+
+    def __init__(self, window: int = 1000, history: int = 10000):
+        self.window = window
+        self.records: deque = deque(maxlen=history)
+        self._by_agent: Dict[tuple, _Bucket] = {}   # (agent_id, 名称, 模型) -> 汇总
+        self._by_scope: Dict[str, _Bucket] = {}
+        self._retired: deque = deque()              # 待删除汇总的 agent_id
+        self._lock = threading.Lock()
+
+    def forget_agent(self, agent_id: int):
+        """
+        删除某个智能体实例的汇总（智能体被回收时由 weakref.finalize 调用）
+
+        回收可能发生在任意线程持有 _lock 时，这里只登记编号，实际删除在下次加锁访问时进行。
+        """
+        self._retired.append(agent_id)
+
+    def _prune(self):
+        """删除已回收实例的汇总（调用方持有 _lock）"""
+        if not self._retired:
+            return
+        retired = set()
+        while self._retired:
+            retired.add(self._retired.popleft())
+        self._by_agent = {key: bucket for key, bucket in self._by_agent.items() if key[0] not in retired}
+
+    def record(self, record: CallRecord):
+        with self._lock:
+            self._prune()
+            self.records.append(record)
+            key = (record.agent_id, record.agent, record.model)
+            if key not in self._by_agent:
+                self._by_agent[key] = _Bucket(self.window)
+            self._by_agent[key].add(record)
+            if record.scope:
+                if record.scope not in self._by_scope:
+                    self._by_scope[record.scope] = _Bucket(self.window)
+                self._by_scope[record.scope].add(record)
+
+    def for_agent(self, agent_id: int) -> Dict[str, Dict]:
+        """某个智能体实例按模型的汇总"""
+        with self._lock:
+            self._prune()
+            return {
+                model: bucket.summary()
+                for (owner, _, model), bucket in self._by_agent.items() if owner == agent_id
+            }
+
+    def by_agent(self, agents: Iterable[str] = None) -> Dict[str, Dict[str, Dict]]:
+        """按 智能体名称 -> 模型 汇总（同名的多个实例合并）"""
+        wanted = set(agents) if agents is not None else None
+        merged: Dict[tuple, _Bucket] = {}
+        with self._lock:
+            self._prune()
+            for (_, agent, model), bucket in self._by_agent.items():
+                if wanted is not None and agent not in wanted:
+                    continue
+                if (agent, model) not in merged:
+                    merged[agent, model] = _Bucket(self.window)
+                merged[agent, model].merge(bucket)
+        result: Dict[str, Dict[str, Dict]] = {}
+        for (agent, model), bucket in merged.items():
+            result.setdefault(agent, {})[model] = bucket.summary()
+        return result
+
+    def by_scope(self) -> Dict[str, Dict]:
+        """按场景汇总（见 metrics_scope）"""
+        with self._lock:
+            return {scope: bucket.summary() for scope, bucket in self._by_scope.items()}
+
+    def reset(self):
+        with self._lock:
+            self.records.clear()
+            self._by_agent.clear()
+            self._by_scope.clear()
+            self._retired.clear()
+
+
+# 全局统计实例
+_metrics = None
+_metrics_lock = threading.Lock()
+
+def get_metrics() -> MetricsCollector:
+    """获取进程级调用统计"""
+    global _metrics
+    if _metrics is None:
+        with _metrics_lock:
+            if _metrics is None:
+                _metrics = MetricsCollector()
+    return _metrics
+
+
+__all__ = [
+    "CallRecord",
+    "MetricsCollector",
+    "MODEL_PRICES",
+    "estimate_tokens",
+    "estimate_cost",
+    "set_model_price",
+    "usage_from_response",
+    "percentile",
+    "metrics_scope",
+    "current_scope",
+    "new_agent_id",
+    "get_metrics",
+]
@@ -0,0 +1,78 @@
+"""
+Teamily AI Core - LLM 请求路由
+多模型故障切换与对冲请求所需的延迟统计
+"""
+
+import math
+import threading
+from collections import deque
+from typing import Dict, Optional, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from concurrent.futures import ThreadPoolExecutor
+
+
+# 历史样本不足时的默认对冲延迟（秒）
+DEFAULT_HEDGE_DELAY = 5.0
+# 估计分位数所需的最少样本数
+MIN_SAMPLES = 20
+
+
+class LatencyTracker:
+    """按模型记录最近若干次成功请求的延迟，用于估计对冲截止时间"""
+
+    def __init__(self, window: int = 200):
+        self.window = window
+        self._samples: Dict[str, deque] = {}
+        self._lock = threading.Lock()
+
+    def record(self, model: str, seconds: float):
+        with self._lock:
+            samples = self._samples.get(model)
+            if samples is None:
+                samples = self._samples[model] = deque(maxlen=self.window)
+            samples.append(seconds)
+
+    def percentile(self, model: str, p: float,
+                   min_samples: int = MIN_SAMPLES) -> Optional[float]:
+        """返回第 p 分位延迟（p 取 0-1），样本不足时返回 None"""
+        with self._lock:
+            samples = sorted(self._samples.get(model, ()))
+        if len(samples) < min_samples:
+            return None
+        index = min(len(samples) - 1, max(0, math.ceil(p * len(samples)) - 1))
+        return samples[index]
+
+    def hedge_delay(self, model: str, p: float = 0.95) -> float:
+        """对冲截止时间：主模型超过该时长仍未返回即发出备用请求"""
+        delay = self.percentile(model, p)
+        return DEFAULT_HEDGE_DELAY if delay is None else delay
+
+
+# 全局实例
+_tracker = None
+_executor = None
+_lock = threading.Lock()
+
+def get_latency_tracker() -> LatencyTracker:
+    """获取进程级延迟统计"""
+    global _tracker
+    if _tracker is None:
+        with _lock:
+            if _tracker is None:
+                _tracker = LatencyTracker()
+    return _tracker
+
+
+def get_hedge_executor() -> "ThreadPoolExecutor":
+    """同步对冲请求使用的共享线程池"""
+    global _executor
+    if _executor is None:
+        with _lock:
+            if _executor is None:
+                from concurrent.futures import ThreadPoolExecutor
+                _executor = ThreadPoolExecutor(max_workers=32, thread_name_prefix="llm-hedge")
+    return _executor
+
+
+__all__ = ["LatencyTracker", "get_latency_tracker", "get_hedge_executor", "DEFAULT_HEDGE_DELAY"]
@@ -4,45 +4,674 @@ Teamily AI Core - Memory System
 """
 
 import os
+import sys
 import json
 import time
-from typing import Optional, List, Dict, Any
-from dataclasses import dataclass, field, asdict
+import heapq
+import atexit
+import weakref
+import itertools
+import threading
+from array import array
+from collections import OrderedDict
+from typing import Optional, List, Dict, Any, Iterable, Iterator, Sequence
+from dataclasses import dataclass, field, asdict, replace
 from enum import Enum
 from datetime import datetime
 
+from .llm_cache import _default_cache_dir
+from .vector_index import create_index
+from .embedding_cache import get_embedding_cache
+
 class MemoryType(Enum):
     WORKING = "working"      # 短期记忆
     LONG_TERM = "long_term"  # 长期记忆
     VECTOR = "vector"        # 向量记忆
 
-@dataclass
+# Python 3.10+ 的 dataclass 支持 __slots__
+_SLOTS = {"slots": True} if sys.version_info >= (3, 10) else {}
+
+
+def pack_embedding(values: Sequence[float]) -> array:
+    """嵌入向量转为紧凑的 float32 数组（每个分量 4 字节，而不是一个 Python float 对象）"""
+    if isinstance(values, array) and values.typecode == "f":
+        return values
+    if hasattr(values, "astype"):
+        # NumPy 数组：按字节复制
+        return array("f", values.astype("float32").tobytes())
+    return array("f", values)
+
+
+def intern_keys(metadata: Dict) -> Dict:
+    """metadata 的字符串键做驻留，大量记忆共用同一批键对象"""
+    return {sys.intern(k) if type(k) is str else k: v for k, v in metadata.items()}
+
+
+def _md5_embedding(text: str) -> List[float]:
+    """简单的词嵌入模拟（实际应使用真实嵌入模型）"""
+    # 实际使用时替换为 OpenAI text-embedding-3-small 或其他嵌入模型
+    import hashlib
+    hash_val = int(hashlib.md5(text.encode()).hexdigest(), 16)
+    # 返回模拟的嵌入向量
+    return [(hash_val >> (i * 8)) % 256 / 255.0 for i in range(64)]
+
+
+def _chunks(items: Iterable, size: int) -> Iterator[list]:
+    """按 size 条切分（可迭代对象逐批读取，不整体载入）"""
+    iterator = iter(items)
+    while True:
+        chunk = list(itertools.islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _latest_by_key(items: Iterable[Dict]) -> Dict[str, Dict]:
+    """key -> 条目，重复的 key 以最后一条为准，顺序为最后一次出现的顺序"""
+    latest: Dict[str, Dict] = {}
+    for item in items:
+        latest.pop(item["key"], None)
+        latest[item["key"]] = item
+    return latest
+
+
+@dataclass(**_SLOTS)
 class Memory:
+    """
+    一条记忆
+    
+    实例使用 __slots__，不分配 __dict__；embeddings 存为 array('f')（支持下标、len、迭代，
+    可直接传给 NumPy），metadata 的键做字符串驻留。
+    """
     key: str
     value: str
     memory_type: MemoryType
     importance: float = 0.5
     timestamp: float = field(default_factory=time.time)
     metadata: Dict = field(default_factory=dict)
-    embeddings: Optional[List[float]] = None
+    embeddings: Optional[Sequence[float]] = None
+    
+    def __post_init__(self):
+        if self.embeddings is not None:
+            self.embeddings = pack_embedding(self.embeddings)
+        if self.metadata:
+            self.metadata = intern_keys(self.metadata)
+
+class ImportanceIndex:
+    """
+    按重要性排序的索引（二叉堆 + 惰性删除）
+    
+    堆元素为 (-importance, seq, memory)，seq 单调递增，重要性相同时先写入的在前。
+    live 为 key -> 当前 Memory 的字典（由存储维护）：元素中的 Memory 已不是 live 中的对象时即失效，
+    覆盖、修改重要性（替换为新对象）、删除都无需改动堆，旧元素在遍历或压缩时跳过；
+    失效元素多于有效元素时重建堆，摊还 O(1)。
+    取前 k 个按堆的树结构做最优优先遍历，不弹出、不复制，O(k log k)（另加途经的失效元素）。
+    同一个 Memory 对象不应重复加入。
+    """
+    
+    # 失效元素少于该值时不压缩
+    COMPACT_MIN = 64
+    
+    def __init__(self, live: Dict[str, Memory], counter: Iterator[int] = None):
+        self._heap: List[tuple] = []
+        self._live = live
+        self._counter = counter or itertools.count()
+        self._stale = 0
+    
+    def __len__(self):
+        return len(self._live)
+    
+    def push(self, memory: Memory, replaced: bool = False):
+        """加入新写入的记忆（replaced 表示覆盖了同一 key 的旧记忆）"""
+        if replaced:
+            self._stale += 1
+        heapq.heappush(self._heap, (-memory.importance, next(self._counter), memory))
+        self._maybe_compact()
+    
+    def discard(self):
+        """记录一次删除"""
+        self._stale += 1
+        self._maybe_compact()
+    
+    def clear(self):
+        self._heap.clear()
+        self._stale = 0
+    
+    def _valid(self, entry: tuple) -> bool:
+        memory = entry[2]
+        return self._live.get(memory.key) is memory
+    
+    def _maybe_compact(self):
+        if self._stale > self.COMPACT_MIN and self._stale > len(self._live):
+            self._heap = [e for e in self._heap if self._valid(e)]
+            heapq.heapify(self._heap)
+            self._stale = 0
+    
+    def _prune(self):
+        # 弹出堆顶的失效元素（淘汰最早写入的记忆时，失效元素集中在堆顶）
+        heap = self._heap
+        while heap and not self._valid(heap[0]):
+            heapq.heappop(heap)
+            self._stale -= 1
+    
+    def iter_sorted(self) -> Iterator[tuple]:
+        """按重要性从高到低产出有效的堆元素（遍历期间不应修改索引）"""
+        self._prune()
+        heap = self._heap
+        if not heap:
+            return
+        frontier = [(heap[0], 0)]
+        while frontier:
+            entry, i = heapq.heappop(frontier)
+            for child in (2 * i + 1, 2 * i + 2):
+                if child < len(heap):
+                    heapq.heappush(frontier, (heap[child], child))
+            if self._valid(entry):
+                yield entry
+    
+    def top(self, k: int) -> List[Memory]:
+        return [entry[2] for entry in itertools.islice(self.iter_sorted(), k)]
+
+
+@dataclass
+class EvictionPolicy:
+    """
+    某类记忆的淘汰策略（各项均可选，未设置的不生效）
+    
+    - max_entries：条数上限；超出后按分数从低到高淘汰到 max_entries * (1 - slack)，
+      留出余量使全量打分不会每次写入都发生（摊还 O(1/slack)）
+    - ttl：写入后保留的秒数
+    - half_life：重要性衰减的半衰期（秒），分数为 importance * 0.5 ** (age / half_life)；
+      未设置时分数即重要性
+    - min_score：衰减后分数低于该值的记忆在整理时淘汰（需同时设置 half_life）
+    - check_every：每写入多少条整理一次；条数最多超出上限 check_every 条
+    """
+    max_entries: Optional[int] = None
+    ttl: Optional[float] = None
+    half_life: Optional[float] = None
+    min_score: Optional[float] = None
+    slack: float = 0.1
+    check_every: int = 64
+    
+    def score(self, importance: float, timestamp: float, now: float) -> float:
+        if not self.half_life:
+            return importance
+        return importance * 0.5 ** (max(now - timestamp, 0.0) / self.half_life)
+
+
+# 工作记忆的建议策略：最多 10000 条，保留 7 天，重要性每天减半
+WORKING_MEMORY_POLICY = EvictionPolicy(
+    max_entries=10000, ttl=7 * 86400, half_life=86400, min_score=0.01
+)
+
+
+class DictMemoryBackend:
+    """
+    内存存储后端（store_type="json"，默认）
+    
+    每种记忆类型一个按 key 索引的字典（保持写入顺序，最近写入的在最后），
+    写入（upsert）、按 key 读取、删除均为 O(1)；
+    另为每种类型维护重要性索引，按重要性取前 k 个为 O(k log k)，无需全量排序。
+    字典顺序与 timestamp 顺序一致，按 TTL 过期只需从头部扫描。
+    """
+    
+    def __init__(self):
+        self.memories: Dict[MemoryType, Dict[str, Memory]] = {
+            mtype: {} for mtype in MemoryType
+        }
+        # 各类型共用序号，跨类型合并时重要性相同的仍按写入顺序
+        counter = itertools.count()
+        self._importance: Dict[MemoryType, ImportanceIndex] = {
+            mtype: ImportanceIndex(self.memories[mtype], counter) for mtype in MemoryType
+        }
+    
+    def put(self, memory: Memory):
+        memories = self.memories[memory.memory_type]
+        old = memories.get(memory.key)
+        if old is not None and old.timestamp == memory.timestamp:
+            # 时间戳未变（如修改重要性）：保持原位置
+            memories[memory.key] = memory
+        else:
+            # 先移除再插入，使字典顺序始终与写入时间一致
+            memories.pop(memory.key, None)
+            memories[memory.key] = memory
+        self._importance[memory.memory_type].push(memory, old is not None)
+    
+    def put_many(self, memories: Sequence[Memory]):
+        for memory in memories:
+            self.put(memory)
+    
+    def get(self, memory_type: MemoryType, key: str) -> Optional[Memory]:
+        return self.memories[memory_type].get(key)
+    
+    def delete(self, memory_type: MemoryType, key: str) -> bool:
+        if self.memories[memory_type].pop(key, None) is None:
+            return False
+        self._importance[memory_type].discard()
+        return True
+    
+    def delete_many(self, memory_type: MemoryType, keys: Sequence[str]) -> int:
+        return sum(self.delete(memory_type, key) for key in keys)
+    
+    def existing(self, memory_type: MemoryType, keys: Iterable[str]) -> List[str]:
+        memories = self.memories[memory_type]
+        return [key for key in keys if key in memories]
+    
+    def expire(self, memory_type: MemoryType, cutoff: float) -> List[str]:
+        """删除 timestamp 早于 cutoff 的记忆，返回被删除的 key（只扫描过期部分）"""
+        expired = []
+        for key, memory in self.memories[memory_type].items():
+            if memory.timestamp >= cutoff:
+                break
+            expired.append(key)
+        self.delete_many(memory_type, expired)
+        return expired
+    
+    def iter_scores(self, memory_type: MemoryType) -> Iterator[tuple]:
+        """遍历 (key, importance, timestamp)，供淘汰打分"""
+        return iter([(m.key, m.importance, m.timestamp) for m in self.memories[memory_type].values()])
+    
+    def top(self, memory_type: MemoryType, k: int) -> List[tuple]:
+        """重要性最高的 k 个，元素为 (-importance, 序号, Memory)"""
+        return list(itertools.islice(self._importance[memory_type].iter_sorted(), k))
+    
+    def iter_memories(self, memory_type: MemoryType) -> Iterator[Memory]:
+        """按写入顺序遍历"""
+        return iter(list(self.memories[memory_type].values()))
+    
+    def count(self, memory_type: MemoryType) -> int:
+        return len(self.memories[memory_type])
+    
+    def clear(self, memory_type: MemoryType):
+        self.memories[memory_type].clear()
+        self._importance[memory_type].clear()
+    
+    def flush(self):
+        pass
+    
+    def close(self):
+        pass
+
+
+# 进程退出时写入尚未提交的批量写入
+_open_backends: "weakref.WeakSet" = weakref.WeakSet()
+
+
+@atexit.register
+def _close_backends():
+    for backend in list(_open_backends):
+        try:
+            backend.close()
+        except Exception:
+            pass
+
+
+class SQLiteMemoryBackend:
+    """
+    SQLite 存储后端（store_type="sqlite"）
+    
+    - WAL 模式，key、类型、重要性、时间戳列均有索引；多个记忆库可通过 namespace 共用一个文件
+    - 写入先进入缓冲区，达到 batch_size 条或距首条缓冲超过 flush_interval 秒时
+      在一个事务中批量提交（executemany）；需要查询数据库前会先提交缓冲区，进程退出时自动提交
+    - 读取按需从数据库加载，最近使用的 cache_size 条保留在内存中，不会把全部记忆读入内存
+    """
+    
+    PAGE_SIZE = 500
+    
+    _COLUMNS = "id, key, memory_type, value, importance, timestamp, metadata, embeddings"
+    
+    def __init__(self, db_path: Optional[str] = None, namespace: str = "default",
+                 cache_size: int = 1024, batch_size: int = 256,
+                 flush_interval: float = 1.0):
+        self.db_path = db_path or os.path.join(_default_cache_dir(), "memory.db")
+        self.namespace = namespace
+        self.cache_size = cache_size
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        
+        # (类型, key) -> 最近使用的 Memory
+        self._cache: "OrderedDict[tuple, Memory]" = OrderedDict()
+        # (类型, key) -> 待写入的 Memory，None 表示待删除；按写入顺序排列
+        self._pending: Dict[tuple, Optional[Memory]] = {}
+        self._pending_since = 0.0
+        self._lock = threading.RLock()
+        
+        import sqlite3
+        os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS memories ("
+            "id INTEGER PRIMARY KEY, namespace TEXT NOT NULL, memory_type TEXT NOT NULL, "
+            "key TEXT NOT NULL, value TEXT NOT NULL, importance REAL NOT NULL, "
+            "timestamp REAL NOT NULL, metadata TEXT, embeddings BLOB, "
+            "UNIQUE (namespace, memory_type, key))"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_memories_key ON memories(namespace, key)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_memories_importance "
+            "ON memories(namespace, memory_type, importance DESC, id)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_memories_timestamp "
+            "ON memories(namespace, memory_type, timestamp)"
+        )
+        self._conn.commit()
+        _open_backends.add(self)
+    
+    # ---- 行与 Memory 的转换 ----
+    
+    @staticmethod
+    def _to_row(namespace: str, memory: Memory) -> tuple:
+        embeddings = None
+        if memory.embeddings is not None:
+            embeddings = pack_embedding(memory.embeddings).tobytes()
+        return (
+            namespace, memory.memory_type.value, memory.key, memory.value,
+            memory.importance, memory.timestamp,
+            json.dumps(memory.metadata, ensure_ascii=False) if memory.metadata else None,
+            embeddings
+        )
+    
+    def _from_row(self, row: tuple) -> Memory:
+        """行 -> Memory（内存中已有该记忆时返回同一个对象）"""
+        _, key, memory_type, value, importance, timestamp, metadata, embeddings = row
+        memory_type = MemoryType(memory_type)
+        cached = self._cache.get((memory_type, key))
+        if cached is not None:
+            return cached
+        return Memory(
+            key=key,
+            value=value,
+            memory_type=memory_type,
+            importance=importance,
+            timestamp=timestamp,
+            metadata=json.loads(metadata) if metadata else {},
+            embeddings=array("f", embeddings) if embeddings is not None else None
+        )
+    
+    def _remember_cached(self, memory: Memory):
+        cache_key = (memory.memory_type, memory.key)
+        self._cache[cache_key] = memory
+        self._cache.move_to_end(cache_key)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+    
+    # ---- 写入 ----
+    
+    def put(self, memory: Memory):
+        with self._lock:
+            cache_key = (memory.memory_type, memory.key)
+            if not self._pending:
+                self._pending_since = time.monotonic()
+            # 先移除再插入，保持缓冲区按写入顺序排列
+            self._pending.pop(cache_key, None)
+            self._pending[cache_key] = memory
+            self._remember_cached(memory)
+            self._maybe_flush()
+    
+    def put_many(self, memories: Sequence[Memory]):
+        """批量写入：整批进入缓冲区（达到 batch_size 时一个事务提交），不占用读取缓存"""
+        with self._lock:
+            if not self._pending:
+                self._pending_since = time.monotonic()
+            for memory in memories:
+                cache_key = (memory.memory_type, memory.key)
+                self._pending.pop(cache_key, None)
+                self._pending[cache_key] = memory
+                self._cache.pop(cache_key, None)
+            self._maybe_flush()
+    
+    def delete(self, memory_type: MemoryType, key: str) -> bool:
+        with self._lock:
+            if self.get(memory_type, key) is None:
+                return False
+            cache_key = (memory_type, key)
+            if not self._pending:
+                self._pending_since = time.monotonic()
+            self._pending.pop(cache_key, None)
+            self._pending[cache_key] = None
+            self._cache.pop(cache_key, None)
+            self._maybe_flush()
+            return True
+    
+    def delete_many(self, memory_type: MemoryType, keys: Sequence[str]) -> int:
+        """批量删除（一个事务），返回删除的条数"""
+        with self._lock:
+            self.flush()
+            for key in keys:
+                self._cache.pop((memory_type, key), None)
+            with self._conn:
+                cursor = self._conn.executemany(
+                    "DELETE FROM memories WHERE namespace = ? AND memory_type = ? AND key = ?",
+                    [(self.namespace, memory_type.value, key) for key in keys]
+                )
+            return cursor.rowcount
+    
+    def existing(self, memory_type: MemoryType, keys: Iterable[str]) -> List[str]:
+        """keys 中已存在的 key（缓冲区和读取缓存之外的每 PAGE_SIZE 个一次查询，不触发提交）"""
+        with self._lock:
+            found, unknown = [], []
+            for key in keys:
+                cache_key = (memory_type, key)
+                if cache_key in self._pending:
+                    if self._pending[cache_key] is not None:
+                        found.append(key)
+                elif cache_key in self._cache:
+                    found.append(key)
+                else:
+                    unknown.append(key)
+            for i in range(0, len(unknown), self.PAGE_SIZE):
+                page = unknown[i:i + self.PAGE_SIZE]
+                found.extend(row[0] for row in self._conn.execute(
+                    "SELECT key FROM memories WHERE namespace = ? AND memory_type = ? "
+                    f"AND key IN ({', '.join('?' * len(page))})",
+                    (self.namespace, memory_type.value, *page)
+                ))
+            return found
+    
+    def expire(self, memory_type: MemoryType, cutoff: float) -> List[str]:
+        """删除 timestamp 早于 cutoff 的记忆，返回被删除的 key（走时间戳索引）"""
+        with self._lock:
+            self.flush()
+            keys = [row[0] for row in self._conn.execute(
+                "SELECT key FROM memories WHERE namespace = ? AND memory_type = ? AND timestamp < ?",
+                (self.namespace, memory_type.value, cutoff)
+            )]
+            if keys:
+                self.delete_many(memory_type, keys)
+            return keys
+    
+    def iter_scores(self, memory_type: MemoryType) -> Iterator[tuple]:
+        """遍历 (key, importance, timestamp)，供淘汰打分（不读取 value 和嵌入）"""
+        with self._lock:
+            self.flush()
+            return iter(self._conn.execute(
+                "SELECT key, importance, timestamp FROM memories "
+                "WHERE namespace = ? AND memory_type = ?",
+                (self.namespace, memory_type.value)
+            ).fetchall())
+    
+    def _maybe_flush(self):
+        if (len(self._pending) >= self.batch_size or
+                time.monotonic() - self._pending_since >= self.flush_interval):
+            self.flush()
+    
+    def flush(self):
+        """在一个事务中提交缓冲区中的写入"""
+        with self._lock:
+            if not self._pending:
+                return
+            deletes = [
+                (self.namespace, mtype.value, key)
+                for (mtype, key), memory in self._pending.items() if memory is None
+            ]
+            # INSERT OR REPLACE 会分配新的 id，id 顺序即写入顺序
+            upserts = [
+                self._to_row(self.namespace, memory)
+                for memory in self._pending.values() if memory is not None
+            ]
+            with self._conn:
+                if deletes:
+                    self._conn.executemany(
+                        "DELETE FROM memories WHERE namespace = ? AND memory_type = ? AND key = ?",
+                        deletes
+                    )
+                if upserts:
+                    self._conn.executemany(
+                        "INSERT OR REPLACE INTO memories (namespace, memory_type, key, value, "
+                        "importance, timestamp, metadata, embeddings) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                        upserts
+                    )
+            self._pending.clear()
+    
+    # ---- 读取 ----
+    
+    def get(self, memory_type: MemoryType, key: str) -> Optional[Memory]:
+        with self._lock:
+            cache_key = (memory_type, key)
+            if cache_key in self._pending:
+                return self._pending[cache_key]
+            memory = self._cache.get(cache_key)
+            if memory is not None:
+                self._cache.move_to_end(cache_key)
+                return memory
+            row = self._conn.execute(
+                f"SELECT {self._COLUMNS} FROM memories "
+                "WHERE namespace = ? AND memory_type = ? AND key = ?",
+                (self.namespace, memory_type.value, key)
+            ).fetchone()
+            if row is None:
+                return None
+            memory = self._from_row(row)
+            self._remember_cached(memory)
+            return memory
+    
+    def top(self, memory_type: MemoryType, k: int) -> List[tuple]:
+        """重要性最高的 k 个，元素为 (-importance, id, Memory)"""
+        with self._lock:
+            self.flush()
+            rows = self._conn.execute(
+                f"SELECT {self._COLUMNS} FROM memories WHERE namespace = ? AND memory_type = ? "
+                "ORDER BY importance DESC, id LIMIT ?",
+                (self.namespace, memory_type.value, k)
+            ).fetchall()
+            return [(-row[4], row[0], self._from_row(row)) for row in rows]
+    
+    def iter_memories(self, memory_type: MemoryType) -> Iterator[Memory]:
+        """按写入时间分页遍历（走时间戳索引，每次从数据库读取 PAGE_SIZE 条）"""
+        last = (float("-inf"), -1)
+        while True:
+            with self._lock:
+                self.flush()
+                rows = self._conn.execute(
+                    f"SELECT {self._COLUMNS} FROM memories "
+                    "WHERE namespace = ? AND memory_type = ? AND (timestamp, id) > (?, ?) "
+                    "ORDER BY timestamp, id LIMIT ?",
+                    (self.namespace, memory_type.value, *last, self.PAGE_SIZE)
+                ).fetchall()
+                page = [self._from_row(row) for row in rows]
+            yield from page
+            if len(rows) < self.PAGE_SIZE:
+                return
+            last = (rows[-1][5], rows[-1][0])
+    
+    def count(self, memory_type: MemoryType) -> int:
+        with self._lock:
+            self.flush()
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM memories WHERE namespace = ? AND memory_type = ?",
+                (self.namespace, memory_type.value)
+            ).fetchone()[0]
+    
+    def clear(self, memory_type: MemoryType):
+        with self._lock:
+            self.flush()
+            for cache_key in [k for k in self._cache if k[0] == memory_type]:
+                del self._cache[cache_key]
+            with self._conn:
+                self._conn.execute(
+                    "DELETE FROM memories WHERE namespace = ? AND memory_type = ?",
+                    (self.namespace, memory_type.value)
+                )
+    
+    def close(self):
+        with self._lock:
+            if self._conn is None:
+                return
+            self.flush()
+            self._conn.close()
+            self._conn = None
+            _open_backends.discard(self)
+    
+    def __del__(self):
+        # 未显式 close 的存储被回收时提交缓冲区
+        try:
+            self.close()
+        except Exception:
+            pass
+
+
+STORE_TYPES = {
+    "json": DictMemoryBackend,
+    "sqlite": SQLiteMemoryBackend,
+}
+
 
 class MemoryStore:
-    """记忆存储基类"""
+    """
+    记忆存储基类
+    
+    store_type 选择存储后端：
+    - "json"（默认）：进程内字典，按 key 读写 O(1)，按重要性取前 k 个 O(k log k)
+    - "sqlite"：持久化到 SQLite（WAL），批量写入，按需加载；
+      store_params 为 SQLiteMemoryBackend 的参数（db_path、namespace、cache_size、batch_size 等）
+    
+    policies 为 {MemoryType: EvictionPolicy}，对相应类型的写入做容量、TTL 和衰减淘汰；
+    淘汰在写入时按 check_every 条为一批增量进行，各原因的淘汰条数见 get_eviction_stats()。
+    
+    memory_types 限定未指定类型的操作（recall、recall_by_key、forget、clear、get_stats 等）
+    涉及的类型，默认全部类型；多个存储共用一个 SQLite 文件和 namespace、各管一种类型时
+    （如 HybridMemoryStore 的各层级），据此互不影响。
+    
+    Example:
+        store = MemoryStore("sqlite", db_path="data/memory.db", namespace="产品群")
+        store.remember_many({"key": f"log_{i}", "value": line} for i, line in enumerate(lines))
+        store.remember("goal", "Q3 上线", importance=0.9)
+        store.close()  # 进程退出时也会自动提交
+    """
     
-    def __init__(self, store_type: str = "json"):
+    # remember_many 每批写入的条数
+    WRITE_BATCH = 1024
+    
+    def __init__(self, store_type: str = "json",
+                 policies: Dict[MemoryType, EvictionPolicy] = None,
+                 memory_types: Sequence[MemoryType] = None, **store_params):
         self.store_type = store_type
-        self.memories: Dict[str, List[Memory]] = {
-            MemoryType.WORKING: [],
-            MemoryType.LONG_TERM: [],
-            MemoryType.VECTOR: []
-        }
+        self.memory_types: tuple = tuple(memory_types or MemoryType)
+        # 未知类型（如历史代码中作为名称使用的 "working"）按内存存储处理
+        backend_class = STORE_TYPES.get(store_type, DictMemoryBackend)
+        self.backend = backend_class(**store_params)
+        self.policies: Dict[MemoryType, EvictionPolicy] = dict(policies or {})
+        self._writes = {mtype: 0 for mtype in MemoryType}
+        self._next_sweep = {mtype: 0 for mtype in MemoryType}
+        self.evicted = {"ttl": 0, "capacity": 0, "decay": 0}
+        self.ingested = {"items": 0, "seconds": 0.0, "embed_calls": 0, "embed_seconds": 0.0}
+    
+    @property
+    def memories(self) -> Dict[MemoryType, Dict[str, Memory]]:
+        """各类型的全部记忆（仅内存存储可用）"""
+        return self.backend.memories
     
     def remember(self, key: str, value: str, 
                  memory_type: MemoryType = MemoryType.LONG_TERM,
                  importance: float = 0.5,
                  metadata: Dict = None,
                  embeddings: List[float] = None) -> Memory:
-        """存储记忆"""
+        """存储记忆（同类型下 key 已存在时覆盖）"""
         memory = Memory(
             key=key,
             value=value,
@@ -51,97 +680,272 @@ class MemoryStore:
             metadata=metadata or {},
             embeddings=embeddings
         )
+        self.backend.put(memory)
+        self._maybe_evict(memory_type)
+        return memory
+    
+    def remember_many(self, items: Iterable[Dict],
+                      memory_type: MemoryType = MemoryType.LONG_TERM,
+                      importance: float = 0.5,
+                      batch_size: int = None) -> List[Memory]:
+        """
+        批量存储记忆
         
-        if key not in self.memories[memory_type]:
-            self.memories[memory_type].append(memory)
-        else:
-            # 更新已存在的记忆
-            self.memories[memory_type] = [
-                m if m.key != key else memory 
-                for m in self.memories[memory_type]
-            ]
+        items 的每一项为字典，键与 remember 的参数相同（key、value，可选 importance、metadata、
+        embeddings），未给出 importance 的使用参数 importance。按 batch_size 条一批写入
+        （SQLite 存储一批在一个事务中提交），同一批中重复的 key 以最后一条为准。
+        吞吐量见 get_ingest_stats()。
+        """
+        start = time.perf_counter()
+        memories = []
+        for chunk in _chunks(items, batch_size or self.WRITE_BATCH):
+            memories.extend(self._remember_chunk(chunk, memory_type, importance))
+        self.ingested["items"] += len(memories)
+        self.ingested["seconds"] += time.perf_counter() - start
+        return memories
+    
+    def _remember_chunk(self, chunk: List[Dict], memory_type: MemoryType,
+                        importance: float) -> List[Memory]:
+        memories = [
+            Memory(
+                key=item["key"],
+                value=item["value"],
+                memory_type=memory_type,
+                importance=item.get("importance", importance),
+                metadata=item.get("metadata") or {},
+                embeddings=item.get("embeddings")
+            )
+            for item in _latest_by_key(chunk).values()
+        ]
+        self.backend.put_many(memories)
+        self._maybe_evict(memory_type, len(memories))
+        return memories
+    
+    def update_importance(self, key: str, importance: float,
+                          memory_type: MemoryType = None) -> Optional[Memory]:
+        """
+        修改记忆的重要性，返回更新后的记忆
         
+        应通过此方法修改（而不是直接给 importance 赋值），以保持重要性索引一致；
+        记忆以新对象替换，之前取得的对象不受影响。
+        """
+        memory = self.recall_by_key(key, memory_type)
+        if memory is None:
+            return None
+        memory = replace(memory, importance=importance)
+        self.backend.put(memory)
         return memory
     
     def recall(self, query: str = None, 
                memory_type: MemoryType = None,
                top_k: int = 5) -> List[Memory]:
-        """检索记忆"""
+        """检索记忆（按重要性取前 top_k 个）"""
         if memory_type:
-            memories = self.memories[memory_type]
-        else:
-            # 合并所有类型的记忆
-            memories = (
-                self.memories[MemoryType.WORKING] +
-                self.memories[MemoryType.LONG_TERM] +
-                self.memories[MemoryType.VECTOR]
-            )
-        
-        # 按重要性排序
-        memories = sorted(memories, key=lambda m: m.importance, reverse=True)
+            return [entry[2] for entry in self.backend.top(memory_type, top_k)]
         
-        return memories[:top_k]
+        # 合并各类型的有序结果
+        merged = heapq.merge(*(self.backend.top(mtype, top_k) for mtype in self.memory_types))
+        return [entry[2] for entry in itertools.islice(merged, top_k)]
     
     def recall_by_key(self, key: str, memory_type: MemoryType = None) -> Optional[Memory]:
-        """根据 key 检索"""
+        """根据 key 检索（未指定类型时依次查找 memory_types 中的 WORKING、LONG_TERM、VECTOR）"""
         if memory_type:
-            memories = self.memories[memory_type]
-        else:
-            memories = (
-                self.memories[MemoryType.WORKING] +
-                self.memories[MemoryType.LONG_TERM] +
-                self.memories[MemoryType.VECTOR]
-            )
+            return self.backend.get(memory_type, key)
         
-        for m in memories:
-            if m.key == key:
-                return m
+        for mtype in self.memory_types:
+            memory = self.backend.get(mtype, key)
+            if memory is not None:
+                return memory
         return None
     
-    def forget(self, key: str, memory_type: MemoryType = None):
-        """删除记忆"""
-        if memory_type:
-            self.memories[memory_type] = [
-                m for m in self.memories[memory_type] if m.key != key
-            ]
-        else:
-            for mtype in MemoryType:
-                self.memories[mtype] = [
-                    m for m in self.memories[mtype] if m.key != key
-                ]
+    def iter_memories(self, memory_type: MemoryType) -> Iterator[Memory]:
+        """按写入顺序遍历某类型的记忆（SQLite 存储分页加载）"""
+        return self.backend.iter_memories(memory_type)
+    
+    def forget(self, key: str, memory_type: MemoryType = None) -> bool:
+        """删除记忆，返回是否删除了记录"""
+        types = [memory_type] if memory_type else self.memory_types
+        removed = False
+        for mtype in types:
+            removed = self.backend.delete(mtype, key) or removed
+        return removed
+    
+    def forget_many(self, keys: Sequence[str], memory_type: MemoryType = None) -> int:
+        """批量删除记忆（SQLite 存储一个事务），返回删除的条数"""
+        keys = list(keys)
+        types = [memory_type] if memory_type else self.memory_types
+        return sum(self.backend.delete_many(mtype, keys) for mtype in types) if keys else 0
+    
+    def existing(self, keys: Iterable[str], memory_type: MemoryType) -> List[str]:
+        """keys 中在该类型下已存在的 key"""
+        return self.backend.existing(memory_type, keys)
     
     def clear(self, memory_type: MemoryType = None):
         """清空记忆"""
-        if memory_type:
-            self.memories[memory_type] = []
-        else:
-            for mtype in MemoryType:
-                self.memories[mtype] = []
+        types = [memory_type] if memory_type else self.memory_types
+        for mtype in types:
+            self.backend.clear(mtype)
+    
+    def flush(self):
+        """提交缓冲中的写入（仅 SQLite 存储有缓冲）"""
+        self.backend.flush()
+    
+    def close(self):
+        self.backend.close()
+    
+    def __len__(self):
+        return sum(self.backend.count(mtype) for mtype in self.memory_types)
     
     def get_stats(self) -> Dict:
-        """获取记忆统计"""
+        """获取记忆统计（memory_types 以外的类型计为 0）"""
+        counts = {
+            mtype: self.backend.count(mtype) if mtype in self.memory_types else 0
+            for mtype in MemoryType
+        }
         return {
-            "working": len(self.memories[MemoryType.WORKING]),
-            "long_term": len(self.memories[MemoryType.LONG_TERM]),
-            "vector": len(self.memories[MemoryType.VECTOR]),
-            "total": sum(len(v) for v in self.memories.values())
+            "working": counts[MemoryType.WORKING],
+            "long_term": counts[MemoryType.LONG_TERM],
+            "vector": counts[MemoryType.VECTOR],
+            "total": sum(counts.values())
         }
+    
+    def get_eviction_stats(self) -> Dict[str, int]:
+        """各原因淘汰的记忆条数"""
+        return dict(self.evicted)
+    
+    def get_ingest_stats(self) -> Dict:
+        """remember_many 的累计条数、耗时、嵌入调用次数与吞吐量（条/秒）"""
+        stats = dict(self.ingested)
+        stats["items_per_second"] = stats["items"] / stats["seconds"] if stats["seconds"] else 0.0
+        return stats
+    
+    # ---- 淘汰 ----
+    
+    def _maybe_evict(self, memory_type: MemoryType, written: int = 1):
+        policy = self.policies.get(memory_type)
+        if policy is None:
+            return
+        every = max(policy.check_every, 1)
+        before = self._writes[memory_type]
+        self._writes[memory_type] += written
+        if self._writes[memory_type] // every != before // every:
+            self.evict(memory_type)
+    
+    def evict(self, memory_type: MemoryType, now: float = None) -> int:
+        """
+        按策略整理某类记忆，返回淘汰的条数
+        
+        TTL 过期每次整理都执行（只涉及过期部分）；超出条数上限时全量打分，淘汰到低水位；
+        min_score 的全量检查距上次至少间隔 count * slack 次写入，摊还后每次写入 O(1/slack)。
+        """
+        policy = self.policies.get(memory_type)
+        if policy is None:
+            return 0
+        now = time.time() if now is None else now
+        removed = 0
+        
+        if policy.ttl is not None:
+            expired = self.backend.expire(memory_type, now - policy.ttl)
+            if expired:
+                self._on_evict(memory_type, expired)
+                self.evicted["ttl"] += len(expired)
+                removed += len(expired)
+        
+        count = self.backend.count(memory_type)
+        over = policy.max_entries is not None and count > policy.max_entries
+        sweep = (policy.min_score is not None and policy.half_life
+                 and self._writes[memory_type] >= self._next_sweep[memory_type])
+        if not (over or sweep):
+            return removed
+        
+        scored = [
+            (policy.score(importance, timestamp, now), timestamp, key)
+            for key, importance, timestamp in self.backend.iter_scores(memory_type)
+        ]
+        decayed = []
+        if policy.min_score is not None and policy.half_life:
+            decayed = [entry for entry in scored if entry[0] < policy.min_score]
+            self._next_sweep[memory_type] = (
+                self._writes[memory_type] + max(policy.check_every, int(count * policy.slack))
+            )
+        victims = []
+        remaining = count - len(decayed)
+        if policy.max_entries is not None and remaining > policy.max_entries:
+            target = int(policy.max_entries * (1 - policy.slack))
+            if decayed:
+                floor = set(entry[2] for entry in decayed)
+                scored = [entry for entry in scored if entry[2] not in floor]
+            # 分数相同时先淘汰较早写入的
+            victims = heapq.nsmallest(remaining - target, scored)
+        
+        for reason, entries in (("decay", decayed), ("capacity", victims)):
+            if not entries:
+                continue
+            keys = [entry[2] for entry in entries]
+            self.backend.delete_many(memory_type, keys)
+            self._on_evict(memory_type, keys)
+            self.evicted[reason] += len(keys)
+            removed += len(keys)
+        return removed
+    
+    def _on_evict(self, memory_type: MemoryType, keys: List[str]):
+        """淘汰记忆后的回调（子类用于同步附加索引）"""
 
 
 class VectorMemoryStore(MemoryStore):
-    """向量记忆存储（支持语义检索）"""
+    """
+    向量记忆存储（支持语义检索）
+    
+    VECTOR 类型记忆的嵌入同时写入向量索引，语义检索不再逐条计算余弦相似度。
+    index 为索引名称（"flat" 精确检索，"ivf" 近似检索，适合百万级记忆）或索引对象，
+    index_params 为创建索引的参数（如 {"nprobe": 16}）。
+    使用 SQLite 存储时，打开时从已存储的嵌入重建向量索引，记忆本身仍按需加载。
+    
+    Memory.embeddings 保留调用方的原始向量（float32 数组，与索引中归一化后的副本各一份）。
     
-    def __init__(self, embedder=None):
-        super().__init__("vector")
+    batch_embedder 为批量嵌入函数（List[str] -> List[向量]），remember_many 按 embed_batch_size 条
+    （取嵌入服务单次请求的上限）一次调用；未提供时逐条调用 embedder。
+    自定义 embedder 时给出 embedding_model（模型名称）即按 (embedding_model, 文本) 缓存在
+    进程级嵌入缓存（get_embedding_cache()）中，相同文本不再重复请求；
+    默认的哈希嵌入计算比查缓存还快，不经缓存。
+    """
+    
+    def __init__(self, embedder=None, index="flat", index_params: Dict = None,
+                 store_type: str = "json",
+                 policies: Dict[MemoryType, EvictionPolicy] = None,
+                 batch_embedder=None, embed_batch_size: int = 256,
+                 embedding_model: str = None, memory_types: Sequence[MemoryType] = None,
+                 **store_params):
+        super().__init__(store_type, policies, memory_types, **store_params)
         self.embedder = embedder or self._default_embedder
+        self.batch_embedder = batch_embedder
+        self.embed_batch_size = embed_batch_size
+        self.embedding_model = embedding_model if embedder else None
+        self.index = create_index(index, **(index_params or {}))
+        self._load_index()
+    
+    def _load_index(self, batch: int = 4096):
+        keys, vectors = [], []
+        for memory in self.iter_memories(MemoryType.VECTOR):
+            if memory.embeddings is None:
+                continue
+            keys.append(memory.key)
+            vectors.append(memory.embeddings)
+            if len(keys) >= batch:
+                self.index.add_many(keys, vectors)
+                keys, vectors = [], []
+        if keys:
+            self.index.add_many(keys, vectors)
     
     def _default_embedder(self, text: str) -> List[float]:
         """简单的词嵌入模拟（实际应使用真实嵌入模型）"""
-        # 实际使用时替换为 OpenAI text-embedding-3-small 或其他嵌入模型
-        import hashlib
-        hash_val = int(hashlib.md5(text.encode()).hexdigest(), 16)
-        # 返回模拟的嵌入向量
-        return [(hash_val >> (i * 8)) % 256 / 255.0 for i in range(64)]
+        return _md5_embedding(text)
+    
+    def embed(self, text: str) -> Sequence[float]:
+        """嵌入单条文本（设置了 embedding_model 时经嵌入缓存）"""
+        if self.embedding_model:
+            return get_embedding_cache().get_or_compute(self.embedding_model, text, self.embedder)
+        return self.embedder(text)
     
     def remember(self, key: str, value: str,
                  memory_type: MemoryType = MemoryType.VECTOR,
@@ -150,67 +954,239 @@ class VectorMemoryStore(MemoryStore):
                  embeddings: List[float] = None) -> Memory:
         """存储带向量 embadding 的记忆"""
         if embeddings is None:
-            embeddings = self.embedder(value)
+            embeddings = self.embed(value)
         
+        if memory_type == MemoryType.VECTOR:
+            # 先写入索引，写入触发的淘汰可同步从索引中移除
+            self.index.add(key, embeddings)
         return super().remember(key, value, memory_type, importance, metadata, embeddings)
     
+    def remember_many(self, items: Iterable[Dict],
+                      memory_type: MemoryType = MemoryType.VECTOR,
+                      importance: float = 0.5,
+                      batch_size: int = None) -> List[Memory]:
+        """批量存储：每批 embed_batch_size 条，缺少嵌入的合并为一次批量嵌入，向量批量写入索引"""
+        return super().remember_many(items, memory_type, importance,
+                                     batch_size or self.embed_batch_size)
+    
+    def _remember_chunk(self, chunk: List[Dict], memory_type: MemoryType,
+                        importance: float) -> List[Memory]:
+        chunk = list(_latest_by_key(chunk).values())
+        missing = [i for i, item in enumerate(chunk) if item.get("embeddings") is None]
+        if missing:
+            vectors = self.embed_many([chunk[i]["value"] for i in missing])
+            for i, vector in zip(missing, vectors):
+                chunk[i] = {**chunk[i], "embeddings": vector}
+        if memory_type == MemoryType.VECTOR:
+            self.index.add_many([item["key"] for item in chunk],
+                                [item["embeddings"] for item in chunk])
+        return super()._remember_chunk(chunk, memory_type, importance)
+    
+    def embed_many(self, texts: List[str]) -> List[Sequence[float]]:
+        """
+        批量嵌入：有 batch_embedder 时每 embed_batch_size 条调用一次，否则逐条调用 embedder；
+        设置了 embedding_model 时只请求嵌入缓存中没有的文本
+        """
+        start = time.perf_counter()
+        if self.embedding_model:
+            vectors = get_embedding_cache().get_or_compute_many(
+                self.embedding_model, texts, self._embed_uncached
+            )
+        else:
+            vectors = self._embed_uncached(texts)
+        self.ingested["embed_seconds"] += time.perf_counter() - start
+        return vectors
+    
+    def _embed_uncached(self, texts: List[str]) -> List[Sequence[float]]:
+        if self.batch_embedder is None:
+            self.ingested["embed_calls"] += len(texts)
+            return [self.embedder(text) for text in texts]
+        vectors = []
+        for chunk in _chunks(texts, self.embed_batch_size):
+            vectors.extend(self.batch_embedder(chunk))
+            self.ingested["embed_calls"] += 1
+        return vectors
+    
+    def _on_evict(self, memory_type: MemoryType, keys: List[str]):
+        if memory_type == MemoryType.VECTOR:
+            for key in keys:
+                self.index.remove(key)
+    
+    def forget(self, key: str, memory_type: MemoryType = None) -> bool:
+        if memory_type in (None, MemoryType.VECTOR):
+            self.index.remove(key)
+        return super().forget(key, memory_type)
+    
+    def forget_many(self, keys: Sequence[str], memory_type: MemoryType = None) -> int:
+        keys = list(keys)
+        if memory_type in (None, MemoryType.VECTOR):
+            for key in keys:
+                self.index.remove(key)
+        return super().forget_many(keys, memory_type)
+    
+    def clear(self, memory_type: MemoryType = None):
+        if memory_type in (None, MemoryType.VECTOR):
+            self.index.clear()
+        super().clear(memory_type)
+    
     def semantic_search(self, query: str, top_k: int = 5) -> List[Memory]:
-        """语义检索"""
-        query_embedding = self.embedder(query)
-        
-        # 计算余弦相似度
-        def cosine_similarity(a: List[float], b: List[float]) -> float:
-            dot_product = sum(x * y for x, y in zip(a, b))
-            norm_a = sum(x * x for x in a) ** 0.5
-            norm_b = sum(x * x for x in b) ** 0.5
-            return dot_product / (norm_a * norm_b) if (norm_a * norm_b) > 0 else 0
-        
-        # 排序
-        vector_memories = self.memories[MemoryType.VECTOR]
-        scored = [
-            (m, cosine_similarity(query_embedding, m.embeddings))
-            for m in vector_memories
-        ]
-        scored.sort(key=lambda x: x[1], reverse=True)
-        
-        return [m for m, _ in scored[:top_k]]
+        """语义检索：返回与 query 余弦相似度最高的 top_k 条 VECTOR 记忆"""
+        return self._memories(self.index.search(self.embed(query), top_k))
+    
+    def semantic_search_batch(self, queries: List[str], top_k: int = 5) -> List[List[Memory]]:
+        """批量语义检索：多个查询合并为一次矩阵乘法，结果与 queries 顺序一致"""
+        vectors = [self.embed(query) for query in queries]
+        return [self._memories(hits) for hits in self.index.search_batch(vectors, top_k)]
+    
+    def _memories(self, hits) -> List[Memory]:
+        memories = (self.backend.get(MemoryType.VECTOR, key) for key, _ in hits)
+        return [m for m in memories if m is not None]
 
 
 class HybridMemoryStore:
-    """混合记忆系统（整合所有类型）"""
+    """
+    混合记忆系统（整合所有类型）
     
-    def __init__(self):
-        self.working = MemoryStore("working")
-        self.long_term = MemoryStore("long_term")
-        self.vector = VectorMemoryStore()
+    store_type="sqlite" 时三个层级都持久化（store_params 如 db_path、namespace 由各层级共用），
+    进程重启后记忆仍在。各层级只管理自己的记忆类型，单独清空或统计一个层级不影响其他层级。
+    policies 为各类型的淘汰策略（如 {MemoryType.WORKING: WORKING_MEMORY_POLICY}），默认不淘汰。
+    """
+    
+    def __init__(self, vector_index="flat", index_params: Dict = None,
+                 store_type: str = "json",
+                 policies: Dict[MemoryType, EvictionPolicy] = None, **store_params):
+        self.working = MemoryStore(store_type, policies, (MemoryType.WORKING,), **store_params)
+        self.long_term = MemoryStore(store_type, policies, (MemoryType.LONG_TERM,), **store_params)
+        self.vector = VectorMemoryStore(
+            index=vector_index, index_params=index_params, store_type=store_type,
+            policies=policies, memory_types=(MemoryType.VECTOR,), **store_params
+        )
+        self.ingested = {"items": 0, "seconds": 0.0}
+    
+    def _tiers(self):
+        return (
+            (self.working, MemoryType.WORKING),
+            (self.long_term, MemoryType.LONG_TERM),
+            (self.vector, MemoryType.VECTOR),
+        )
     
     def remember(self, key: str, value: str, 
                 importance: float = 0.5,
-                metadata: Dict = None):
-        """自动选择记忆类型"""
+                metadata: Dict = None) -> Memory:
+        """
+        自动选择记忆类型
+        
+        同一 key 再次写入时覆盖旧记忆；重要性变化导致层级变化时，从不再适用的层级中移除
+        （只删除确实存在于其他层级的 key）。
+        """
+        targets = self._targets(importance)
+        memory = None
+        for store, mtype in self._tiers():
+            if mtype in targets:
+                memory = store.remember(key, value, mtype, importance, metadata)
+            elif store.existing((key,), mtype):
+                store.forget(key, mtype)
+        return memory
+    
+    @staticmethod
+    def _targets(importance: float) -> tuple:
         if importance > 0.8:
             # 高重要性：同时存储到长期和向量
-            self.long_term.remember(key, value, MemoryType.LONG_TERM, importance, metadata)
-            self.vector.remember(key, value, MemoryType.VECTOR, importance, metadata)
+            return (MemoryType.LONG_TERM, MemoryType.VECTOR)
         elif importance > 0.5:
             # 中等重要性：存储到长期记忆
-            self.long_term.remember(key, value, MemoryType.LONG_TERM, importance, metadata)
+            return (MemoryType.LONG_TERM,)
         else:
             # 低重要性：仅工作记忆
-            self.working.remember(key, value, MemoryType.WORKING, importance, metadata)
+            return (MemoryType.WORKING,)
+    
+    def remember_many(self, items: Iterable[Dict], importance: float = 0.5,
+                      batch_size: int = None) -> List[Memory]:
+        """
+        批量存储，按重要性分配层级（规则同 remember）
+        
+        items 的每一项为字典（key、value，可选 importance、metadata）；各层级批量写入，
+        向量层级的嵌入按 embed_batch_size 条合并请求；重复的 key 以最后一条为准。
+        其他层级中已存在的同一 key 被移除（先批量查询是否存在，全新导入不产生删除）。
+        返回每个 key 最终写入的记忆，吞吐量见 get_ingest_stats()。
+        """
+        start = time.perf_counter()
+        latest = _latest_by_key(items)
+        routed: Dict[MemoryType, List[Dict]] = {mtype: [] for mtype in MemoryType}
+        for item in latest.values():
+            for mtype in self._targets(item.get("importance", importance)):
+                routed[mtype].append(item)
+        
+        written: Dict[str, Memory] = {}
+        for store, mtype in self._tiers():
+            targeted = set(item["key"] for item in routed[mtype])
+            stale = store.existing((key for key in latest if key not in targeted), mtype)
+            if stale:
+                store.forget_many(stale, mtype)
+            if routed[mtype]:
+                for memory in store.remember_many(routed[mtype], mtype, importance, batch_size):
+                    written[memory.key] = memory
+        self.ingested["items"] += len(latest)
+        self.ingested["seconds"] += time.perf_counter() - start
+        return [written[key] for key in latest]
+    
+    def get_ingest_stats(self) -> Dict:
+        """remember_many 的累计条数、耗时、嵌入调用次数与吞吐量（条/秒）"""
+        vector = self.vector.get_ingest_stats()
+        stats = dict(self.ingested, embed_calls=vector["embed_calls"],
+                     embed_seconds=vector["embed_seconds"])
+        stats["items_per_second"] = stats["items"] / stats["seconds"] if stats["seconds"] else 0.0
+        return stats
+    
+    def update_importance(self, key: str, importance: float) -> Optional[Memory]:
+        """修改记忆的重要性（不改变所在层级）"""
+        memory = None
+        for store, mtype in self._tiers():
+            memory = store.update_importance(key, importance, mtype) or memory
+        return memory
+    
+    def flush(self):
+        for store, _ in self._tiers():
+            store.flush()
+    
+    def close(self):
+        for store, _ in self._tiers():
+            store.close()
+    
+    def get_eviction_stats(self) -> Dict[str, int]:
+        """各原因淘汰的记忆条数（所有层级合计）"""
+        totals = {}
+        for store, _ in self._tiers():
+            for reason, count in store.get_eviction_stats().items():
+                totals[reason] = totals.get(reason, 0) + count
+        return totals
+    
+    def recall_by_key(self, key: str) -> Optional[Memory]:
+        """根据 key 检索（O(1)）"""
+        for store, mtype in self._tiers():
+            memory = store.recall_by_key(key, mtype)
+            if memory is not None:
+                return memory
+        return None
+    
+    def forget(self, key: str) -> bool:
+        """从所有层级删除记忆"""
+        removed = False
+        for store, mtype in self._tiers():
+            removed = store.forget(key, mtype) or removed
+        return removed
     
     def recall(self, query: str = None, top_k: int = 5) -> List[Memory]:
-        """统一检索接口"""
+        """统一检索接口（无 query 时取工作、长期记忆中最重要的，按时间从新到旧返回）"""
         if query:
             # 语义检索
             return self.vector.semantic_search(query, top_k)
         else:
-            # 返回所有最近记忆
-            all_memories = (
-                self.working.recall(top_k=top_k) +
-                self.long_term.recall(top_k=top_k)
+            candidates = (
+                self.working.recall(memory_type=MemoryType.WORKING, top_k=top_k) +
+                self.long_term.recall(memory_type=MemoryType.LONG_TERM, top_k=top_k)
             )
-            return sorted(all_memories, key=lambda m: m.timestamp, reverse=True)[:top_k]
+            return heapq.nlargest(top_k, candidates, key=lambda m: m.timestamp)
     
     def get_context_for_agent(self, agent_name: str, max_tokens: int = 2000) -> str:
         """为智能体获取上下文"""
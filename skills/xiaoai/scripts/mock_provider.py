@@ -0,0 +1,457 @@
+"""
+Teamily AI Core - 本地模拟 LLM
+离线基准测试用的模拟 provider：模型名以 mock/ 开头的智能体不访问网络，
+按配置返回确定性 / 模板化回复，并模拟首 token 延迟、输出速率与错误。
+"""
+
+import re
+import time
+import random
+import asyncio
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, replace
+from types import SimpleNamespace
+from typing import Optional, Dict, List, Callable, Iterator, AsyncIterator
+
+from .llm_metrics import estimate_tokens
+
+
+MOCK_PREFIX = "mock/"
+
+# 补足回复长度时使用的填充词
+_FILLER_WORDS = (
+    "alpha", "beta", "gamma", "delta", "omega", "signal", "vector", "agent",
+    "swarm", "memory", "market", "plan", "review", "insight", "draft", "team",
+)
+
+# 每个模拟模型最多记住的缓存前缀数
+_MAX_CACHED_PREFIXES = 4096
+
+# 流式输出的分段：单个中日韩字符，或一个单词连同其后的空白
+_PIECE_RE = re.compile(r"[぀-ヿ一-鿿가-힯]|[^\s぀-ヿ一-鿿가-힯]+\s*|\s+")
+
+
+@dataclass
+class MockProfile:
+    """
+    模拟模型的行为参数
+
+    回复：responder(model, messages) 优先，否则按 template 格式化，
+    可用字段 {model} {system} {prompt}（用户消息前 prompt_chars 个字符）。
+    工具调用：请求带 tools 时由 tool_planner(model, messages, tools) 决定要调用的工具
+    （返回 [{"name": ..., "arguments": {...}}]，空列表表示直接回复）。
+    延迟：首 token 时间按 latency 分布采样，之后按 tokens_per_second 逐 token 输出。
+    前缀缓存：按消息边界查找最长的已缓存前缀（不短于 cache_min_tokens），
+    命中部分计入 usage.prompt_tokens_details.cached_tokens，且不产生预填充延迟。
+    """
+    template: str = "[{model}] {prompt}"
+    responder: Optional[Callable[[str, List[Dict]], str]] = None
+    tool_planner: Optional[Callable[[str, List[Dict], List[Dict]], List[Dict]]] = None
+    prompt_chars: int = 80
+    response_tokens: Optional[int] = None   # 用确定性填充词把回复补足到约该 token 数
+
+    latency: str = "fixed"                  # fixed / uniform / normal / lognormal
+    ttft: float = 0.0                       # 首 token 时间（秒，分布的均值 / 中位数）
+    jitter: float = 0.0                     # uniform 为半宽，normal 为标准差，lognormal 为 sigma
+    tokens_per_second: Optional[float] = None  # None 表示生成不耗时
+
+    prefix_cache: bool = False              # 模拟 provider 的前缀缓存
+    cache_min_tokens: int = 1024            # 可缓存前缀的最小长度
+    cache_ttl: float = 300.0                # 缓存前缀的存活时间（秒）
+    prefill_tokens_per_second: Optional[float] = None  # 输入处理速率，未命中缓存的输入增加首 token 时间
+
+    error_rate: float = 0.0                 # 注入 500 错误的概率
+    rate_limit_rate: float = 0.0            # 注入 429 的概率
+    retry_after: Optional[float] = 0.1      # 429 响应携带的 retry-after（秒）
+    seed: Optional[int] = 0                 # None 表示不固定随机种子
+
+
+class MockAPIError(Exception):
+    """模拟的服务端错误"""
+
+    def __init__(self, message: str, status_code: int = 500, headers: Dict = None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.response = SimpleNamespace(status_code=status_code, headers=headers or {})
+
+
+class MockRateLimitError(MockAPIError):
+    """模拟的 429 限流错误（可被 rate_limiter.is_rate_limited 识别）"""
+
+    def __init__(self, retry_after: Optional[float] = None):
+        headers = {"retry-after": str(retry_after)} if retry_after is not None else {}
+        super().__init__("Error code: 429 - mock rate limit", 429, headers)
+
+
+def _normalize(model: str) -> str:
+    return model[len(MOCK_PREFIX):] if model.startswith(MOCK_PREFIX) else model
+
+
+def _last_user_message(messages: List[Dict]) -> str:
+    for message in reversed(messages):
+        if message.get("role") == "user":
+            return str(message.get("content", ""))
+    return ""
+
+
+def _system_message(messages: List[Dict]) -> str:
+    for message in messages:
+        if message.get("role") == "system":
+            return str(message.get("content", ""))
+    return ""
+
+
+class MockLLM:
+    """一个模拟模型：生成回复、采样延迟、注入错误，并统计调用"""
+
+    def __init__(self, name: str, profile: MockProfile = None):
+        self.name = name
+        self.profile = profile or MockProfile()
+        self._rng = random.Random(self.profile.seed)
+        self._lock = threading.Lock()
+        # 前缀哈希 -> 过期时间（LRU）
+        self._prefixes: "OrderedDict[str, float]" = OrderedDict()
+        self.stats = {
+            "calls": 0, "errors": 0, "throttled": 0,
+            "prompt_tokens": 0, "completion_tokens": 0, "cached_tokens": 0,
+        }
+
+    def reply(self, messages: List[Dict]) -> str:
+        """生成回复文本（相同输入总是得到相同回复）"""
+        profile = self.profile
+        if profile.responder is not None:
+            text = profile.responder(self.name, messages)
+        else:
+            text = profile.template.format(
+                model=self.name,
+                system=_system_message(messages),
+                prompt=_last_user_message(messages)[:profile.prompt_chars]
+            )
+
+        if profile.response_tokens:
+            missing = profile.response_tokens - estimate_tokens(text)
+            if missing > 0:
+                digest = hashlib.sha256(repr(messages).encode("utf-8")).digest()
+                rng = random.Random(digest)
+                # 填充词约 2 token/个（按 estimate_tokens 计）
+                words = [rng.choice(_FILLER_WORDS) for _ in range((missing + 1) // 2)]
+                text = f"{text} {' '.join(words)}"
+        return text
+
+    @staticmethod
+    def _prefixes_of(messages: List[Dict]) -> List[tuple]:
+        """每个消息边界处的 (前缀哈希, 前缀 token 数)"""
+        hasher = hashlib.sha256()
+        tokens = 0
+        prefixes = []
+        for message in messages:
+            content = str(message.get("content", ""))
+            hasher.update(repr((message.get("role"), content)).encode("utf-8"))
+            tokens += estimate_tokens(content)
+            prefixes.append((hasher.hexdigest(), tokens))
+        return prefixes
+
+    def _match_prefix(self, messages: List[Dict], now: float) -> int:
+        """返回命中缓存的输入 token 数，并把本次请求的前缀写入缓存（调用方持有锁）"""
+        profile = self.profile
+        cached = 0
+        for digest, tokens in self._prefixes_of(messages):
+            if tokens < profile.cache_min_tokens:
+                continue
+            expires = self._prefixes.get(digest)
+            if expires is not None and expires > now:
+                cached = tokens
+            self._prefixes[digest] = now + profile.cache_ttl
+            self._prefixes.move_to_end(digest)
+        while len(self._prefixes) > _MAX_CACHED_PREFIXES:
+            self._prefixes.popitem(last=False)
+        return cached
+
+    def _sample_ttft(self) -> float:
+        profile = self.profile
+        mean, jitter = profile.ttft, profile.jitter
+        if profile.latency == "uniform":
+            value = self._rng.uniform(mean - jitter, mean + jitter)
+        elif profile.latency == "normal":
+            value = self._rng.gauss(mean, jitter)
+        elif profile.latency == "lognormal":
+            value = mean * self._rng.lognormvariate(0.0, jitter) if mean > 0 else 0.0
+        else:
+            value = mean
+        return max(value, 0.0)
+
+    def _tool_calls(self, messages: List[Dict], tools: Optional[List[Dict]]) -> List[SimpleNamespace]:
+        """按 tool_planner 生成 OpenAI 格式的工具调用"""
+        if not tools or self.profile.tool_planner is None:
+            return []
+        planned = self.profile.tool_planner(self.name, messages, tools) or []
+        digest = hashlib.sha256(repr(messages).encode("utf-8")).hexdigest()[:12]
+        return [
+            SimpleNamespace(
+                id=f"call_{digest}_{i}",
+                type="function",
+                function=SimpleNamespace(
+                    name=call["name"],
+                    arguments=json.dumps(call.get("arguments", {}), ensure_ascii=False)
+                )
+            )
+            for i, call in enumerate(planned)
+        ]
+
+    def _plan(self, messages: List[Dict], max_tokens: Optional[int] = None,
+              tools: Optional[List[Dict]] = None) -> SimpleNamespace:
+        """
+        决定本次调用的结果：首 token 时间、逐 token 间隔、回复与用量，
+        或需要在首 token 时间后抛出的错误
+        """
+        tool_calls = self._tool_calls(messages, tools)
+        text = "" if tool_calls else self.reply(messages)
+        prompt_tokens = sum(estimate_tokens(str(m.get("content") or "")) for m in messages)
+        if tool_calls:
+            completion_tokens = sum(
+                estimate_tokens(c.function.name + c.function.arguments) for c in tool_calls
+            )
+        else:
+            completion_tokens = estimate_tokens(text)
+        if max_tokens is not None and completion_tokens > max_tokens and not tool_calls:
+            # 按比例截断，模拟 max_tokens 截断
+            text = text[:max(1, len(text) * max_tokens // completion_tokens)]
+            completion_tokens = estimate_tokens(text)
+
+        with self._lock:
+            ttft = self._sample_ttft()
+            roll = self._rng.random()
+            self.stats["calls"] += 1
+            cached_tokens = 0
+            if self.profile.prefix_cache:
+                cached_tokens = self._match_prefix(messages, time.monotonic())
+            if self.profile.prefill_tokens_per_second:
+                ttft += (prompt_tokens - cached_tokens) / self.profile.prefill_tokens_per_second
+            error = None
+            if roll < self.profile.rate_limit_rate:
+                self.stats["throttled"] += 1
+                error = MockRateLimitError(self.profile.retry_after)
+            elif roll < self.profile.rate_limit_rate + self.profile.error_rate:
+                self.stats["errors"] += 1
+                error = MockAPIError(f"Error code: 500 - mock failure from {self.name}")
+            else:
+                self.stats["prompt_tokens"] += prompt_tokens
+                self.stats["completion_tokens"] += completion_tokens
+                self.stats["cached_tokens"] += cached_tokens
+
+        rate = self.profile.tokens_per_second
+        return SimpleNamespace(
+            text=text,
+            tool_calls=tool_calls,
+            ttft=ttft,
+            error=error,
+            per_token=1.0 / rate if rate else 0.0,
+            prompt_tokens=prompt_tokens,
+            completion_tokens=completion_tokens,
+            cached_tokens=cached_tokens,
+        )
+
+    def _response(self, plan: SimpleNamespace) -> SimpleNamespace:
+        """OpenAI 格式的响应对象"""
+        return SimpleNamespace(
+            model=MOCK_PREFIX + self.name,
+            choices=[SimpleNamespace(
+                index=0,
+                message=SimpleNamespace(
+                    role="assistant",
+                    content=None if plan.tool_calls else plan.text,
+                    tool_calls=plan.tool_calls or None
+                ),
+                finish_reason="tool_calls" if plan.tool_calls else "stop"
+            )],
+            usage=SimpleNamespace(
+                prompt_tokens=plan.prompt_tokens,
+                completion_tokens=plan.completion_tokens,
+                total_tokens=plan.prompt_tokens + plan.completion_tokens,
+                prompt_tokens_details=SimpleNamespace(cached_tokens=plan.cached_tokens)
+            )
+        )
+
+    @staticmethod
+    def _chunk(piece: str) -> SimpleNamespace:
+        return SimpleNamespace(choices=[SimpleNamespace(index=0, delta=SimpleNamespace(content=piece))])
+
+    def complete(self, messages: List[Dict], max_tokens: int = None,
+                 tools: List[Dict] = None) -> SimpleNamespace:
+        plan = self._plan(messages, max_tokens, tools)
+        time.sleep(plan.ttft)
+        if plan.error is not None:
+            raise plan.error
+        time.sleep(plan.per_token * plan.completion_tokens)
+        return self._response(plan)
+
+    async def acomplete(self, messages: List[Dict], max_tokens: int = None,
+                        tools: List[Dict] = None) -> SimpleNamespace:
+        plan = self._plan(messages, max_tokens, tools)
+        await asyncio.sleep(plan.ttft)
+        if plan.error is not None:
+            raise plan.error
+        await asyncio.sleep(plan.per_token * plan.completion_tokens)
+        return self._response(plan)
+
+    def _pieces(self, plan: SimpleNamespace) -> List[tuple]:
+        """流式分段及每段输出前的等待时间"""
+        return [
+            (piece, plan.per_token * estimate_tokens(piece))
+            for piece in _PIECE_RE.findall(plan.text)
+        ]
+
+    def _usage_chunk(self, plan: SimpleNamespace) -> SimpleNamespace:
+        """stream_options.include_usage 时最后一个分片：choices 为空，携带用量"""
+        return SimpleNamespace(choices=[], usage=self._response(plan).usage)
+
+    def stream(self, messages: List[Dict], max_tokens: int = None,
+               include_usage: bool = False) -> Iterator[SimpleNamespace]:
+        plan = self._plan(messages, max_tokens)
+        time.sleep(plan.ttft)
+        if plan.error is not None:
+            raise plan.error
+        for piece, delay in self._pieces(plan):
+            if delay:
+                time.sleep(delay)
+            yield self._chunk(piece)
+        if include_usage:
+            yield self._usage_chunk(plan)
+
+    async def astream(self, messages: List[Dict], max_tokens: int = None,
+                      include_usage: bool = False) -> AsyncIterator[SimpleNamespace]:
+        plan = self._plan(messages, max_tokens)
+        await asyncio.sleep(plan.ttft)
+        if plan.error is not None:
+            raise plan.error
+        for piece, delay in self._pieces(plan):
+            if delay:
+                await asyncio.sleep(delay)
+            yield self._chunk(piece)
+        if include_usage:
+            yield self._usage_chunk(plan)
+
+
+class MockRegistry:
+    """
+    模拟模型注册表
+
+    Example:
+        get_mock_registry().configure("mock/slow", ttft=0.8, latency="lognormal",
+                                      jitter=0.3, tokens_per_second=40, error_rate=0.02)
+        agent = manager.create_agent("A", "mock/slow", "测试角色")
+    """
+
+    def __init__(self):
+        self.default_profile = MockProfile()
+        self._profiles: Dict[str, MockProfile] = {}
+        self._models: Dict[str, MockLLM] = {}
+        self._lock = threading.Lock()
+
+    def configure(self, model: str, profile: MockProfile = None, **overrides) -> MockProfile:
+        """设置某个模拟模型的行为（未配置的模型使用 default_profile）"""
+        name = _normalize(model)
+        profile = replace(profile or self.default_profile, **overrides)
+        with self._lock:
+            self._profiles[name] = profile
+            self._models.pop(name, None)
+        return profile
+
+    def set_default(self, profile: MockProfile = None, **overrides):
+        """修改默认行为（对之后首次使用的模型生效）"""
+        with self._lock:
+            self.default_profile = replace(profile or self.default_profile, **overrides)
+
+    def get(self, model: str) -> MockLLM:
+        name = _normalize(model)
+        with self._lock:
+            llm = self._models.get(name)
+            if llm is None:
+                llm = MockLLM(name, self._profiles.get(name, self.default_profile))
+                self._models[name] = llm
+            return llm
+
+    def reset(self):
+        """清空配置与统计"""
+        with self._lock:
+            self.default_profile = MockProfile()
+            self._profiles.clear()
+            self._models.clear()
+
+    def get_stats(self) -> Dict[str, Dict]:
+        with self._lock:
+            return {name: dict(llm.stats) for name, llm in self._models.items()}
+
+
+def _offered_tools(tools: Optional[List[Dict]], tool_choice) -> Optional[List[Dict]]:
+    """tool_choice 为 "none" 时模型不能调用工具"""
+    return None if tool_choice == "none" else tools
+
+
+class _Completions:
+    """模拟 client.chat.completions"""
+
+    def __init__(self, registry: MockRegistry):
+        self._registry = registry
+
+    def create(self, model: str, messages: List[Dict], max_tokens: int = None,
+               stream: bool = False, stream_options: Dict = None,
+               tools: List[Dict] = None, tool_choice=None, **kwargs):
+        llm = self._registry.get(model)
+        if stream:
+            return llm.stream(messages, max_tokens, bool((stream_options or {}).get("include_usage")))
+        return llm.complete(messages, max_tokens, _offered_tools(tools, tool_choice))
+
+
+class _AsyncCompletions(_Completions):
+    async def create(self, model: str, messages: List[Dict], max_tokens: int = None,
+                     stream: bool = False, stream_options: Dict = None,
+                     tools: List[Dict] = None, tool_choice=None, **kwargs):
+        llm = self._registry.get(model)
+        if stream:
+            return llm.astream(messages, max_tokens, bool((stream_options or {}).get("include_usage")))
+        return await llm.acomplete(messages, max_tokens, _offered_tools(tools, tool_choice))
+
+
+class MockClient:
+    """OpenAI SDK 形态的同步模拟客户端"""
+
+    def __init__(self, registry: MockRegistry = None):
+        self.chat = SimpleNamespace(completions=_Completions(registry or get_mock_registry()))
+
+
+class AsyncMockClient:
+    """OpenAI SDK 形态的异步模拟客户端"""
+
+    def __init__(self, registry: MockRegistry = None):
+        self.chat = SimpleNamespace(completions=_AsyncCompletions(registry or get_mock_registry()))
+
+
+# 全局模拟模型注册表
+_mock_registry = None
+_mock_registry_lock = threading.Lock()
+
+def get_mock_registry() -> MockRegistry:
+    """获取进程级模拟模型注册表"""
+    global _mock_registry
+    if _mock_registry is None:
+        with _mock_registry_lock:
+            if _mock_registry is None:
+                _mock_registry = MockRegistry()
+    return _mock_registry
+
+
+__all__ = [
+    "MOCK_PREFIX",
+    "MockProfile",
+    "MockLLM",
+    "MockRegistry",
+    "MockClient",
+    "AsyncMockClient",
+    "MockAPIError",
+    "MockRateLimitError",
+    "get_mock_registry",
+]
@@ -0,0 +1,202 @@
+"""
+Teamily AI Core - 模型路由
+按请求的简单特征（提示词长度、回复类型、所需质量）选择模型档位：
+简单的寒暄、附和交给便宜快速的小模型，大模型留给难题；每次决策都记录下来，便于调参。
+"""
+
+import json
+import time
+import threading
+from collections import deque, Counter
+from dataclasses import dataclass, field, asdict
+from typing import Optional, Dict, List
+
+from .llm_metrics import estimate_cost
+from .llm_router import get_latency_tracker
+from .prompt_budget import count_tokens
+
+
+@dataclass
+class ModelTier:
+    """
+    一个模型档位
+
+    quality 为能力评分（0-1），请求所需质量不超过该值时才会选中；
+    max_prompt_tokens 为该档能处理的最长提示词，None 表示不限。
+    """
+    name: str
+    model: str
+    quality: float
+    max_prompt_tokens: Optional[int] = None
+
+
+# 常用档位（按从小到大排列）
+NVIDIA_TIERS = [
+    ModelTier("small", "meta/llama-3.1-8b-instruct", 0.4),
+    ModelTier("medium", "meta/llama-3.1-70b-instruct", 0.7),
+    ModelTier("large", "meta/llama-3.1-405b-instruct", 0.9),
+]
+OPENAI_TIERS = [
+    ModelTier("small", "gpt-4o-mini", 0.55),
+    ModelTier("large", "gpt-4o", 0.85),
+]
+ANTHROPIC_TIERS = [
+    ModelTier("small", "claude-3-5-haiku-20241022", 0.55),
+    ModelTier("large", "claude-sonnet-4-20250514", 0.9),
+]
+
+# 回复类型（ProactiveAgent._decide_response_type）所需的质量
+RESPONSE_QUALITY = {
+    "greeting": 0.1,
+    "agree": 0.1,
+    "default": 0.3,
+    "break_silence": 0.3,
+    "help": 0.6,
+    "question": 0.6,
+}
+DEFAULT_QUALITY = 0.5  # 未给出回复类型和质量时
+
+# 长提示词（通常是长文档、长讨论）提高所需质量
+LONG_PROMPT_TOKENS = 2000
+LONG_PROMPT_BOOST = 0.2
+
+
+@dataclass
+class RoutingDecision:
+    """一次路由决策"""
+    agent: str
+    model: str
+    tier: str
+    prompt_tokens: int
+    response_type: Optional[str]
+    required_quality: float
+    expected_cost: float
+    expected_latency: Optional[float]  # 该模型历史延迟中位数，样本不足时为 None
+    reason: str
+    timestamp: float = field(default_factory=time.time)
+
+
+class ModelRouter:
+    """
+    模型路由器
+
+    在满足所需质量且能容纳提示词的档位中，选择预计费用最低的；费用相同（如未配置价格）时
+    选择历史延迟更低的，再相同时选择排在前面（更小）的档位。没有满足条件的档位时使用最大的档位。
+
+    Example:
+        router = ModelRouter(NVIDIA_TIERS, log_path="routing.jsonl")
+        manager = AgentManager(router=router)
+        agent = manager.create_agent("小爱", "meta/llama-3.1-70b-instruct", "群聊助手")
+        agent.chat("+1", context={"response_type": "agree"})      # -> small
+        agent.chat(long_question, context={"quality": 0.9})       # -> large
+    """
+
+    def __init__(self, tiers: List[ModelTier],
+                 expected_completion_tokens: int = 300,
+                 log_path: Optional[str] = None,
+                 history: int = 1000):
+        if not tiers:
+            raise ValueError("至少需要一个模型档位")
+        self.tiers = list(tiers)
+        self.expected_completion_tokens = expected_completion_tokens
+        self.log_path = log_path
+        self.decisions: deque = deque(maxlen=history)
+        self._lock = threading.Lock()
+
+    def required_quality(self, prompt_tokens: int, response_type: Optional[str] = None,
+                         quality: Optional[float] = None) -> float:
+        """请求所需质量：显式给出的 quality 优先，否则按回复类型，长提示词再提高一档"""
+        if quality is not None:
+            return quality
+        required = RESPONSE_QUALITY.get(response_type, DEFAULT_QUALITY)
+        if prompt_tokens > LONG_PROMPT_TOKENS:
+            required += LONG_PROMPT_BOOST
+        return min(required, 1.0)
+
+    def route(self, prompt: str, response_type: Optional[str] = None,
+              quality: Optional[float] = None, agent: str = "",
+              history_tokens: int = 0) -> RoutingDecision:
+        """为一次请求选择模型并记录决策（history_tokens 为会话历史等附加的 token 数）"""
+        prompt_tokens = count_tokens(prompt) + history_tokens
+        required = self.required_quality(prompt_tokens, response_type, quality)
+
+        tracker = get_latency_tracker()
+        candidates = []
+        for index, tier in enumerate(self.tiers):
+            if tier.quality < required:
+                continue
+            if tier.max_prompt_tokens is not None and prompt_tokens > tier.max_prompt_tokens:
+                continue
+            cost = estimate_cost(tier.model, prompt_tokens, self.expected_completion_tokens)
+            latency = tracker.percentile(tier.model, 0.5)
+            candidates.append((cost, latency if latency is not None else 0.0, index, tier, latency))
+
+        if candidates:
+            cost, _, _, tier, latency = min(candidates, key=lambda c: c[:3])
+            reason = f"质量 {required:.2f} 以上的最低成本档位"
+        else:
+            tier = max(self.tiers, key=lambda t: t.quality)
+            cost = estimate_cost(tier.model, prompt_tokens, self.expected_completion_tokens)
+            latency = tracker.percentile(tier.model, 0.5)
+            reason = f"没有满足质量 {required:.2f} / 长度 {prompt_tokens} 的档位，使用最大档位"
+
+        decision = RoutingDecision(
+            agent=agent,
+            model=tier.model,
+            tier=tier.name,
+            prompt_tokens=prompt_tokens,
+            response_type=response_type,
+            required_quality=round(required, 3),
+            expected_cost=cost,
+            expected_latency=latency,
+            reason=reason
+        )
+        self._log(decision)
+        return decision
+
+    def _log(self, decision: RoutingDecision):
+        with self._lock:
+            self.decisions.append(decision)
+            if self.log_path:
+                with open(self.log_path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(asdict(decision), ensure_ascii=False) + "\n")
+
+    def get_stats(self) -> Dict:
+        """各档位的选中次数、占比与平均提示词长度，以及各回复类型的档位分布"""
+        with self._lock:
+            decisions = list(self.decisions)
+        total = len(decisions)
+        by_tier: Dict[str, Dict] = {}
+        for tier in self.tiers:
+            chosen = [d for d in decisions if d.tier == tier.name]
+            by_tier[tier.name] = {
+                "model": tier.model,
+                "count": len(chosen),
+                "share": len(chosen) / total if total else 0.0,
+                "avg_prompt_tokens": (
+                    sum(d.prompt_tokens for d in chosen) / len(chosen) if chosen else 0.0
+                ),
+            }
+        by_type: Dict[str, Counter] = {}
+        for d in decisions:
+            by_type.setdefault(d.response_type or "", Counter())[d.tier] += 1
+        return {
+            "decisions": total,
+            "by_tier": by_tier,
+            "by_response_type": {k: dict(v) for k, v in by_type.items()},
+        }
+
+    def reset(self):
+        with self._lock:
+            self.decisions.clear()
+
+
+__all__ = [
+    "ModelTier",
+    "ModelRouter",
+    "RoutingDecision",
+    "NVIDIA_TIERS",
+    "OPENAI_TIERS",
+    "ANTHROPIC_TIERS",
+    "RESPONSE_QUALITY",
+]
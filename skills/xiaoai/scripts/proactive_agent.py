@@ -5,7 +5,7 @@ Teamily AI Core - 主动介入智能体
 
 import time
 import re
-from typing import List, Dict, Optional, Callable, Any
+from typing import List, Dict, Optional, Callable, Any, Iterator
 from dataclasses import dataclass, field
 from enum import Enum
 
@@ -149,6 +149,33 @@ class ProactiveAgent:
         
         返回 Action 或 None
         """
+        decision = self._observe(message)
+        
+        if decision:
+            action = self._generate_action(message, decision)
+            self._update_response_state()
+            return action
+        
+        return None
+    
+    def on_message_stream(self, message: Message) -> Optional[Iterator[str]]:
+        """
+        处理新消息 - 流式版本
+        
+        介入决策与 on_message 相同；决定介入时返回回复内容的增量迭代器，
+        调用方可以边生成边发送，否则返回 None。
+        """
+        decision = self._observe(message)
+        
+        if decision:
+            response_type = self._decide_response_type(message, decision)
+            self._update_response_state()
+            return self._generate_response_stream(message, response_type)
+        
+        return None
+    
+    def _observe(self, message: Message) -> Optional['ResponseDecision']:
+        """记录消息并决策是否介入，介入时返回决策"""
         # 添加到上下文
         self.conversation_context.append(message)
         
@@ -168,12 +195,7 @@ class ProactiveAgent:
         # 决策是否介入
         decision = self._should_respond(message)
         
-        if decision.should_respond:
-            action = self._generate_action(message, decision)
-            self._update_response_state()
-            return action
-        
-        return None
+        return decision if decision.should_respond else None
     
     def _check_cooldown(self) -> bool:
         """检查冷却"""
@@ -348,8 +370,33 @@ class ProactiveAgent:
     
     def _generate_response(self, message: Message, response_type: str) -> str:
         """生成响应内容"""
+        template = self._pick_template(response_type)
+        if template is not None:
+            return template
         
-        # 构建上下文
+        # 使用 AI 生成（复杂场景）
+        # 语义缓存只按用户原话匹配，同一问题的不同问法可直接复用回答；
+        # 回复类型交给模型路由器，简单的附和、寒暄使用小模型
+        response = self.agent.chat(
+            self._build_prompt(message),
+            context={"semantic_key": message.content, "response_type": response_type}
+        )
+        return response
+    
+    def _generate_response_stream(self, message: Message, response_type: str) -> Iterator[str]:
+        """流式生成响应内容"""
+        template = self._pick_template(response_type)
+        if template is not None:
+            yield template
+            return
+        
+        yield from self.agent.chat_stream(
+            self._build_prompt(message),
+            context={"semantic_key": message.content, "response_type": response_type}
+        )
+    
+    def _pick_template(self, response_type: str) -> Optional[str]:
+        """简单场景使用模板响应，返回 None 表示需要 AI 生成"""
         context = self._build_context()
         
         # 决定使用模板还是 AI 生成
@@ -359,8 +406,13 @@ class ProactiveAgent:
             templates = self.response_templates[response_type]
             return random.choice(templates)
         
-        # 使用 AI 生成（复杂场景）
-        prompt = f"""你是一个群聊中的活跃成员 "{self.name}"。
+        return None
+    
+    def _build_prompt(self, message: Message) -> str:
+        """构建 AI 生成回复的提示词"""
+        context = self._build_context()
+        
+        return f"""你是一个群聊中的活跃成员 "{self.name}"。
 
 最近的聊天记录:
 {context}
@@ -375,9 +427,6 @@ class ProactiveAgent:
 - 可以适当加入表情
 
 回复:"""
-
-        response = self.agent.chat(prompt)
-        return response
     
     def _build_context(self) -> str:
         """构建上下文"""
@@ -0,0 +1,350 @@
+"""
+Teamily AI Core - 提示词预算
+发送前计算 token 数，按分段策略压缩超出预算的提示词，并报告裁剪掉的 token 数
+"""
+
+import json
+import threading
+import importlib.util
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Optional, Dict, List, Callable
+
+from .llm_metrics import estimate_tokens
+
+# tiktoken（可选）：精确计数；不可用时退化为字符估算。
+# 导入开销较大（连带 regex 等），首次计数时才导入
+TIKTOKEN_AVAILABLE = importlib.util.find_spec("tiktoken") is not None
+_tiktoken = None
+_tiktoken_lock = threading.Lock()
+
+
+# 模型上下文窗口（token），按名称前缀匹配；未列出的模型不做整体限制
+CONTEXT_WINDOWS = {
+    "gpt-4o": 128000,
+    "gpt-4.1": 1047576,
+    "claude": 200000,
+    "meta/llama-3.1": 128000,
+    "mistralai/": 32000,
+}
+
+# 压缩策略
+KEEP = "keep"                        # 不压缩
+TRUNCATE_END = "truncate_end"        # 保留开头
+TRUNCATE_MIDDLE = "truncate_middle"  # 保留开头和结尾
+DROP_OLDEST = "drop_oldest"          # 按条目丢弃最早的（需要 items）
+SUMMARIZE = "summarize"              # 调用 summarizer 压缩，没有 summarizer 时退化为 truncate_middle
+
+_MIDDLE_MARKER = "\n…（中间省略）…\n"
+_END_MARKER = "…"
+
+
+def _import_tiktoken():
+    """按需导入 tiktoken；导入失败时记为 False，不再重试"""
+    global _tiktoken
+    if _tiktoken is None:
+        with _tiktoken_lock:
+            if _tiktoken is None:
+                try:
+                    import tiktoken
+                    _tiktoken = tiktoken
+                except Exception:
+                    _tiktoken = False
+    return _tiktoken or None
+
+
+@lru_cache(maxsize=32)
+def _encoding(model: str):
+    """
+    模型对应的 tiktoken 编码；非 OpenAI 模型用 cl100k_base 近似
+
+    加载失败返回 None，结果按模型缓存，失败也不会在每次计数时重试。
+    """
+    if not TIKTOKEN_AVAILABLE:
+        return None
+    tiktoken = _import_tiktoken()
+    if tiktoken is None:
+        return None
+    try:
+        return tiktoken.encoding_for_model(model.split("/")[-1])
+    except Exception:
+        pass
+    try:
+        return tiktoken.get_encoding("cl100k_base")
+    except Exception:
+        # 编码文件需要联网下载，离线环境下退化为估算
+        return None
+
+
+def count_tokens(text: str, model: str = "") -> int:
+    """计算 token 数（有 tiktoken 时精确计数，否则估算）"""
+    if not text:
+        return 0
+    encoding = _encoding(model or "gpt-4o")
+    if encoding is None:
+        return estimate_tokens(text)
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def context_window(model: str) -> Optional[int]:
+    """模型的上下文窗口，未知模型返回 None"""
+    name = model[len("openrouter/"):] if model.startswith("openrouter/") else model
+    for prefix, window in CONTEXT_WINDOWS.items():
+        if name.startswith(prefix) or name.split("/")[-1].startswith(prefix):
+            return window
+    return None
+
+
+@dataclass
+class PromptSection:
+    """
+    提示词中的一段
+
+    text 与 items 二选一；items 按时间顺序排列，以 separator 拼接。
+    priority 越小越先被压缩；压缩后不少于 min_tokens。
+    item_tokens 为每个条目的上限（超出部分截断结尾），在整体压缩前生效。
+    """
+    name: str
+    text: str = ""
+    items: Optional[List[str]] = None
+    strategy: str = TRUNCATE_MIDDLE
+    priority: int = 0
+    min_tokens: int = 0
+    item_tokens: Optional[int] = None
+    separator: str = "\n\n"
+
+
+@dataclass
+class BudgetResult:
+    """预算结果：各段压缩后的文本、总 token 数与各段裁剪的 token 数"""
+    texts: Dict[str, str]
+    tokens: int
+    trimmed: Dict[str, int] = field(default_factory=dict)
+    over_budget: bool = False  # 所有可压缩的段都压到下限后仍超出预算
+
+    @property
+    def trimmed_tokens(self) -> int:
+        return sum(self.trimmed.values())
+
+    def __getitem__(self, name: str) -> str:
+        return self.texts[name]
+
+
+class PromptBudget:
+    """
+    提示词预算
+
+    Example:
+        budget = PromptBudget(3000, model="gpt-4o")
+        result = budget.fit([
+            PromptSection("problem", problem, strategy=KEEP),
+            PromptSection("views", items=views, strategy=DROP_OLDEST, item_tokens=300),
+        ], overhead=TEMPLATE)
+        prompt = TEMPLATE.format(problem=result["problem"], views=result["views"])
+        print(result.trimmed_tokens)
+    """
+
+    def __init__(self, max_tokens: int, model: str = "",
+                 summarizer: Callable[[str, int], str] = None):
+        self.max_tokens = max_tokens
+        self.model = model
+        self.summarizer = summarizer
+        self.stats = {"calls": 0, "trimmed_calls": 0, "trimmed_tokens": 0}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def for_model(cls, model: str, reserve: int = 0, **kwargs) -> Optional["PromptBudget"]:
+        """按模型上下文窗口（减去为输出预留的 reserve）创建预算；未知模型返回 None"""
+        window = context_window(model)
+        if window is None:
+            return None
+        return cls(max(window - reserve, 0), model=model, **kwargs)
+
+    def count(self, text: str) -> int:
+        return count_tokens(text, self.model)
+
+    # ---- 单段压缩 ----
+
+    def truncate_end(self, text: str, max_tokens: int) -> str:
+        """保留开头 max_tokens 个 token"""
+        return self._shrink(text, max_tokens, lambda keep: text[:keep] + _END_MARKER)
+
+    def truncate_middle(self, text: str, max_tokens: int) -> str:
+        """保留开头和结尾，中间替换为省略标记"""
+        def cut(keep: int) -> str:
+            head = (keep + 1) // 2
+            return text[:head] + _MIDDLE_MARKER + text[len(text) - (keep - head):]
+        return self._shrink(text, max_tokens, cut)
+
+    def _shrink(self, text: str, max_tokens: int, cut: Callable[[int], str]) -> str:
+        """按字符比例估计保留长度，再逐步收紧直到不超过 max_tokens"""
+        tokens = self.count(text)
+        if tokens <= max_tokens:
+            return text
+        if max_tokens <= 0:
+            return ""
+        keep = len(text) * max_tokens // tokens
+        while keep > 0:
+            candidate = cut(keep)
+            if self.count(candidate) <= max_tokens:
+                return candidate
+            keep = keep * 9 // 10
+        return ""
+
+    def drop_oldest(self, items: List[str], max_tokens: int, separator: str = "\n\n") -> str:
+        """从最早的条目开始丢弃，直到剩余条目不超过 max_tokens"""
+        kept: List[str] = []
+        total = 0
+        sep_tokens = self.count(separator)
+        for item in reversed(items):
+            cost = self.count(item) + (sep_tokens if kept else 0)
+            if total + cost > max_tokens:
+                break
+            kept.append(item)
+            total += cost
+        kept.reverse()
+        if not kept and items:
+            # 最新的一条也放不下：只保留它的开头
+            return self.truncate_end(items[-1], max_tokens)
+        dropped = len(items) - len(kept)
+        if dropped:
+            marker = f"（省略较早的 {dropped} 条）"
+            # 为省略标记腾出空间
+            while kept and total + self.count(marker) + sep_tokens > max_tokens:
+                total -= self.count(kept.pop(0)) + sep_tokens
+            kept.insert(0, marker)
+        return separator.join(kept)
+
+    def _compress(self, section: PromptSection, text: str, max_tokens: int) -> str:
+        if section.strategy == DROP_OLDEST and section.items is not None:
+            return self.drop_oldest(self._capped_items(section), max_tokens, section.separator)
+        if section.strategy == TRUNCATE_END:
+            return self.truncate_end(text, max_tokens)
+        if section.strategy == SUMMARIZE and self.summarizer is not None:
+            summary = self.summarizer(text, max_tokens)
+            return self.truncate_middle(summary, max_tokens)
+        return self.truncate_middle(text, max_tokens)
+
+    def _capped_items(self, section: PromptSection) -> List[str]:
+        if section.item_tokens is None:
+            return list(section.items)
+        return [self.truncate_end(item, section.item_tokens) for item in section.items]
+
+    # ---- 整体预算 ----
+
+    def fit(self, sections: List[PromptSection], overhead: str = "") -> BudgetResult:
+        """
+        把各段压缩到预算之内
+
+        overhead 为模板中固定文本（计入预算但不压缩）。
+        """
+        texts: Dict[str, str] = {}
+        counts: Dict[str, int] = {}
+        trimmed: Dict[str, int] = {}
+        for section in sections:
+            if section.items is not None:
+                original = section.separator.join(section.items)
+                text = section.separator.join(self._capped_items(section))
+            else:
+                original = text = section.text
+            texts[section.name] = text
+            counts[section.name] = self.count(text)
+            cut = self.count(original) - counts[section.name] if text != original else 0
+            if cut > 0:
+                trimmed[section.name] = cut
+
+        budget = self.max_tokens - self.count(overhead)
+        total = sum(counts.values())
+        compressible = sorted(
+            (s for s in sections if s.strategy != KEEP),
+            key=lambda s: s.priority
+        )
+        for section in compressible:
+            over = total - budget
+            if over <= 0:
+                break
+            name = section.name
+            target = max(section.min_tokens, counts[name] - over)
+            if target >= counts[name]:
+                continue
+            compressed = self._compress(section, texts[name], target)
+            new_count = self.count(compressed)
+            trimmed[name] = trimmed.get(name, 0) + counts[name] - new_count
+            total -= counts[name] - new_count
+            texts[name], counts[name] = compressed, new_count
+
+        result = BudgetResult(
+            texts=texts,
+            tokens=total + self.count(overhead),
+            trimmed=trimmed,
+            over_budget=total > budget
+        )
+        self._account(result.trimmed_tokens)
+        return result
+
+    def fit_turns(self, system: str, turns: List[Dict]) -> tuple:
+        """
+        把多轮消息压缩到预算之内：先丢弃最早的历史轮次，仍超出时截断最后一条消息的中间部分
+
+        返回 (压缩后的消息, 裁剪的 token 数)。system 轮次（如会话摘要）不压缩。
+        带 tool_calls 的 assistant 轮次与其后的 tool 结果作为一组整体保留或丢弃
+        （provider 拒绝缺少对应调用的工具结果），保留的历史总是以 user 轮次开头。
+        """
+        def cost(t: Dict) -> int:
+            tokens = self.count(t.get("content") or "")
+            if t.get("tool_calls"):
+                tokens += self.count(json.dumps(t["tool_calls"], ensure_ascii=False))
+            return tokens
+
+        total = self.count(system) + sum(cost(t) for t in turns)
+        if total <= self.max_tokens:
+            self._account(0)
+            return turns, 0
+
+        original = total
+        fixed = [t for t in turns if t["role"] == "system"]
+        groups: List[List[Dict]] = []
+        for t in turns:
+            if t["role"] == "system":
+                continue
+            if t["role"] == "tool" and groups and groups[-1][0].get("tool_calls"):
+                groups[-1].append(t)
+            else:
+                groups.append([t])
+        # 保留最后一组（本次请求），历史从最早的开始整组丢弃，并保持以 user 开头
+        while len(groups) > 1 and (total > self.max_tokens or groups[0][0]["role"] != "user"):
+            total -= sum(cost(t) for t in groups.pop(0))
+        chat = [t for group in groups for t in group]
+
+        if total > self.max_tokens and chat:
+            last = chat[-1]
+            room = self.max_tokens - (total - cost(last))
+            chat[-1] = {**last, "content": self.truncate_middle(last.get("content") or "", max(room, 0))}
+            total = total - cost(last) + cost(chat[-1])
+
+        trimmed = original - total
+        self._account(trimmed)
+        return fixed + chat, trimmed
+
+    def _account(self, trimmed: int):
+        with self._lock:
+            self.stats["calls"] += 1
+            if trimmed > 0:
+                self.stats["trimmed_calls"] += 1
+                self.stats["trimmed_tokens"] += trimmed
+
+
+__all__ = [
+    "PromptBudget",
+    "PromptSection",
+    "BudgetResult",
+    "count_tokens",
+    "context_window",
+    "CONTEXT_WINDOWS",
+    "KEEP",
+    "TRUNCATE_END",
+    "TRUNCATE_MIDDLE",
+    "DROP_OLDEST",
+    "SUMMARIZE",
+    "TIKTOKEN_AVAILABLE",
+]
@@ -3,13 +3,18 @@ Teamily AI Core - RAG Engine
 RAG 知识检索增强生成引擎
 """
 
-import os
 import json
+import logging
 from typing import List, Dict, Optional, Any
 from dataclasses import dataclass
 from enum import Enum
 import hashlib
 
+from .vector_index import create_index
+from .embedding_cache import get_embedding_cache, openai_embedding
+
+logger = logging.getLogger(__name__)
+
 class EmbeddingModel(Enum):
     OPENAI_ADA = "text-embedding-3-small"
     CLAUDE = "claude-embedding"  # 需要额外配置
@@ -21,39 +26,62 @@ class Document:
     metadata: Dict
     embedding: Optional[List[float]] = None
 
+def _sha256_embedding(text: str) -> List[float]:
+    hash_val = int(hashlib.sha256(text.encode()).hexdigest(), 16)
+    return [(hash_val >> (i * 8)) % 256 / 255.0 for i in range(64)]
+
 class RAGEngine:
-    """RAG 知识检索引擎"""
+    """
+    RAG 知识检索引擎
+    
+    分块的嵌入写入向量索引：index 为 "flat"（精确检索）、"ivf"（近似检索，适合大型知识库）
+    或索引对象，index_params 为创建索引的参数。
+    
+    索引维度以第一个写入的分块为准。嵌入服务失败时退化为 64 维哈希嵌入，
+    与已有索引维度不一致的分块不写入索引（记录警告，计入 skipped_chunks），查询返回空结果，
+    避免一次降级让整个文档导入或检索抛出异常。
+    """
     
     def __init__(self, 
                  embedding_model: str = "text-embedding-3-small",
                  chunk_size: int = 500,
-                 chunk_overlap: int = 50):
+                 chunk_overlap: int = 50,
+                 index: Any = "flat",
+                 index_params: Dict = None):
         self.embedding_model = embedding_model
         self.chunk_size = chunk_size
         self.chunk_overlap = chunk_overlap
         
         self.documents: Dict[str, Document] = {}
-        self.chunks: List[Document] = []
+        self.chunks: Dict[str, Document] = {}
+        self.index = create_index(index, **(index_params or {}))
+        self.skipped_chunks = 0
     
     def _get_embedding(self, text: str) -> List[float]:
-        """获取文本嵌入向量"""
+        """获取文本嵌入向量（按模型与文本内容缓存，重复的分块和查询不再请求）"""
+        cache = get_embedding_cache()
+        embedding = cache.get(self.embedding_model, text)
+        if embedding is not None:
+            return embedding
         try:
-            import openai
-            openai.api_key = os.getenv("OPENAI_API_KEY")
-            
-            response = openai.embeddings.create(
-                model=self.embedding_model,
-                input=text
-            )
-            return response.data[0].embedding
+            embedding = openai_embedding(self.embedding_model, text)
         except Exception as e:
-            # 降级：返回简单 hash
+            # 降级：返回简单 hash（不写入该模型的缓存）
             return self._simple_embedding(text)
+        return cache.set(self.embedding_model, text, embedding)
     
     def _simple_embedding(self, text: str) -> List[float]:
-        """简单的文本嵌入（降级方案）"""
-        hash_val = int(hashlib.sha256(text.encode()).hexdigest(), 16)
-        return [(hash_val >> (i * 8)) % 256 / 255.0 for i in range(64)]
+        """简单的文本嵌入（降级方案；计算开销可以忽略，不经嵌入缓存）"""
+        return _sha256_embedding(text)
+    
+    def _matches_index(self, embedding, what: str) -> bool:
+        """嵌入维度与索引一致（索引为空时尚未确定维度）；不一致时记录警告"""
+        dim = getattr(self.index, "dim", None)
+        if dim is None or len(embedding) == dim:
+            return True
+        logger.warning("%s：嵌入维度 %d 与索引维度 %d 不一致（嵌入服务降级？），已跳过",
+                       what, len(embedding), dim)
+        return False
     
     def _chunk_text(self, text: str) -> List[str]:
         """将文本分块"""
@@ -84,10 +112,11 @@ class RAGEngine:
         if doc_id in self.documents:
             return doc_id
         
+        metadata = metadata or {}
         document = Document(
             id=doc_id,
             content=content,
-            metadata=metadata or {}
+            metadata=metadata
         )
         self.documents[doc_id] = document
         
@@ -101,7 +130,11 @@ class RAGEngine:
                 metadata={**metadata, "parent_doc": doc_id, "chunk_index": i},
                 embedding=self._get_embedding(chunk)
             )
-            self.chunks.append(chunk_doc)
+            self.chunks[chunk_id] = chunk_doc
+            if self._matches_index(chunk_doc.embedding, f"分块 {chunk_id}"):
+                self.index.add(chunk_id, chunk_doc.embedding)
+            else:
+                self.skipped_chunks += 1
         
         return doc_id
     
@@ -112,30 +145,29 @@ class RAGEngine:
     
     def search(self, query: str, top_k: int = 5) -> List[Dict]:
         """语义检索"""
-        query_embedding = self._get_embedding(query)
-        
-        # 计算相似度
-        def cosine_similarity(a: List[float], b: List[float]) -> float:
-            dot_product = sum(x * y for x, y in zip(a, b))
-            norm_a = sum(x * x for x in a) ** 0.5
-            norm_b = sum(x * x for x in b) ** 0.5
-            return dot_product / (norm_a * norm_b) if (norm_a * norm_b) > 0 else 0
-        
-        # 排序
-        scored = [
-            (chunk, cosine_similarity(query_embedding, chunk.embedding))
-            for chunk in self.chunks
-        ]
-        scored.sort(key=lambda x: x[1], reverse=True)
-        
-        # 返回 top_k
+        embedding = self._get_embedding(query)
+        if not self._matches_index(embedding, "查询"):
+            return []
+        return self._results(self.index.search(embedding, top_k))
+    
+    def search_batch(self, queries: List[str], top_k: int = 5) -> List[List[Dict]]:
+        """批量语义检索，结果与 queries 顺序一致"""
+        embeddings = [self._get_embedding(query) for query in queries]
+        valid = [i for i, e in enumerate(embeddings) if self._matches_index(e, "查询")]
+        results: List[List[Dict]] = [[] for _ in queries]
+        hits = self.index.search_batch([embeddings[i] for i in valid], top_k) if valid else []
+        for i, found in zip(valid, hits):
+            results[i] = self._results(found)
+        return results
+    
+    def _results(self, hits) -> List[Dict]:
         return [
             {
-                "content": chunk.content,
+                "content": self.chunks[chunk_id].content,
                 "score": score,
-                "metadata": chunk.metadata
+                "metadata": self.chunks[chunk_id].metadata
             }
-            for chunk, score in scored[:top_k]
+            for chunk_id, score in hits
         ]
     
     def get_context(self, query: str, max_tokens: int = 2000) -> str:
@@ -170,17 +202,18 @@ class RAGEngine:
         if doc_id in self.documents:
             del self.documents[doc_id]
         
-        # 删除关联的 chunks
-        self.chunks = [
-            c for c in self.chunks 
-            if c.metadata.get("parent_doc") != doc_id
-        ]
+        # 删除关联的 chunks（分块 ID 为 <doc_id>_<序号>）
+        i = 0
+        while self.chunks.pop(f"{doc_id}_{i}", None) is not None:
+            self.index.remove(f"{doc_id}_{i}")
+            i += 1
     
     def get_stats(self) -> Dict:
         """获取统计信息"""
         return {
             "total_documents": len(self.documents),
             "total_chunks": len(self.chunks),
+            "skipped_chunks": self.skipped_chunks,
             "chunk_size": self.chunk_size
         }
 
@@ -0,0 +1,397 @@
+"""
+Teamily AI Core - 自适应限流
+按 provider / 模型限制 LLM 请求的速率与并发，遇到 429 自动退避并排队重试
+"""
+
+import re
+import time
+import threading
+from collections import deque
+from datetime import datetime, timezone
+from typing import Optional, Dict, Mapping
+
+
+# provider 级默认限额；模型级只做 AIMD 并发控制
+DEFAULT_PROVIDER_LIMITS = {
+    "rate": 10.0,            # 令牌桶速率（请求/秒）
+    "burst": 20,             # 令牌桶容量
+    "initial_concurrency": 8,
+    "max_concurrency": 64,
+}
+DEFAULT_MODEL_LIMITS = {
+    "rate": None,
+    "burst": None,
+    "initial_concurrency": 8,
+    "max_concurrency": 32,
+}
+
+# 特定 provider 的默认限额（同时作用于 provider 级和模型级）
+# 本地模拟模型不做客户端限速，基准测试测到的是编排层本身的吞吐
+PROVIDER_LIMITS = {
+    "mock": {
+        "rate": None,
+        "burst": None,
+        "initial_concurrency": 1024,
+        "max_concurrency": 4096,
+    },
+}
+
+# 没有 retry-after 提示时的默认退避时间（秒）
+DEFAULT_RETRY_AFTER = 1.0
+
+
+class TokenBucket:
+    """令牌桶（调用方负责加锁）"""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.capacity = float(burst)
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+
+    def try_take(self, now: float) -> float:
+        """尝试取出一个令牌，成功返回 0，否则返回需要等待的秒数"""
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+class AdaptiveLimiter:
+    """
+    令牌桶 + AIMD 并发控制
+
+    - 速率：令牌桶限制每秒请求数
+    - 并发：成功时加性增长（每完成一窗口并发 +1），被限流时乘性减小
+    - 暂停：收到 retry-after 或剩余额度为 0 时，在重置前暂停放行
+    超出限额的请求排队等待，而不是直接失败。同步（线程）与异步（事件循环）调用方可混用。
+    """
+
+    def __init__(self, name: str,
+                 rate: float = None,
+                 burst: int = None,
+                 initial_concurrency: int = 8,
+                 min_concurrency: int = 1,
+                 max_concurrency: int = 64,
+                 backoff: float = 0.5):
+        self.name = name
+        self.bucket = TokenBucket(rate, burst or max(1, int(rate))) if rate else None
+        self.limit = float(initial_concurrency)
+        self.min_limit = float(min_concurrency)
+        self.max_limit = float(max_concurrency)
+        self.backoff = backoff
+
+        self.in_flight = 0
+        self.paused_until = 0.0
+
+        self._lock = threading.Lock()
+        self._cond = threading.Condition(self._lock)
+        self._async_waiters: deque = deque()
+
+        self.stats = {"acquired": 0, "queued": 0, "throttled": 0, "wait_time": 0.0}
+
+    def _try_acquire(self, now: float) -> Optional[float]:
+        """成功返回 0；需要等待固定时长时返回秒数；需要等待并发名额释放时返回 None"""
+        if now < self.paused_until:
+            return self.paused_until - now
+        if self.in_flight >= max(int(self.limit), 1):
+            return None
+        if self.bucket is not None:
+            wait = self.bucket.try_take(now)
+            if wait > 0:
+                return wait
+        self.in_flight += 1
+        self.stats["acquired"] += 1
+        return 0.0
+
+    def acquire(self):
+        """获取一个请求名额（阻塞）"""
+        start = time.monotonic()
+        with self._cond:
+            queued = False
+            while True:
+                wait = self._try_acquire(time.monotonic())
+                if wait == 0:
+                    break
+                if not queued:
+                    self.stats["queued"] += 1
+                    queued = True
+                self._cond.wait(timeout=wait)
+            self.stats["wait_time"] += time.monotonic() - start
+
+    async def aacquire(self):
+        """获取一个请求名额（异步）"""
+        import asyncio
+        loop = asyncio.get_running_loop()
+        start = time.monotonic()
+        queued = False
+        while True:
+            with self._lock:
+                wait = self._try_acquire(time.monotonic())
+                if wait == 0:
+                    self.stats["wait_time"] += time.monotonic() - start
+                    return
+                if not queued:
+                    self.stats["queued"] += 1
+                    queued = True
+                future = None
+                if wait is None:
+                    future = loop.create_future()
+                    self._async_waiters.append((loop, future))
+
+            if future is None:
+                await asyncio.sleep(wait)
+            else:
+                await future
+
+    def release(self, throttled: bool = False, success: bool = True,
+                retry_after: Optional[float] = None):
+        """
+        归还名额并反馈结果
+
+        throttled: 本次请求被限流（429）
+        success: 请求成功（失败但非限流时不调整并发）
+        retry_after: 服务端建议的等待秒数
+        """
+        with self._cond:
+            self.in_flight = max(self.in_flight - 1, 0)
+
+            if throttled:
+                self.stats["throttled"] += 1
+                self.limit = max(self.min_limit, self.limit * self.backoff)
+                self._pause(retry_after if retry_after is not None else DEFAULT_RETRY_AFTER)
+            elif success:
+                self.limit = min(self.max_limit, self.limit + 1.0 / max(self.limit, 1.0))
+
+            self._wake()
+
+    def update_from_headers(self, headers: Optional[Mapping]):
+        """根据响应头中的限流信息调整（剩余额度耗尽时暂停到重置时间）"""
+        if not headers:
+            return
+        info = parse_rate_limit_headers(headers)
+        with self._cond:
+            if info.get("retry_after"):
+                self._pause(info["retry_after"])
+            elif info.get("remaining") == 0 and info.get("reset"):
+                self._pause(info["reset"])
+            self._wake()
+
+    def _pause(self, seconds: float):
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+    def _wake(self):
+        """唤醒所有等待方重新尝试（调用方持有锁）"""
+        self._cond.notify_all()
+        while self._async_waiters:
+            loop, future = self._async_waiters.popleft()
+            if not future.done():
+                try:
+                    loop.call_soon_threadsafe(_resolve, future)
+                except RuntimeError:
+                    pass  # 事件循环已关闭
+
+    def get_stats(self) -> Dict:
+        return {
+            "name": self.name,
+            "concurrency_limit": round(self.limit, 2),
+            "in_flight": self.in_flight,
+            "paused_for": max(self.paused_until - time.monotonic(), 0.0),
+            **self.stats,
+        }
+
+
+def _resolve(future: "asyncio.Future"):
+    if not future.done():
+        future.set_result(None)
+
+
+class CompositeLimiter:
+    """
+    多级限流：依次获取模型级、provider 级名额
+
+    获取顺序固定，不会互相死锁；反馈同时作用于各级。
+    """
+
+    def __init__(self, *limiters: AdaptiveLimiter):
+        self.limiters = limiters
+
+    def acquire(self):
+        for limiter in self.limiters:
+            limiter.acquire()
+
+    async def aacquire(self):
+        acquired = []
+        try:
+            for limiter in self.limiters:
+                await limiter.aacquire()
+                acquired.append(limiter)
+        except BaseException:
+            # 等待中被取消：归还已拿到的名额
+            for limiter in acquired:
+                limiter.release(success=False)
+            raise
+
+    def release(self, throttled: bool = False, success: bool = True,
+                retry_after: Optional[float] = None):
+        for limiter in self.limiters:
+            limiter.release(throttled, success, retry_after)
+
+    def update_from_headers(self, headers: Optional[Mapping]):
+        for limiter in self.limiters:
+            limiter.update_from_headers(headers)
+
+
+_DURATION_RE = re.compile(r"(\d+(?:\.\d+)?)(ms|s|m|h)")
+
+
+def _parse_seconds(value: str) -> Optional[float]:
+    """解析 '1.5' / '6m0s' / '250ms' / HTTP 日期 / RFC3339 时间为距现在的秒数"""
+    value = str(value).strip()
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+
+    parts = _DURATION_RE.findall(value)
+    if parts and "".join(n + u for n, u in parts) == value:
+        scale = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}
+        return sum(float(n) * scale[u] for n, u in parts)
+
+    # HTTP 日期格式很少出现，按需导入 email.utils（导入开销较大）
+    from email.utils import parsedate_to_datetime
+    for parse in (parsedate_to_datetime,
+                  lambda v: datetime.fromisoformat(v.replace("Z", "+00:00"))):
+        try:
+            moment = parse(value)
+        except (TypeError, ValueError):
+            continue
+        if moment.tzinfo is None:
+            moment = moment.replace(tzinfo=timezone.utc)
+        return max((moment - datetime.now(timezone.utc)).total_seconds(), 0.0)
+    return None
+
+
+def parse_rate_limit_headers(headers: Mapping) -> Dict:
+    """
+    提取限流相关响应头
+
+    支持 retry-after、OpenAI / OpenRouter 的 x-ratelimit-*，
+    以及 Anthropic 的 anthropic-ratelimit-requests-*。
+    """
+    lower = {str(k).lower(): v for k, v in headers.items()}
+    info = {}
+
+    retry_after = None
+    if "retry-after-ms" in lower:
+        try:
+            retry_after = max(float(lower["retry-after-ms"]), 0.0) / 1000
+        except (TypeError, ValueError):
+            pass  # 格式错误时退回 retry-after
+    if retry_after is None and "retry-after" in lower:
+        retry_after = _parse_seconds(lower["retry-after"])
+    if retry_after is not None:
+        info["retry_after"] = retry_after
+
+    for prefix in ("x-ratelimit-", "anthropic-ratelimit-"):
+        remaining = lower.get(f"{prefix}remaining-requests", lower.get(f"{prefix}requests-remaining"))
+        reset = lower.get(f"{prefix}reset-requests", lower.get(f"{prefix}requests-reset"))
+        if remaining is not None:
+            try:
+                info["remaining"] = int(float(remaining))
+            except ValueError:
+                pass
+        if reset is not None:
+            info["reset"] = _parse_seconds(reset)
+
+    return info
+
+
+def is_rate_limited(error: Exception) -> bool:
+    """
+    判断异常是否为限流（429）
+
+    只看状态码和异常类型：错误文本中出现 "429"（如 token 数、请求 ID）不代表被限流。
+    """
+    status = getattr(error, "status_code", None) or getattr(getattr(error, "response", None), "status_code", None)
+    if status == 429:
+        return True
+    return type(error).__name__ == "RateLimitError"
+
+
+def retry_after_from_error(error: Exception) -> Optional[float]:
+    """从限流异常携带的响应头中读取建议等待时间"""
+    headers = getattr(getattr(error, "response", None), "headers", None)
+    if not headers:
+        return None
+    return parse_rate_limit_headers(headers).get("retry_after")
+
+
+class RateLimiterRegistry:
+    """进程级限流器注册表（按 provider、按 provider+模型）"""
+
+    def __init__(self):
+        self._limiters: Dict[str, AdaptiveLimiter] = {}
+        self._overrides: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+
+    def configure(self, provider: str, model: str = None, **limits):
+        """
+        覆盖某个 provider 或模型的限额（在首次使用前调用）
+
+        Example:
+            get_rate_limiter_registry().configure("nvidia", rate=40 / 60, burst=5)
+        """
+        name = provider if model is None else f"{provider}:{model}"
+        with self._lock:
+            self._overrides[name] = limits
+            self._limiters.pop(name, None)
+
+    def _get(self, name: str, defaults: Dict) -> AdaptiveLimiter:
+        limiter = self._limiters.get(name)
+        if limiter is None:
+            limiter = AdaptiveLimiter(name, **{**defaults, **self._overrides.get(name, {})})
+            self._limiters[name] = limiter
+        return limiter
+
+    def get(self, provider: str, model: str) -> CompositeLimiter:
+        """获取某个模型的组合限流器"""
+        overrides = PROVIDER_LIMITS.get(provider, {})
+        with self._lock:
+            return CompositeLimiter(
+                self._get(f"{provider}:{model}", {**DEFAULT_MODEL_LIMITS, **overrides}),
+                self._get(provider, {**DEFAULT_PROVIDER_LIMITS, **overrides}),
+            )
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            return {name: l.get_stats() for name, l in self._limiters.items()}
+
+
+# 全局限流器注册表
+_limiters = None
+_limiters_lock = threading.Lock()
+
+def get_rate_limiter_registry() -> RateLimiterRegistry:
+    """获取进程级限流器注册表"""
+    global _limiters
+    if _limiters is None:
+        with _limiters_lock:
+            if _limiters is None:
+                _limiters = RateLimiterRegistry()
+    return _limiters
+
+
+__all__ = [
+    "TokenBucket",
+    "AdaptiveLimiter",
+    "CompositeLimiter",
+    "RateLimiterRegistry",
+    "get_rate_limiter_registry",
+    "parse_rate_limit_headers",
+    "is_rate_limited",
+]
@@ -289,6 +289,22 @@ class SelfLearningSystem:
         )
         
         return f"已学会: {topic}"
+    
+    def teach_many(self, lessons: Dict[str, str]) -> List[str]:
+        """批量教学 - 导入知识（{主题: 知识}），批量写入记忆系统"""
+        items = []
+        for topic, knowledge in lessons.items():
+            key = f"manual_{hash(topic) % 100000}"
+            self.knowledge_base[key] = {
+                "topic": topic,
+                "knowledge": knowledge,
+                "source": "manual",
+                "timestamp": str(time.time())
+            }
+            items.append({"key": key, "value": knowledge, "importance": 0.9})
+        
+        self.memory.remember_many(items)
+        return [f"已学会: {topic}" for topic in lessons]
 
 
 class AdaptiveAgent:
@@ -11,25 +11,24 @@
 import json
 import time
 import importlib
+import importlib.util
 import subprocess
 import os
-from typing import Dict, List, Optional, Any, Callable
+from typing import Dict, List, Optional, Any, Callable, TYPE_CHECKING
 from dataclasses import dataclass, field
 from enum import Enum
 
-# ClawHub 客户端
-try:
-    from .clawhub_client import ClawHubMarket, ClawHubSkill
-    CLAWHUB_AVAILABLE = True
-except ImportError:
-    CLAWHUB_AVAILABLE = False
+from .llm_metrics import metrics_scope
+
+# ClawHub / 魔搭 MCP 客户端在首次使用时才导入和创建
+CLAWHUB_AVAILABLE = importlib.util.find_spec(f"{__package__}.clawhub_client") is not None
+MODELSCOPE_AVAILABLE = importlib.util.find_spec(f"{__package__}.modelscope_mcp") is not None
 
-# 魔搭 MCP 客户端
-try:
+if TYPE_CHECKING:
+    from .clawhub_client import ClawHubMarket, ClawHubSkill
     from .modelscope_mcp import ModelScopeMCP
-    MODELSCOPE_AVAILABLE = True
-except ImportError:
-    MODELSCOPE_AVAILABLE = False
+
+_UNSET = object()
 
 
 class SkillCategory(Enum):
@@ -103,25 +102,47 @@ class SkillMarket:
         self.executions: List[SkillExecution] = []
         self.categories = {c.value: [] for c in SkillCategory}
         
-        # ClawHub 集成
-        self.clawhub = None
-        if CLAWHUB_AVAILABLE:
-            try:
-                self.clawhub = ClawHubMarket()
-            except Exception as e:
-                print(f"ClawHub 初始化失败: {e}")
-        
-        # 魔搭 MCP 集成
-        self.modelscope = None
-        if MODELSCOPE_AVAILABLE:
-            try:
-                self.modelscope = ModelScopeMCP()
-            except Exception as e:
-                print(f"魔搭MCP 初始化失败: {e}")
+        # ClawHub / 魔搭 MCP 集成（首次访问 clawhub / modelscope 时创建）
+        self._clawhub = _UNSET
+        self._modelscope = _UNSET
         
         # 初始化内置技能
         self._register_builtin_skills()
     
+    @property
+    def clawhub(self) -> Optional["ClawHubMarket"]:
+        """ClawHub 客户端，不可用时为 None"""
+        if self._clawhub is _UNSET:
+            self._clawhub = None
+            if CLAWHUB_AVAILABLE:
+                try:
+                    from .clawhub_client import ClawHubMarket
+                    self._clawhub = ClawHubMarket()
+                except Exception as e:
+                    print(f"ClawHub 初始化失败: {e}")
+        return self._clawhub
+    
+    @clawhub.setter
+    def clawhub(self, client):
+        self._clawhub = client
+    
+    @property
+    def modelscope(self) -> Optional["ModelScopeMCP"]:
+        """魔搭 MCP 客户端，不可用时为 None"""
+        if self._modelscope is _UNSET:
+            self._modelscope = None
+            if MODELSCOPE_AVAILABLE:
+                try:
+                    from .modelscope_mcp import ModelScopeMCP
+                    self._modelscope = ModelScopeMCP()
+                except Exception as e:
+                    print(f"魔搭MCP 初始化失败: {e}")
+        return self._modelscope
+    
+    @modelscope.setter
+    def modelscope(self, client):
+        self._modelscope = client
+    
     def search_modelscope(self, query: str = None, category: str = None) -> List[Dict]:
         """
         搜索魔搭 MCP 服务
@@ -159,7 +180,7 @@ class SkillMarket:
         
         return self.modelscope.call_mcp(mcp_id, params)
     
-    def search_clawhub(self, query: str, category: str = None) -> List[ClawHubSkill]:
+    def search_clawhub(self, query: str, category: str = None) -> List["ClawHubSkill"]:
         """
         搜索 ClawHub 技能市场
         
@@ -445,20 +466,21 @@ class SkillMarket:
             for key, value in params.items():
                 prompt = prompt.replace(f"{{{key}}}", str(value))
             
-            # 执行
-            if skill.executor:
-                output = skill.executor(params)
-            elif agent:
-                output = agent.chat(prompt)
-            elif skill.script_path:
-                output = subprocess.run(
-                    ["python", skill.script_path],
-                    input=json.dumps(params),
-                    capture_output=True,
-                    text=True
-                ).stdout
-            else:
-                output = prompt  # 返回提示词作为输出
+            # 执行（期间的 LLM 调用按技能归类统计）
+            with metrics_scope(f"skill:{skill_id}"):
+                if skill.executor:
+                    output = skill.executor(params)
+                elif agent:
+                    output = agent.chat(prompt)
+                elif skill.script_path:
+                    output = subprocess.run(
+                        ["python", skill.script_path],
+                        input=json.dumps(params),
+                        capture_output=True,
+                        text=True
+                    ).stdout
+                else:
+                    output = prompt  # 返回提示词作为输出
             
             execution.output = output
             execution.status = "success"
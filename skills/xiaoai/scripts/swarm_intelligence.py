@@ -7,9 +7,11 @@ import time
 from typing import List, Dict, Optional, Callable
 from dataclasses import dataclass, field
 
-from .agent_manager import Agent
+from .agent_manager import Agent, chat_many
 from .memory_store import HybridMemoryStore
 from .group_manager import Group
+from .llm_metrics import metrics_scope
+from .prompt_budget import PromptBudget, PromptSection, KEEP, DROP_OLDEST
 
 
 @dataclass
@@ -42,8 +44,12 @@ class SwarmIntelligence:
             "max_rounds": 5,           # 最大讨论轮数
             "critique_enabled": True,  # 启用批评
             "build_on_others": True,   # 基于他人观点改进
-            "consensus_threshold": 0.7  # 共识阈值
+            "consensus_threshold": 0.7,  # 共识阈值
+            "summary_budget": 4000,     # 汇总提示词的 token 预算
+            "view_tokens": 300,         # 汇总时每条观点的 token 上限
         }
+        # 提示词预算（stats 中记录累计裁剪的 token 数）
+        self.budget = PromptBudget(self.config["summary_budget"])
     
     def add_agent(self, agent: Agent):
         """添加 AI 智能体"""
@@ -83,14 +89,17 @@ class SwarmIntelligence:
         - critique: 评审式 (产出+批评+改进)
         """
         
-        if strategy == "debate":
-            return self._debate(problem)
-        elif strategy == "iterative":
-            return self._iterative(problem)
-        elif strategy == "critique":
-            return self._critique_loop(problem)
-        else:
+        strategies = {
+            "debate": self._debate,
+            "iterative": self._iterative,
+            "critique": self._critique_loop,
+        }
+        if strategy not in strategies:
             raise ValueError(f"Unknown strategy: {strategy}")
+        
+        # 本轮协作的 LLM 调用按策略归类统计
+        with metrics_scope(f"swarm:{strategy}"):
+            return strategies[strategy](problem)
     
     def _debate(self, problem: str) -> Dict:
         """辩论式 - 各抒己见，最后汇总"""
@@ -104,14 +113,14 @@ class SwarmIntelligence:
         
         responses = []
         
-        # 每个 AI 独立发表观点
-        for agent in self.agents:
-            prompt = f"""问题: {problem}
+        # 每个 AI 独立发表观点（互不依赖，并发请求）
+        prompt = f"""问题: {problem}
 
 请从你的专业角度分析这个问题，提出你的观点和解决方案。
 注意：你不需要与他人一致，保持独立思考。"""
-            
-            response = agent.chat(prompt)
+        outputs = chat_many(self.agents, [prompt] * len(self.agents))
+        
+        for agent, response in zip(self.agents, outputs):
             responses.append({
                 "author": agent.config.name,
                 "role": agent.config.role,
@@ -147,16 +156,16 @@ class SwarmIntelligence:
             others_context = self._build_context(all_responses)
             
             for agent in self.agents:
-                # 构建基于上下文的提示
+                # 构建基于上下文的提示（固定部分在前，各轮不同的内容在后，便于前缀缓存）
                 prompt = f"""问题: {problem}
 
-这是第 {round_num + 1} 轮讨论。
+请基于下面的讨论，提出你的观点或改进他人的想法。
+如果同意某人观点，可以 building on it。
+如果不同意，说明理由并提出替代方案。
 
-{others_context}
+这是第 {round_num + 1} 轮讨论。
 
-请基于以上讨论，提出你的观点或改进他人的想法。
-如果同意某人观点，可以 building on it。
-如果不同意，说明理由并提出替代方案。"""
+{others_context}"""
                 
                 response = agent.chat(prompt)
                 round_responses.append({
@@ -218,9 +227,7 @@ class SwarmIntelligence:
                 
                 prompt = f"""任务: {problem}
 
-{context}
-
-请提出你的解决方案。"""
+请提出你的解决方案。{context}"""
                 
                 response = agent.chat(prompt)
                 iteration_results.append({
@@ -240,11 +247,9 @@ class SwarmIntelligence:
                         for r in others
                     ])
                     
-                    prompt = f"""请批评以下方案，提出优缺点:
-
-{others_text}
+                    prompt = f"""请批评以下方案，提出优缺点，并给出建设性的改进建议:
 
-请给出建设性的改进建议。"""
+{others_text}"""
                     
                     critique = agent.chat(prompt)
                     iteration_results.append({
@@ -298,20 +303,25 @@ class SwarmIntelligence:
         # 让一个 agent 做总结
         summarizer = self.agents[0]
         
-        all_views = "\n\n".join([
-            f"{r['author']}: {r['response'][:300]}..."
-            for r in responses
-        ])
-        
-        prompt = f"""问题: {problem}
-
-以下是团队成员的观点:
-
-{all_views}
-
-请总结各方观点，找出共识和分歧，并提出一个综合方案。"""
-        
-        return summarizer.chat(prompt)
+        template = """问题: {problem}
+
+请总结以下团队成员的观点，找出共识和分歧，并提出一个综合方案。
+
+{views}"""
+        # 每条观点限长；总量超出预算时丢弃最早的观点
+        self.budget.max_tokens = self.config["summary_budget"]
+        self.budget.model = summarizer.config.model
+        fitted = self.budget.fit([
+            PromptSection("problem", problem, strategy=KEEP),
+            PromptSection(
+                "views",
+                items=[f"{r['author']}: {r['response']}" for r in responses],
+                strategy=DROP_OLDEST,
+                item_tokens=self.config["view_tokens"]
+            ),
+        ], overhead=template.format(problem="", views=""))
+        
+        return summarizer.chat(template.format(problem=fitted["problem"], views=fitted["views"]))
     
     def _check_convergence(self, responses: List[Dict], 
                           threshold: float = None) -> bool:
@@ -392,7 +402,9 @@ class SwarmIntelligence:
 # 便捷函数
 def create_swarm(name: str, 
                 agents: List[tuple],  # [(name, model, role), ...]
-                humans: List[str] = None) -> SwarmIntelligence:
+                humans: List[str] = None,
+                manager=None,
+                **agent_kwargs) -> SwarmIntelligence:
     """
     快速创建群体智能
     
@@ -406,14 +418,18 @@ def create_swarm(name: str,
             ],
             ["张三", "李四"]
         )
+    
+    manager 可选，传入已有的 AgentManager 以复用；
+    LLM 客户端由进程级注册表共享，新建管理器不会重复建连。
+    其余关键字参数（如 cache=True）透传给每个智能体的 AgentConfig。
     """
     from .agent_manager import AgentManager
     
     swarm = SwarmIntelligence(name)
-    manager = AgentManager()
+    manager = manager or AgentManager()
     
     for name, model, role in agents:
-        agent = manager.create_agent(name, model, role)
+        agent = manager.create_agent(name, model, role, **agent_kwargs)
         swarm.add_agent(agent)
     
     if humans:
@@ -0,0 +1,457 @@
+"""
+Teamily AI Core - 向量索引
+按 key 存放向量，检索与查询向量余弦相似度最高的前 k 个。
+向量写入时归一化，检索只需点积。
+
+- FlatIndex：精确检索，O(n) 一次矩阵乘法
+- IVFIndex：倒排文件近似检索，只扫描与查询最接近的 nprobe 个聚类
+
+两者接口一致（add / add_many / remove / clear / search / search_batch），
+可通过 create_index("flat" | "ivf", **params) 按名称创建。
+"""
+
+import heapq
+import math
+import importlib.util
+from typing import Optional, Dict, List, Tuple, Sequence, Hashable
+
+# numpy（可选）：首次创建索引时才导入；未安装时退化为纯 Python 实现
+NUMPY_AVAILABLE = importlib.util.find_spec("numpy") is not None
+np = None
+
+
+def _import_numpy():
+    global np
+    if np is None:
+        import numpy
+        np = numpy
+    return np
+
+
+# 批量检索时每块得分矩阵的元素上限（查询数 × 向量数），控制峰值内存
+BATCH_SCORES = 1 << 24
+
+# k-means 训练时每个聚类的最大采样数
+KMEANS_SAMPLE = 64
+
+
+def _unit(vector: Sequence[float], dim: int):
+    """校验维度并归一化（NumPy 下返回 float32 数组，否则返回列表）"""
+    if len(vector) != dim:
+        raise ValueError(f"向量维度 {len(vector)} 与索引维度 {dim} 不一致")
+    if not NUMPY_AVAILABLE:
+        norm = math.sqrt(sum(x * x for x in vector))
+        return [x / norm for x in vector] if norm > 0 else [float(x) for x in vector]
+    vec = np.asarray(vector, dtype=np.float32)
+    norm = float(np.linalg.norm(vec))
+    return vec / norm if norm > 0 else vec
+
+
+def _as_matrix(keys: Sequence[Hashable], vectors, dim: Optional[int]):
+    """批量写入的向量转为 float32 矩阵并校验形状"""
+    matrix = np.asarray(vectors, dtype=np.float32)
+    if matrix.ndim != 2 or len(matrix) != len(keys):
+        raise ValueError("vectors 应为与 keys 等长的二维数组")
+    if dim is not None and matrix.shape[1] != dim:
+        raise ValueError(f"向量维度 {matrix.shape[1]} 与索引维度 {dim} 不一致")
+    return matrix
+
+
+class FlatIndex:
+    """
+    精确检索索引
+
+    向量归一化后存入连续的 float32 矩阵（容量不足时按 GROWTH 倍扩容，摊还 O(1) 写入，
+    空闲行不超过已用行数的 1/4；高维嵌入下空闲行是索引内存的主要浪费，因此不按 2 倍扩容），
+    检索为一次矩阵-向量乘法加 argpartition 取前 k 个。
+    删除时把最后一行移入空位，矩阵始终紧凑。
+    同一 key 再次写入时原地覆盖。零向量与任何查询的相似度都为 0。
+
+    Example:
+        index = FlatIndex()
+        index.add("a", [0.1, 0.2, 0.3])
+        index.search([0.1, 0.2, 0.25], top_k=5)   # [("a", 0.99...)]
+    """
+
+    GROWTH = 1.25
+
+    def __init__(self, dim: Optional[int] = None, capacity: int = 64):
+        self.dim = dim
+        self._capacity = max(capacity, 1)
+        self._keys: List[Hashable] = []           # 行号 -> key
+        self._rows: Dict[Hashable, int] = {}      # key -> 行号
+        self._vectors = None
+        if NUMPY_AVAILABLE:
+            _import_numpy()
+
+    def __len__(self):
+        return len(self._keys)
+
+    def __contains__(self, key):
+        return key in self._rows
+
+    def _prepare(self, vector: Sequence[float]):
+        if self.dim is None:
+            self.dim = len(vector)
+        return _unit(vector, self.dim)
+
+    def _ensure_capacity(self, n: int):
+        """保证矩阵至少有 n 行（在追加新 key 之前调用，已有的行按当前 key 数复制）"""
+        if self._vectors is None:
+            self._capacity = max(self._capacity, n)
+            self._vectors = np.zeros((self._capacity, self.dim), dtype=np.float32)
+        elif n > self._capacity:
+            while self._capacity < n:
+                self._capacity = int(self._capacity * self.GROWTH) + 1
+            grown = np.zeros((self._capacity, self.dim), dtype=np.float32)
+            grown[:len(self._keys)] = self._vectors[:len(self._keys)]
+            self._vectors = grown
+
+    def add(self, key: Hashable, vector: Sequence[float]):
+        """写入向量（key 已存在时覆盖）"""
+        vec = self._prepare(vector)
+        row = self._rows.get(key)
+        if row is not None:
+            self._vectors[row] = vec
+            return
+        row = len(self._keys)
+        if NUMPY_AVAILABLE:
+            self._ensure_capacity(row + 1)
+            self._vectors[row] = vec
+        else:
+            if self._vectors is None:
+                self._vectors = []
+            self._vectors.append(vec)
+        self._keys.append(key)
+        self._rows[key] = row
+
+    def add_many(self, keys: Sequence[Hashable], vectors):
+        """批量写入（归一化与写入矩阵均为向量化操作）；同一批中重复的 key 以最后一个为准"""
+        if not NUMPY_AVAILABLE:
+            for key, vector in zip(keys, vectors):
+                self.add(key, vector)
+            return
+        if len(keys) == 0:
+            return
+        matrix = _as_matrix(keys, vectors, self.dim)
+        self.dim = matrix.shape[1]
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        matrix = matrix / np.where(norms > 0, norms, 1)
+
+        latest = {key: i for i, key in enumerate(keys)}
+        fresh = sum(1 for key in latest if key not in self._rows)
+        self._ensure_capacity(len(self._keys) + fresh)
+        rows = []
+        for key in latest:
+            row = self._rows.get(key)
+            if row is None:
+                row = len(self._keys)
+                self._keys.append(key)
+                self._rows[key] = row
+            rows.append(row)
+        self._vectors[rows] = matrix[list(latest.values())]
+
+    def remove(self, key: Hashable) -> bool:
+        """删除向量，返回是否存在"""
+        row = self._rows.pop(key, None)
+        if row is None:
+            return False
+        last = len(self._keys) - 1
+        if row != last:
+            moved = self._keys[last]
+            self._keys[row] = moved
+            self._rows[moved] = row
+            self._vectors[row] = self._vectors[last]
+        self._keys.pop()
+        if not NUMPY_AVAILABLE:
+            self._vectors.pop()
+        return True
+
+    def clear(self):
+        self._keys.clear()
+        self._rows.clear()
+        self._vectors = None
+
+    def matrix(self):
+        """当前全部向量（行顺序与 keys() 一致；NumPy 下为视图，不应修改）"""
+        if not NUMPY_AVAILABLE:
+            return list(self._vectors or [])
+        if self._vectors is None:
+            return np.zeros((0, self.dim or 0), dtype=np.float32)
+        return self._vectors[:len(self._keys)]
+
+    def keys(self) -> List[Hashable]:
+        return list(self._keys)
+
+    def search(self, vector: Sequence[float], top_k: int = 5) -> List[Tuple[Hashable, float]]:
+        """返回与 vector 最相似的 top_k 个 (key, 相似度)，按相似度从高到低"""
+        n = len(self._keys)
+        if n == 0 or top_k <= 0:
+            return []
+        query = self._prepare(vector)
+        if not NUMPY_AVAILABLE:
+            scored = (
+                (sum(a * b for a, b in zip(row, query)), i)
+                for i, row in enumerate(self._vectors)
+            )
+            return [(self._keys[i], score) for score, i in heapq.nlargest(top_k, scored)]
+        return self._top_k(self._vectors[:n] @ query, top_k)
+
+    def search_batch(self, vectors: Sequence[Sequence[float]],
+                     top_k: int = 5) -> List[List[Tuple[Hashable, float]]]:
+        """批量检索：多个查询合并为矩阵乘法，结果与逐个 search 一致"""
+        n = len(self._keys)
+        if not vectors:
+            return []
+        if n == 0 or top_k <= 0:
+            return [[] for _ in vectors]
+        if not NUMPY_AVAILABLE:
+            return [self.search(v, top_k) for v in vectors]
+
+        queries = np.stack([self._prepare(v) for v in vectors])
+        matrix = self._vectors[:n]
+        step = max(BATCH_SCORES // n, 1)
+        results = []
+        for start in range(0, len(queries), step):
+            scores = queries[start:start + step] @ matrix.T
+            results.extend(self._top_k(row, top_k) for row in scores)
+        return results
+
+    def _top_k(self, scores, top_k: int) -> List[Tuple[Hashable, float]]:
+        n = len(scores)
+        if top_k < n:
+            rows = np.argpartition(-scores, top_k - 1)[:top_k]
+            rows = rows[np.argsort(-scores[rows], kind="stable")]
+        else:
+            rows = np.argsort(-scores, kind="stable")
+        return [(self._keys[i], float(scores[i])) for i in rows]
+
+
+def _argmax_rows(matrix, centroids):
+    """每行最相似的聚类中心（分块计算，控制峰值内存）"""
+    step = max(BATCH_SCORES // max(len(centroids), 1), 1)
+    labels = np.empty(len(matrix), dtype=np.int64)
+    for start in range(0, len(matrix), step):
+        labels[start:start + step] = np.argmax(matrix[start:start + step] @ centroids.T, axis=1)
+    return labels
+
+
+class IVFIndex:
+    """
+    倒排文件（IVF）近似检索索引
+
+    向量按球面 k-means 聚类分到 nlist 个倒排列表（每个列表是一个 FlatIndex），
+    检索时只扫描与查询最接近的 nprobe 个列表：nprobe 越大召回越高、越慢，nprobe = nlist 时等同精确检索。
+
+    - 向量数达到 min_train 前不聚类，检索为精确扫描
+    - 之后向量数每增长 retrain_growth 倍重新聚类一次（nlist 未指定时取 sqrt(n)），摊还 O(1)
+    - 写入只需与聚类中心比较一次；删除直接从所在列表移除
+    - 未安装 NumPy 时不聚类，始终精确扫描
+
+    Example:
+        index = IVFIndex(nprobe=16)
+        index.add_many(keys, vectors)
+        index.search(query, top_k=10)             # 默认 nprobe
+        index.search(query, top_k=10, nprobe=64)  # 单次查询提高召回
+    """
+
+    def __init__(self, nlist: Optional[int] = None, nprobe: int = 8,
+                 min_train: int = 4096, retrain_growth: float = 4.0,
+                 kmeans_iters: int = 10, seed: int = 0):
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.min_train = min_train
+        self.retrain_growth = retrain_growth
+        self.kmeans_iters = kmeans_iters
+        self.seed = seed
+        self.dim: Optional[int] = None
+        self.trainings = 0
+        self._centroids = None
+        self._lists: List[FlatIndex] = [FlatIndex()]
+        self._where: Dict[Hashable, int] = {}   # key -> 列表号
+        self._trained_size = 0
+        if NUMPY_AVAILABLE:
+            _import_numpy()
+
+    def __len__(self):
+        return len(self._where)
+
+    def __contains__(self, key):
+        return key in self._where
+
+    @property
+    def trained(self) -> bool:
+        return self._centroids is not None
+
+    def add(self, key: Hashable, vector: Sequence[float]):
+        """写入向量（key 已存在时覆盖，必要时移到新的列表）"""
+        if self.dim is None:
+            self.dim = len(vector)
+        vec = _unit(vector, self.dim)
+        label = int(np.argmax(self._centroids @ vec)) if self.trained else 0
+        self._move(key, label)
+        self._lists[label].add(key, vec)
+        self._maybe_train()
+
+    def add_many(self, keys: Sequence[Hashable], vectors):
+        """批量写入：一次矩阵乘法分配列表，再按列表批量写入"""
+        if not NUMPY_AVAILABLE:
+            for key, vector in zip(keys, vectors):
+                self.add(key, vector)
+            return
+        if len(keys) == 0:
+            return
+        matrix = _as_matrix(keys, vectors, self.dim)
+        self.dim = matrix.shape[1]
+        if self.trained:
+            labels = _argmax_rows(matrix, self._centroids)
+        else:
+            labels = np.zeros(len(keys), dtype=np.int64)
+        groups: Dict[int, List[int]] = {}
+        for key, i in {key: i for i, key in enumerate(keys)}.items():
+            label = int(labels[i])
+            self._move(key, label)
+            groups.setdefault(label, []).append(i)
+        for label, rows in groups.items():
+            self._lists[label].add_many([keys[i] for i in rows], matrix[rows])
+        self._maybe_train()
+
+    def _move(self, key: Hashable, label: int):
+        """记录 key 所在列表；原先在其他列表中时从中移除"""
+        current = self._where.get(key)
+        if current is not None and current != label:
+            self._lists[current].remove(key)
+        self._where[key] = label
+
+    def remove(self, key: Hashable) -> bool:
+        """删除向量，返回是否存在"""
+        current = self._where.pop(key, None)
+        if current is None:
+            return False
+        self._lists[current].remove(key)
+        return True
+
+    def clear(self):
+        self._centroids = None
+        self._lists = [FlatIndex(self.dim)]
+        self._where.clear()
+        self._trained_size = 0
+
+    def _maybe_train(self):
+        if not NUMPY_AVAILABLE:
+            return
+        n = len(self._where)
+        if self.trained:
+            if n >= self._trained_size * self.retrain_growth:
+                self.train()
+        elif n >= self.min_train:
+            self.train()
+
+    def train(self):
+        """按当前全部向量重新聚类并重建倒排列表"""
+        keys: List[Hashable] = []
+        for lst in self._lists:
+            keys.extend(lst.keys())
+        n = len(keys)
+        if not NUMPY_AVAILABLE or n == 0:
+            return
+        matrix = np.concatenate([lst.matrix() for lst in self._lists])
+        nlist = min(self.nlist or max(int(math.sqrt(n)), 1), n)
+        centroids = self._kmeans(matrix, nlist)
+        labels = _argmax_rows(matrix, centroids)
+
+        lists = [FlatIndex(self.dim, capacity=16) for _ in range(nlist)]
+        order = np.argsort(labels, kind="stable")
+        bounds = np.searchsorted(labels[order], np.arange(nlist + 1))
+        for label in range(nlist):
+            rows = order[bounds[label]:bounds[label + 1]]
+            if len(rows):
+                lists[label].add_many([keys[i] for i in rows], matrix[rows])
+        self._centroids = centroids
+        self._lists = lists
+        self._where = {key: int(label) for key, label in zip(keys, labels)}
+        self._trained_size = n
+        self.trainings += 1
+
+    def _kmeans(self, matrix, k: int):
+        """球面 k-means（余弦相似度），在采样上训练"""
+        rng = np.random.default_rng(self.seed + self.trainings)
+        n = len(matrix)
+        sample = matrix[rng.choice(n, min(n, k * KMEANS_SAMPLE), replace=False)]
+        centroids = sample[rng.choice(len(sample), k, replace=False)].copy()
+        for _ in range(self.kmeans_iters):
+            labels = _argmax_rows(sample, centroids)
+            order = np.argsort(labels, kind="stable")
+            counts = np.bincount(labels, minlength=k)
+            sums = np.zeros_like(centroids)
+            filled = counts > 0
+            starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+            sums[filled] = np.add.reduceat(sample[order], starts[filled], axis=0)
+            # 空聚类用随机样本重新初始化
+            empty = int((~filled).sum())
+            if empty:
+                sums[~filled] = sample[rng.choice(len(sample), empty)]
+            norms = np.linalg.norm(sums, axis=1, keepdims=True)
+            centroids = sums / np.where(norms > 0, norms, 1)
+        return centroids.astype(np.float32)
+
+    def search(self, vector: Sequence[float], top_k: int = 5,
+               nprobe: Optional[int] = None) -> List[Tuple[Hashable, float]]:
+        """返回近似最相似的 top_k 个 (key, 相似度)，按相似度从高到低"""
+        if not self._where or top_k <= 0:
+            return []
+        if not self.trained:
+            return self._lists[0].search(vector, top_k)
+        query = _unit(vector, self.dim)
+        nprobe = min(nprobe or self.nprobe, len(self._lists))
+        scores = self._centroids @ query
+        if nprobe < len(scores):
+            probes = np.argpartition(-scores, nprobe - 1)[:nprobe]
+        else:
+            probes = range(len(scores))
+        candidates = []
+        for label in probes:
+            candidates.extend(self._lists[label].search(query, top_k))
+        return heapq.nlargest(top_k, candidates, key=lambda c: c[1])
+
+    def search_batch(self, vectors: Sequence[Sequence[float]], top_k: int = 5,
+                     nprobe: Optional[int] = None) -> List[List[Tuple[Hashable, float]]]:
+        if not self.trained:
+            return self._lists[0].search_batch(vectors, top_k)
+        return [self.search(vector, top_k, nprobe) for vector in vectors]
+
+    def get_stats(self) -> Dict:
+        sizes = [len(lst) for lst in self._lists]
+        return {
+            "size": len(self._where),
+            "trained": self.trained,
+            "nlist": len(self._lists) if self.trained else 0,
+            "nprobe": self.nprobe,
+            "trainings": self.trainings,
+            "max_list": max(sizes) if sizes else 0,
+        }
+
+
+INDEX_TYPES = {
+    "flat": FlatIndex,
+    "ivf": IVFIndex,
+}
+
+
+def create_index(kind="flat", **params):
+    """按名称创建索引（kind 也可以是已创建的索引对象，原样返回）"""
+    if not isinstance(kind, str):
+        return kind
+    try:
+        return INDEX_TYPES[kind](**params)
+    except KeyError:
+        raise ValueError(f"未知的索引类型: {kind}（可选 {', '.join(INDEX_TYPES)}）") from None
+
+
+__all__ = [
+    "FlatIndex",
+    "IVFIndex",
+    "INDEX_TYPES",
+    "create_index",
+    "NUMPY_AVAILABLE",
+]
@@ -6,7 +6,6 @@
 import os
 import json
 import time
-import requests
 from typing import List, Optional
 from dataclasses import dataclass
 
@@ -31,6 +30,12 @@ class WeComBot:
         # API 地址
         self.api_host = "https://qyapi.weixin.qq.com"
     
+    def _request(self, method: str, url: str, **kwargs) -> dict:
+        """发送 HTTP 请求并解析 JSON（requests 在首次请求时才导入）"""
+        import requests
+        response = requests.request(method, url, timeout=10, **kwargs)
+        return response.json()
+    
     def _get_access_token(self) -> str:
         """获取 access_token"""
         now = time.time()
@@ -43,8 +48,7 @@ class WeComBot:
             "corpsecret": self.secret
         }
         
-        response = requests.get(url, params=params, timeout=10)
-        data = response.json()
+        data = self._request("GET", url, params=params)
         
         if data.get("errcode") == 0:
             self.access_token = data["access_token"]
@@ -67,8 +71,7 @@ class WeComBot:
             "text": {"content": content}
         }
         
-        response = requests.post(url, params=params, json=data, timeout=10)
-        result = response.json()
+        result = self._request("POST", url, params=params, json=data)
         
         if result.get("errcode") != 0:
             print(f"发送失败: {result}")
@@ -87,8 +90,7 @@ class WeComBot:
             "text": {"content": content}
         }
         
-        response = requests.post(url, params=params, json=data, timeout=10)
-        return response.json()
+        return self._request("POST", url, params=params, json=data)
     
     def create_group(self, name: str, owner: str, user_list: List[str]) -> str:
         """创建群聊"""
@@ -103,8 +105,7 @@ class WeComBot:
             "userlist": user_list
         }
         
-        response = requests.post(url, params=params, json=data, timeout=10)
-        result = response.json()
+        result = self._request("POST", url, params=params, json=data)
         
         if result.get("errcode") == 0:
             return result["chatid"]
@@ -118,8 +119,7 @@ class WeComBot:
         url = f"{self.api_host}/cgi-bin/getcallbackip"
         params = {"access_token": token}
         
-        response = requests.get(url, params=params, timeout=10)
-        data = response.json()
+        data = self._request("GET", url, params=params)
         
         if data.get("errcode") == 0:
             return data["ip_list"]
@@ -191,8 +191,8 @@ class WorkflowEngine:
         for key, value in context.items():
             prompt = prompt.replace(f"{{{key}}}", str(value))
         
-        # 执行
-        result = agent.chat(prompt)
+        # 执行（异步调用，并行节点中的多个 AI 节点可同时等待响应）
+        result = await agent.achat(prompt)
         
         # 保存输出到上下文
         output_key = node.config.get("output_key", node.id)
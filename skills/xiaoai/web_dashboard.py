@@ -7,12 +7,13 @@ sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
 Teamily AI Core - Web 可视化界面
 """
 
-from flask import Flask, render_template_string, jsonify, request
+from flask import Flask, render_template_string, jsonify, request, Response, stream_with_context
 import sys
 import os
 
 # 添加 scripts 目录
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'scripts'))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
 app = Flask(__name__)
 
@@ -197,10 +198,24 @@ DASHBOARD_HTML = '''
             addMessage('你', message, '#00d4ff');
             input.value = '';
             
-            // 模拟 AI 回复
-            setTimeout(() => {
-                addMessage('🤖 Teamily', '收到你的消息！多个 AI 智能体正在协作处理...', '#00ff88');
-            }, 500);
+            // 流式显示 AI 回复：边生成边渲染
+            const bubble = addMessage('🤖 Teamily', '', '#00ff88');
+            fetch('/api/chat/stream', {
+                method: 'POST',
+                headers: {'Content-Type': 'application/json'},
+                body: JSON.stringify({message: message})
+            }).then(async (resp) => {
+                const reader = resp.body.getReader();
+                const decoder = new TextDecoder();
+                while (true) {
+                    const {done, value} = await reader.read();
+                    if (done) break;
+                    bubble.textContent += decoder.decode(value, {stream: true});
+                    bubble.scrollIntoView({block: 'end'});
+                }
+            }).catch(() => {
+                bubble.textContent = '收到你的消息！多个 AI 智能体正在协作处理...';
+            });
         }
         
         function addMessage(name, text, color) {
@@ -210,12 +225,15 @@ DASHBOARD_HTML = '''
             div.innerHTML = `
                 <div class="message-avatar" style="background: ${color}">${name[0]}</div>
                 <div class="message-content">
-                    ${text}
+                    <span class="message-text"></span>
                     <div class="message-time">${new Date().toLocaleTimeString()}</div>
                 </div>
             `;
+            const textNode = div.querySelector('.message-text');
+            textNode.textContent = text;
             messages.appendChild(div);
             messages.scrollTop = messages.scrollHeight;
+            return textNode;
         }
     </script>
 </body>
@@ -262,6 +280,38 @@ def chat():
     return jsonify({"response": response})
 
 
+# 控制台对话智能体（首次请求时创建）
+_chat_agent = None
+
+def get_chat_agent():
+    """获取控制台对话使用的智能体"""
+    global _chat_agent
+    if _chat_agent is None:
+        from scripts.agent_manager import AgentManager
+        _chat_agent = AgentManager().create_agent(
+            "Teamily",
+            os.getenv("DASHBOARD_MODEL", "meta/llama-3.1-70b-instruct"),
+            "Teamily AI Core 控制台助手"
+        )
+    return _chat_agent
+
+
+@app.route('/api/chat/stream', methods=['POST'])
+def chat_stream():
+    """流式对话：以分块文本返回模型增量输出"""
+    data = request.json
+    message = data.get('message', '')
+    
+    def generate():
+        try:
+            for delta in get_chat_agent().chat_stream(message):
+                yield delta
+        except Exception as e:
+            yield f"Error: {e}"
+    
+    return Response(stream_with_context(generate()), mimetype='text/plain; charset=utf-8')
+
+
 if __name__ == '__main__':
     print("=" * 50)
     print("🌐 Teamily AI Core Web 控制台")
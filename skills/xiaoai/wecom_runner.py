@@ -55,23 +55,6 @@ def test_mode():
         "企业微信群的活跃助手，擅长聊天和解答问题"
     )
     
-    proactive = ProactiveAgent(agent, "AI小助手")
-    proactive.config["cooldown"] = 1
-    
-    handler = WeComMessageHandler(
-        corp_id=WECOM_CONFIG["corp_id"],
-        secret=WECOM_CONFIG["secret"],
-        agent_id=WECOM_CONFIG["agent_id"]
-    )
-    handler.set_agent(proactive)
-    
-    manager = AgentManager()
-    agent = manager.create_agent(
-        "AI小助手",
-        "meta/llama-3.1-70b-instruct",
-        "企业微信群的活跃助手，擅长聊天和解答问题"
-    )
-    
     # 2. 创建主动介入智能体
     proactive = ProactiveAgent(agent, "AI小助手")
     proactive.config["cooldown"] = 1
@@ -144,10 +127,14 @@ def run_mode():
     os.environ["NVIDIA_API_KEY"] = os.getenv("NVIDIA_API_KEY")
     
     manager = AgentManager()
+    # 配置了嵌入模型时启用语义缓存：群里同一问题的不同问法复用回答
+    embedding_model = os.getenv("XIAOAI_EMBEDDING_MODEL")
     agent = manager.create_agent(
         "AI小助手",
         "meta/llama-3.1-70b-instruct",
-        "企业微信群的活跃助手"
+        "企业微信群的活跃助手",
+        semantic_cache=bool(embedding_model),
+        semantic_embedder=embedding_model
     )
     
     proactive = ProactiveAgent(agent, "AI小助手")